@@ -1,8 +1,7 @@
-import os
 import streamlit as st
 
 from src.config import SERVICE_NAME
-from src.ffmpeg_audio import is_audio_file, convert_to_wav_16k_mono, get_media_duration
+from src.ffmpeg_audio import is_audio_file, MediaSource
 from src.ui import (
     render_header,
     render_author_fixed,
@@ -10,11 +9,14 @@ from src.ui import (
     render_file_info,
     fmt_time,
 )
-from src.transcriber import load_model_cached, transcribe_with_silence_segments
+from src.cache import hash_buffer
 from src.export import build_transcript_file, make_download_name
-from src.demucs_vocals import separate_vocals_demucs, cleanup_demucs_artifacts
-from src.postprocess import postprocess_transcript
-from src.session_sec import check_rate_limit, increment_usage, get_runs_for_user
+from src.jobs import get_job_manager, FINAL_STATES, JOB_ERROR, JOB_CANCELLED, JobCancelled
+from src.pipeline import transcription_job
+from src.postprocess import postprocess_transcript, StreamingPostprocessor, POSTPROCESS_SETTINGS
+from src.session_sec import check_rate_limit, increment_usage, refund_usage, get_runs_for_user
+from src.tracing import span, set_process_role
+from src.warmup import start_warmup
 
 
 # ---- Límites anti-abuso ----
@@ -22,6 +24,235 @@ MAX_MB = 250
 MAX_MINUTES = 25
 
 
+# Resultados post-procesados por (trabajo, ajustes de texto) en la sesión
+_POSTPROCESSED_MAX = 8
+
+
+def _final_text(raw_text: str, settings: dict, job_id: str = "") -> str:
+    """
+    Post-proceso con memo en la sesión: un rerun con los mismos ajustes de
+    texto no vuelve a recorrer la transcripción.
+    """
+    memo = st.session_state.setdefault("postprocessed", {})
+    key = (job_id, len(raw_text), tuple(settings.get(k) for k in POSTPROCESS_SETTINGS)) if job_id else None
+    if key in memo:
+        return memo[key]
+
+    with span("postprocess", chars=len(raw_text)):
+        text = postprocess_transcript(
+            raw_text,
+            clean_text=settings.get("clean_text", True),
+            normalize_elongations=settings.get("normalize_elongations", False),
+            max_consecutive_repeats=settings.get("max_consecutive_repeats", 4),
+        )
+    if key is not None:
+        if len(memo) >= _POSTPROCESSED_MAX:
+            memo.pop(next(iter(memo)))
+        memo[key] = text
+    return text
+
+
+def _metered_job(job, *args, usage_client=None, **kwargs):
+    """
+    transcription_job que devuelve el uso si termina con error (archivo muy
+    largo, formato roto…). Corre en el hilo del trabajo: se devuelve aunque
+    el usuario ya haya cerrado la pestaña. Detenerlo no devuelve el uso.
+    """
+    try:
+        return transcription_job(job, *args, **kwargs)
+    except JobCancelled:
+        raise
+    except Exception:
+        refund_usage(usage_client)
+        raise
+
+
+def _render_settings(job_settings: dict, current: dict) -> dict:
+    """
+    Ajustes con los que se muestra un resultado: los de la transcripción
+    (modelo, segmentación…) del trabajo, y los de texto de la barra lateral
+    actual, que se re-aplican al instante sin volver a correr el modelo.
+    """
+    return {**job_settings, **{k: current[k] for k in POSTPROCESS_SETTINGS if k in current}}
+
+
+def _transcription_changed(job_settings: dict, current: dict) -> bool:
+    ignored = set(POSTPROCESS_SETTINGS) | {"secret_code"}
+    return any(current.get(k) != v for k, v in job_settings.items() if k not in ignored)
+
+
+def _partial_segments(job: dict) -> list:
+    return [seg for seg in job.get("partial") or [] if seg["text"]]
+
+
+def _partial_text(job_id: str, segments: list, settings: dict) -> str:
+    """
+    Texto parcial post-procesado de forma incremental: en cada refresco solo
+    se procesan los segmentos nuevos (mismo resultado que _final_text).
+    """
+    key = (job_id, tuple(settings.get(k) for k in POSTPROCESS_SETTINGS))
+    state = st.session_state.get("partial_postprocess")
+    if state is None or state["key"] != key:
+        pp = StreamingPostprocessor(
+            clean_text=settings.get("clean_text", True),
+            normalize_elongations=settings.get("normalize_elongations", False),
+            max_consecutive_repeats=settings.get("max_consecutive_repeats", 4),
+        )
+        state = {"key": key, "pp": pp, "fed": 0, "text": ""}
+        st.session_state["partial_postprocess"] = state
+
+    for seg in segments[state["fed"]:]:
+        state["text"] += state["pp"].feed(seg["text"] if state["fed"] == 0 else "\n" + seg["text"])
+        state["fed"] += 1
+    return state["text"] + state["pp"].preview()
+
+
+@st.fragment(run_every=1.0)
+def _job_progress(job_id: str, settings: dict):
+    """
+    Se re-ejecuta cada segundo mientras el trabajo corre en segundo plano:
+    muestra el avance y el texto que ya está listo.
+    Al terminar fuerza un rerun completo para mostrar el resultado.
+    """
+    jobs = get_job_manager()
+    job = jobs.get(job_id)
+    if job is None or job["state"] in FINAL_STATES:
+        st.rerun()
+
+    position = jobs.queue_position(job_id)
+    if position:
+        st.info(f"⏳ En cola (posición {position}). El servidor procesa pocos trabajos a la vez.")
+    else:
+        st.info(job.get("message") or "Procesando…")
+    st.progress(int(min(1.0, job.get("progress") or 0.0) * 100))
+
+    segments = _partial_segments(job)
+    if segments:
+        st.caption(f"Texto parcial · {len(segments)} segmentos · hasta {fmt_time(segments[-1]['end'])}")
+        partial_text = _partial_text(job_id, segments, settings)
+        st.text_area("Texto parcial", value=partial_text, height=240, disabled=True, label_visibility="collapsed")
+
+    if st.button("⏹ Detener (conservar lo transcrito)", key=f"stop_{job_id}", use_container_width=True):
+        jobs.cancel(job_id)
+        st.rerun()
+    st.caption("Puedes cambiar opciones o recargar la página: el proceso sigue en el servidor.")
+
+
+def _render_transcript(final_text: str, export_txt: str, download_name: str):
+    st.text_area("Caja de texto (editable)", value=final_text, height=360, label_visibility="collapsed")
+
+    # Fila para Descargar y Copiar text
+    bc1, bc2 = st.columns(2)
+    with bc1:
+        st.download_button(
+            label="⬇️ Descargar (.txt)",
+            data=export_txt,
+            file_name=download_name,
+            mime="text/plain",
+            use_container_width=True
+        )
+    with bc2:
+        import streamlit.components.v1 as components
+        escaped_text = final_text.replace('\\', '\\\\').replace('`', '\\`').replace('$', '\\$').replace('\n', '\\n').replace('"', '\\"')
+        html_code = f"""
+        <button onclick="navigator.clipboard.writeText(`{escaped_text}`); this.innerText='✅ Copiado!';" 
+                style="width:100%; height:41px; border:1px solid #ccc; border-radius:8px; background-color:#ffffff; 
+                color:#31333F; font-size:14px; cursor:pointer; font-family:sans-serif; transition: 0.2s;">
+            📋 Copiar todo
+        </button>
+        """
+        components.html(html_code, height=45)
+
+
+def _render_partial(job: dict, source_name: str, settings: dict, job_id: str):
+    segments = _partial_segments(job)
+    if not segments:
+        st.warning("Transcripción detenida antes de que hubiera texto.")
+        return
+
+    end_sec = segments[-1]["end"]
+    st.warning(f"Transcripción detenida: se conserva el texto hasta {fmt_time(end_sec)}.")
+    final_text = _final_text("\n".join(seg["text"] for seg in segments), settings, job_id)
+
+    st.subheader("Transcripción Parcial")
+    export_txt = build_transcript_file(
+        transcript=final_text,
+        source_filename=source_name,
+        service_name=SERVICE_NAME,
+        model_label=settings["model_label"],
+        model_key=settings["model_key"],
+        audio_profile=settings["audio_profile"],
+        precision=settings["precision"],
+        language_label=settings["language_label"],
+        duration_sec=end_sec,
+        silence_db=settings["silence_db"],
+        min_silence=settings["min_silence"],
+        min_segment=settings["min_segment"],
+        segments_count=len(job.get("partial") or []),
+    )
+    download_name = make_download_name(source_name, SERVICE_NAME, settings).replace(".txt", "_parcial.txt")
+    _render_transcript(final_text, export_txt, download_name)
+
+
+def _render_result(result: dict, source_name: str, settings: dict, job_id: str):
+    raw_text = result["raw_text"]
+    stats = result["stats"]
+    duration_sec = result["duration_sec"]
+
+    if result.get("cache_hit") == "transcript":
+        st.caption("⚡ Resultado recuperado de caché (mismo archivo y ajustes).")
+
+    if not raw_text:
+        st.warning("No se generó texto. Prueba otro modelo o ajusta segmentación.")
+        return
+
+    final_text = _final_text(raw_text, settings, job_id)
+
+    st.subheader("Transcripción Completa")
+
+    export_txt = build_transcript_file(
+        transcript=final_text,
+        source_filename=source_name,
+        service_name=SERVICE_NAME,
+        model_label=settings["model_label"],
+        model_key=settings["model_key"],
+        audio_profile=settings["audio_profile"],
+        precision=settings["precision"],
+        language_label=settings["language_label"],
+        duration_sec=duration_sec,
+        silence_db=stats["silence_db"],
+        min_silence=stats["min_silence"],
+        min_segment=stats["min_segment"],
+        segments_count=stats["segments_count"],
+    )
+
+    download_name = make_download_name(source_name, SERVICE_NAME, settings)
+
+    _render_transcript(final_text, export_txt, download_name)
+
+    if stats.get("rtf") and duration_sec:
+        st.caption(f"Tiempo aprox de procesamiento en este equipo: {fmt_time(duration_sec * stats['rtf'])}")
+
+    two_pass = stats.get("two_pass")
+    if two_pass:
+        caption = (
+            f"Borrador con {two_pass['draft_model']}: {two_pass['segments_escalated']}/{stats['segments_count']} "
+            f"segmentos revisados con {settings['model_key']}"
+        )
+        if two_pass.get("saved_sec_est") is not None:
+            caption += f" · ahorro estimado: {fmt_time(two_pass['saved_sec_est'])}"
+        st.caption(caption)
+
+    runs, max_runs = get_runs_for_user(settings)
+
+    if max_runs == 999:
+        uso_str = "Ilimitado (Modo VIP activo)"
+    else:
+        uso_str = f"{runs}/{max_runs}"
+
+    st.success(f"Listo. Transcripciones usadas: {uso_str}")
+
+
 def main():
     st.set_page_config(
         page_title=SERVICE_NAME,
@@ -29,6 +260,11 @@ def main():
         layout="wide",
     )
 
+    # Precarga de modelos (VIDEOSCRIBE_WARMUP): una vez por proceso, en segundo plano.
+    # Con `python -m src.serve` ya arrancó antes de la primera sesión
+    set_process_role("app")
+    start_warmup()
+
     render_header()
 
     # ✅ Intento de footer fijo (visual). Aun si el navegador/iframe lo reacomoda,
@@ -97,145 +333,69 @@ def main():
                 st.error("🚫 **Límite de transcripciones alcanzado.**\nIntenta más tarde o ingresa un código VIP en Preferencias.")
             st.stop()
 
-        safe_name = os.path.basename(uploaded.name).replace(" ", "_")
-        temp_video_path = f"temp_{safe_name}"
-        temp_wav_path = f"temp_{os.path.splitext(safe_name)[0]}.wav"
-
-        demucs_run_dir = None
-        audio_for_transcribe = temp_wav_path
-
-        with open(temp_video_path, "wb") as f:
-            f.write(uploaded.getbuffer())
-
-        try:
-            with col1:
-                duration_sec = get_media_duration(temp_video_path)
-                if duration_sec > 0:
-                    st.info(f"Duración detectada: {fmt_time(duration_sec)}")
-                    if duration_sec > MAX_MINUTES * 60:
-                        st.error(
-                            f"El video excede el máximo permitido ({MAX_MINUTES} minutos). "
-                            f"Duración: {fmt_time(duration_sec)}."
-                        )
-                        st.stop()
-                else:
-                    duration_sec = 0
-
-            with col2:
-                st.subheader("2. Proceso y Resultado")
-                with st.status("Preparando entorno...", expanded=True) as status:
-                    if is_audio:
-                        status.update(label="1/4 Convirtiendo audio…")
-                    else:
-                        status.update(label="1/4 Extrayendo audio del video…")
-                    convert_to_wav_16k_mono(
-                        input_path=temp_video_path,
-                        wav_path=temp_wav_path,
-                        normalize=settings["normalize_audio"],
-                    )
-
-                    if settings.get("use_vocals") and "Música" in settings["audio_profile"]:
-                        status.update(label="2/4 Separando voz… (esto puede tardar unos minutos)")
-                        vocals_mp3, demucs_run_dir = separate_vocals_demucs(temp_wav_path)
-                        audio_for_transcribe = vocals_mp3
-                    else:
-                        status.update(label="2/4 Saltando separación de voz…")
-
-                    status.update(label="3/4 Cargando modelo de Inteligencia Artificial…")
-                    model = load_model_cached(settings["model_key"])
-
-                    status.update(label="4/4 Transcribiendo audio… (no cierres esta pestaña)")
-                    # La funcion de transcripcion muestra progreso interno aquí
-                    raw_text, stats = transcribe_with_silence_segments(
-                        model=model,
-                        wav_path=audio_for_transcribe,
-                        duration_sec=duration_sec,
-                        settings=settings,
-                    )
-                    
-                    status.update(label="Transcripción finalizada con éxito", state="complete", expanded=False)
-
-                if not raw_text:
-                    st.warning("No se generó texto. Prueba otro modelo o ajusta segmentación.")
-                    st.stop()
-
-                final_text = postprocess_transcript(
-                    raw_text,
-                    clean_text=settings.get("clean_text", True),
-                    normalize_elongations=settings.get("normalize_elongations", False),
-                    max_consecutive_repeats=settings.get("max_consecutive_repeats", 4),
-                )
-
-                st.subheader("Transcripción Completa")
-                st.text_area("Caja de texto (editable)", value=final_text, height=360, label_visibility="collapsed")
-
-                export_txt = build_transcript_file(
-                    transcript=final_text,
-                    source_filename=uploaded.name,
-                    service_name=SERVICE_NAME,
-                    model_label=settings["model_label"],
-                    model_key=settings["model_key"],
-                    audio_profile=settings["audio_profile"],
-                    precision=settings["precision"],
-                    language_label=settings["language_label"],
-                    duration_sec=duration_sec,
-                    silence_db=stats["silence_db"],
-                    min_silence=stats["min_silence"],
-                    min_segment=stats["min_segment"],
-                    segments_count=stats["segments_count"],
-                )
-
-                download_name = make_download_name(uploaded.name, SERVICE_NAME, settings)
-                
-                # Fila para Descargar y Copiar text
-                bc1, bc2 = st.columns(2)
-                with bc1:
-                    st.download_button(
-                        label="⬇️ Descargar (.txt)",
-                        data=export_txt,
-                        file_name=download_name,
-                        mime="text/plain",
-                        use_container_width=True
+        # El archivo ya está en memoria: se hashea ahí (clave de caché) y se
+        # envía a ffmpeg por stdin, sin copiarlo al directorio de trabajo.
+        # La duración sale del log de ffmpeg en la misma conversión: el
+        # trabajo se corta apenas se sabe que excede MAX_MINUTES.
+        with span("hash", mb=round(size_mb, 1)):
+            file_hash = hash_buffer(uploaded.getbuffer())
+
+        # Un solo trabajo por sesión: el anterior (si sigue en curso) se detiene
+        # en vez de quedar ocupando un worker sin que nadie lo mire
+        previous = st.session_state.get("job")
+        if previous and "final" not in previous:
+            get_job_manager().cancel(previous["id"])
+
+        # El uso se cuenta al enviar: cerrar la pestaña o encadenar envíos
+        # no evita el límite. Si el trabajo falla, se devuelve.
+        usage_client = increment_usage(settings)
+
+        # El trabajo pesado corre fuera del hilo del script (src/jobs.py)
+        job_id = get_job_manager().submit(
+            _metered_job,
+            MediaSource(uploaded.getbuffer(), uploaded.name),
+            settings,
+            file_hash=file_hash,
+            max_duration_sec=MAX_MINUTES * 60,
+            usage_client=usage_client,
+            label=uploaded.name,
+        )
+        st.session_state["job"] = {"id": job_id, "file": uploaded.name, "settings": settings}
+
+    job_ref = st.session_state.get("job")
+    if job_ref and job_ref["file"] == uploaded.name:
+        with col2:
+            st.subheader("2. Proceso y Resultado")
+
+            # Un trabajo terminado queda en la sesión (texto crudo por segmento +
+            # stats): los reruns no vuelven a consultar el JobManager ni el disco.
+            job = job_ref.get("final")
+            if job is None:
+                job = get_job_manager().get(job_ref["id"])
+                if job is not None and job["state"] in FINAL_STATES:
+                    job_ref["final"] = job
+
+            view_settings = _render_settings(job_ref["settings"], settings)
+
+            if job is None:
+                st.warning("No se encontró el trabajo. Vuelve a iniciar la transcripción.")
+            elif job["state"] not in FINAL_STATES:
+                _job_progress(job_ref["id"], view_settings)
+            elif job["state"] == JOB_ERROR and (job.get("error") or "").startswith("MediaTooLong"):
+                st.error(job["error"].split(": ", 1)[1])
+            elif job["state"] == JOB_ERROR:
+                st.error("Ocurrió un error durante el proceso.")
+                st.code(job.get("traceback") or job.get("error") or "", language="text")
+            else:
+                if _transcription_changed(job_ref["settings"], settings):
+                    st.caption(
+                        "ℹ️ Cambiaste ajustes de modelo o segmentación: se aplican al volver a iniciar. "
+                        "Los de **Calidad del texto** se aplican al instante."
                     )
-                with bc2:
-                    import streamlit.components.v1 as components
-                    escaped_text = final_text.replace('\\', '\\\\').replace('`', '\\`').replace('$', '\\$').replace('\n', '\\n').replace('"', '\\"')
-                    html_code = f"""
-                    <button onclick="navigator.clipboard.writeText(`{escaped_text}`); this.innerText='✅ Copiado!';" 
-                            style="width:100%; height:41px; border:1px solid #ccc; border-radius:8px; background-color:#ffffff; 
-                            color:#31333F; font-size:14px; cursor:pointer; font-family:sans-serif; transition: 0.2s;">
-                        📋 Copiar todo
-                    </button>
-                    """
-                    components.html(html_code, height=45)
-
-                if stats.get("rtf") and duration_sec:
-                    st.caption(f"Tiempo aprox de procesamiento en este equipo: {fmt_time(duration_sec * stats['rtf'])}")
-
-                # ✅ cuenta el run solo si terminó OK
-                increment_usage(settings)
-                runs, max_runs = get_runs_for_user(settings)
-                
-                if max_runs == 999:
-                    uso_str = "Ilimitado (Modo VIP activo)"
+                if job["state"] == JOB_CANCELLED:
+                    _render_partial(job, job_ref["file"], view_settings, job_ref["id"])
                 else:
-                    uso_str = f"{runs}/{max_runs}"
-                    
-                st.success(f"Listo. Transcripciones usadas: {uso_str}")
-
-        except Exception as e:
-            st.error("Ocurrió un error durante el proceso.")
-            st.exception(e)
-
-        finally:
-            cleanup_demucs_artifacts(demucs_run_dir)
-
-            for p in (temp_wav_path, temp_video_path):
-                if p and os.path.exists(p):
-                    try:
-                        os.remove(p)
-                    except Exception:
-                        pass
+                    _render_result(job["result"], job_ref["file"], view_settings, job_ref["id"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""
+Benchmark de arranque en frío: cuánto tarda un proceso nuevo en tener la
+app o el CLI listos, y qué dependencias pesadas cargó para eso.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 5 --out import.json
+
+Casos (cada repetición en un intérprete nuevo, se reporta la mediana):
+- python: intérprete vacío (piso de referencia).
+- whisper: `import whisper`, lo que cuesta cargar torch + whisper.
+- app_imports: los imports de nivel superior de app.py.
+- app_page: app.py ejecutada con streamlit.testing hasta dibujar la página
+  de subida.
+- cli_help: `python transcriptor.py --help`.
+
+"heavy" lista los módulos pesados (torch, whisper, demucs) presentes en
+sys.modules al terminar; en los casos de la app y el CLI debe quedar vacío.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .common import dump_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+CLI_PATH = os.path.join(ROOT, "transcriptor.py")
+
+HEAVY_MODULES = ("torch", "whisper", "demucs")
+
+_MARK = "@@heavy="
+
+
+def _app_imports() -> str:
+    """Solo los import de nivel superior de app.py (sin ejecutar la página)."""
+    with open(APP_PATH, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+
+def cases() -> Dict[str, str]:
+    return {
+        "python": "pass",
+        "whisper": "import whisper",
+        "app_imports": _app_imports(),
+        "app_page": (
+            "from streamlit.testing.v1 import AppTest\n"
+            f"at = AppTest.from_file({APP_PATH!r}, default_timeout=120).run()\n"
+            "assert not at.exception, [e.message for e in at.exception]\n"
+        ),
+        "cli_help": (
+            "import runpy\n"
+            f"sys.argv = [{CLI_PATH!r}, '--help']\n"
+            "try:\n"
+            f"    runpy.run_path({CLI_PATH!r}, run_name='__main__')\n"
+            "except SystemExit:\n"
+            "    pass\n"
+        ),
+    }
+
+
+def run_case(code: str, workdir: str) -> Dict:
+    """Ejecuta `code` en un intérprete nuevo; tiempo de pared desde afuera."""
+    script = (
+        "import sys\n"
+        f"{code}\n"
+        "import json\n"
+        f"print({_MARK!r} + json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    heavy: List[str] = []
+    for line in proc.stdout.splitlines():
+        if line.startswith(_MARK):
+            heavy = json.loads(line[len(_MARK):])
+    return {"sec": wall, "heavy": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Procesos por caso (se reporta la mediana)")
+    parser.add_argument("--case", nargs="*", default=None, help="Casos a medir (por defecto, todos)")
+    parser.add_argument("--out", default="", help="Ruta del JSON (por defecto, stdout)")
+    args = parser.parse_args()
+
+    available = cases()
+    selected = args.case or list(available)
+    unknown = [c for c in selected if c not in available]
+    if unknown:
+        parser.error(f"casos desconocidos: {', '.join(unknown)} (hay: {', '.join(available)})")
+
+    results = []
+    # Directorio aparte: la app crea su base de límites de uso en el cwd
+    with tempfile.TemporaryDirectory(prefix="videoscribe-import-") as workdir:
+        for name in selected:
+            runs = [run_case(available[name], workdir) for _ in range(max(1, args.repeat))]
+            results.append({
+                "case": name,
+                "median_sec": round(statistics.median(r["sec"] for r in runs), 3),
+                "min_sec": round(min(r["sec"] for r in runs), 3),
+                "heavy": runs[-1]["heavy"],
+            })
+
+    dump_json({
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "results": results,
+    }, args.out)
+
+
+if __name__ == "__main__":
+    main()
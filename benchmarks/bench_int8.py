@@ -0,0 +1,95 @@
+"""
+Benchmark int8 vs float: velocidad y deriva del texto.
+
+    python -m benchmarks.bench_int8 --model small
+    python -m benchmarks.bench_int8 --model medium --audio clase.mp3 cancion.mp3 --out int8.json
+
+Sin --audio se usan fixtures sintéticas (benchmarks/fixtures.py). Para medir
+deriva real del texto conviene pasar grabaciones con voz.
+"""
+import argparse
+import difflib
+import os
+import time
+
+from src.config import AUDIO_PROFILES, PRECISION_LEVELS
+from src.ffmpeg_audio import decode_to_pcm16k, SAMPLE_RATE
+from src.model_registry import model_size_bytes
+from src.transcriber import load_whisper, transcribe_with_silence_segments
+
+from .common import headless_settings, dump_json
+from .fixtures import make_fixture
+
+
+def word_drift(reference: str, candidate: str) -> float:
+    """0.0 = mismo texto palabra por palabra, 1.0 = nada en común."""
+    ref_words, cand_words = reference.split(), candidate.split()
+    if not ref_words and not cand_words:
+        return 0.0
+    return 1.0 - difflib.SequenceMatcher(None, ref_words, cand_words).ratio()
+
+
+def _timed_transcribe(model, audio, settings):
+    t0 = time.perf_counter()
+    text, _stats = transcribe_with_silence_segments(model, audio, len(audio) / SAMPLE_RATE, settings)
+    return text, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--audio", nargs="*", default=[], help="Archivos reales (opcional)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duración de las fixtures sintéticas (s)")
+    parser.add_argument("--precision", default=PRECISION_LEVELS[0], choices=PRECISION_LEVELS)
+    parser.add_argument("--out", default="", help="Ruta del JSON (por defecto, stdout)")
+    args = parser.parse_args()
+
+    fixtures = []
+    for path in args.audio:
+        fixtures.append((os.path.basename(path), decode_to_pcm16k(path, normalize=True), AUDIO_PROFILES[0]))
+    if not fixtures:
+        fixtures.append(("synthetic_speech", make_fixture("speech", args.duration), AUDIO_PROFILES[0]))
+        fixtures.append(("synthetic_music", make_fixture("music", args.duration), AUDIO_PROFILES[1]))
+
+    t0 = time.perf_counter()
+    float_model = load_whisper(args.model, int8=False)
+    float_load = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    int8_model = load_whisper(args.model, int8=True)
+    int8_load = time.perf_counter() - t0
+
+    results = []
+    for name, audio, profile in fixtures:
+        settings = headless_settings(args.model, args.precision, profile)
+        float_text, float_sec = _timed_transcribe(float_model, audio, settings)
+        int8_text, int8_sec = _timed_transcribe(int8_model, audio, {**settings, "int8": True})
+        results.append({
+            "fixture": name,
+            "audio_sec": round(len(audio) / SAMPLE_RATE, 2),
+            "float_sec": round(float_sec, 3),
+            "int8_sec": round(int8_sec, 3),
+            "speedup": round(float_sec / max(int8_sec, 1e-9), 3),
+            "word_drift": round(word_drift(float_text, int8_text), 4),
+        })
+
+    total_float = sum(r["float_sec"] for r in results)
+    total_int8 = sum(r["int8_sec"] for r in results)
+    dump_json({
+        "model": args.model,
+        "precision": args.precision,
+        "size_mb": {
+            "float": round(model_size_bytes(float_model) / 1024 ** 2, 1),
+            "int8": round(model_size_bytes(int8_model) / 1024 ** 2, 1),
+        },
+        "load_sec": {"float": round(float_load, 3), "int8": round(int8_load, 3)},
+        "results": results,
+        "summary": {
+            "speedup": round(total_float / max(total_int8, 1e-9), 3),
+            "mean_word_drift": round(sum(r["word_drift"] for r in results) / max(1, len(results)), 4),
+        },
+    }, args.out)
+
+
+if __name__ == "__main__":
+    main()
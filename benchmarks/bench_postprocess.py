@@ -0,0 +1,120 @@
+"""
+Benchmark del post-proceso: postprocess_transcript (todo el texto de una vez)
+vs StreamingPostprocessor (segmento a segmento), sobre transcripciones
+sintéticas de varias horas.
+
+    python -m benchmarks.bench_postprocess
+    python -m benchmarks.bench_postprocess --hours 1 4 16 --out post.json
+
+Para cada duración reporta tiempo, pico de memoria (tracemalloc) y verifica
+que ambas salidas sean idénticas (mismo SHA-256).
+"""
+import argparse
+import hashlib
+import random
+import time
+import tracemalloc
+from typing import Iterator
+
+from src.postprocess import postprocess_transcript, postprocess_segments
+
+from .common import dump_json
+
+_WORDS = (
+    "entonces la clase de hoy vamos a ver el tema que quedó pendiente como les decía "
+    "es importante revisar los ejemplos porque en el examen pueden venir preguntas así "
+    "bueno sí exacto claro o sea digamos que el resultado depende del contexto"
+).split()
+
+# Segmentos por hora de audio (ventanas de ~5s)
+_SEGMENTS_PER_HOUR = 720
+
+
+def synthetic_segments(hours: float, seed: int = 0) -> Iterator[str]:
+    """
+    Textos de segmento parecidos a la salida de Whisper, con lo que limpia
+    el post-proceso: loops de la misma frase, signos repetidos,
+    alargamientos y alguna línea vacía.
+    """
+    rng = random.Random(seed)
+    last = ""
+    for _ in range(int(hours * _SEGMENTS_PER_HOUR)):
+        roll = rng.random()
+        if roll < 0.05 and last:
+            text = last                                   # loop: misma línea otra vez
+        elif roll < 0.07:
+            text = "!" * rng.randint(8, 30)               # basura de signos
+        elif roll < 0.09:
+            text = ""                                     # ventana sin texto
+        else:
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 18))]
+            if rng.random() < 0.1:
+                words.append("sooooooo" if rng.random() < 0.5 else "su-u-u-u")
+            text = " ".join(words) + rng.choice([".", ",", "?", "...", "!!!!!!!!"])
+        last = text
+        yield text
+
+
+def _run_batch(hours: float, options) -> str:
+    return postprocess_transcript("\n".join(synthetic_segments(hours)), **options)
+
+
+def _run_stream(hours: float, options):
+    # La salida se consume al vuelo (hash + tamaño): no se guarda el texto completo
+    h = hashlib.sha256()
+    size = 0
+    for piece in postprocess_segments(synthetic_segments(hours), **options):
+        data = piece.encode("utf-8")
+        h.update(data)
+        size += len(data)
+    return h.hexdigest(), size
+
+
+def _peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", nargs="*", type=float, default=[1, 2, 4, 8])
+    parser.add_argument("--out", default="", help="Ruta del JSON (por defecto, stdout)")
+    args = parser.parse_args()
+
+    options = {"clean_text": True, "normalize_elongations": True, "max_consecutive_repeats": 3}
+    results = []
+    for hours in args.hours:
+        t0 = time.perf_counter()
+        batch_out = _run_batch(hours, options)
+        batch_sec = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        stream_hash, stream_size = _run_stream(hours, options)
+        stream_sec = time.perf_counter() - t0
+
+        batch_bytes = batch_out.encode("utf-8")
+        results.append({
+            "hours": hours,
+            "segments": int(hours * _SEGMENTS_PER_HOUR),
+            "output_kb": round(len(batch_bytes) / 1024, 1),
+            "identical": hashlib.sha256(batch_bytes).hexdigest() == stream_hash and len(batch_bytes) == stream_size,
+            "batch_sec": round(batch_sec, 4),
+            "stream_sec": round(stream_sec, 4),
+            "batch_peak_kb": round(_peak_bytes(lambda: _run_batch(hours, options)) / 1024, 1),
+            "stream_peak_kb": round(_peak_bytes(lambda: _run_stream(hours, options)) / 1024, 1),
+        })
+
+    # Linealidad: segundos por hora de transcripción en cada tamaño
+    for r in results:
+        r["stream_sec_per_hour"] = round(r["stream_sec"] / r["hours"], 5)
+        r["batch_sec_per_hour"] = round(r["batch_sec"] / r["hours"], 5)
+
+    dump_json({"options": options, "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
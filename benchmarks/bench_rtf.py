@@ -0,0 +1,137 @@
+"""
+Benchmark de punta a punta del pipeline (sin Streamlit).
+
+Genera audio sintético (voz y música), lo pasa por src.pipeline.run_transcription
+con cada combinación PRECISION_LEVELS × AUDIO_PROFILES × segmentación y
+reporta el tiempo de pared por etapa y el factor de tiempo real (RTF) en JSON.
+
+    python -m benchmarks.bench_rtf                      # modelo de reemplazo, sin red
+    python -m benchmarks.bench_rtf --model tiny --duration 120 --out rtf.json
+
+RTF = segundos de proceso / segundos de audio (menor es mejor).
+"""
+import argparse
+import hashlib
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import torch
+
+from src.config import AUDIO_PROFILES, PRECISION_LEVELS
+from src.pipeline import run_transcription
+
+from .common import headless_settings, install_standin, dump_json
+from .fixtures import make_fixture
+
+# Estrategias de segmentación: ajustes que se aplican sobre los del perfil
+SEGMENTATION_STRATEGIES = {
+    "energy_vad": {"auto_silence": True, "pack_segments": True},
+    "silencedetect": {"auto_silence": False, "pack_segments": True},
+    "energy_vad_unpacked": {"auto_silence": True, "pack_segments": False},
+}
+
+FIXTURE_KINDS = ("speech", "music")
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def run_case(path: str, file_hash: str, settings, repeat: int):
+    runs = []
+    for _ in range(repeat):
+        # Las presets con temperatura > 0 muestrean: misma semilla en cada run
+        torch.manual_seed(0)
+        t0 = time.perf_counter()
+        result = run_transcription(path, settings, file_hash=file_hash, use_cache=False)
+        total = time.perf_counter() - t0
+        runs.append((total, result))
+
+    # Mediana por tiempo total: menos sensible a un run con ruido
+    runs.sort(key=lambda r: r[0])
+    total, result = runs[len(runs) // 2]
+    audio_sec = result["duration_sec"]
+    return {
+        "audio_sec": round(audio_sec, 2),
+        "total_sec": round(total, 3),
+        "rtf": round(total / max(audio_sec, 1e-9), 4),
+        "stages_sec": {k: round(v, 3) for k, v in result["timings"].items()},
+        "segments_count": result["stats"]["segments_count"],
+        "speech_segments": result["stats"].get("speech_segments"),
+        "silence_db": result["stats"]["silence_db"],
+        "chars": len(result["raw_text"]),
+        "runs_sec": [round(r[0], 3) for r in runs],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="", help="Modelo Whisper (vacío = modelo de reemplazo sin red)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duración de cada fixture (s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por caso (se reporta la mediana)")
+    parser.add_argument("--precision", nargs="*", default=PRECISION_LEVELS, choices=PRECISION_LEVELS)
+    parser.add_argument("--strategy", nargs="*", default=list(SEGMENTATION_STRATEGIES), choices=list(SEGMENTATION_STRATEGIES))
+    parser.add_argument("--out", default="", help="Ruta del JSON (por defecto, stdout)")
+    args = parser.parse_args()
+
+    model_key = args.model or install_standin()
+
+    cases = []
+    with tempfile.TemporaryDirectory(prefix="videoscribe-bench-") as tmp:
+        fixtures = {}
+        for kind in FIXTURE_KINDS:
+            path = os.path.join(tmp, f"{kind}.wav")
+            make_fixture(kind, args.duration, path=path)
+            fixtures[kind] = (path, _file_hash(path))
+
+        for kind, (path, file_hash) in fixtures.items():
+            for precision in args.precision:
+                for profile in AUDIO_PROFILES:
+                    for strategy in args.strategy:
+                        settings = {
+                            **headless_settings(model_key, precision, profile),
+                            **SEGMENTATION_STRATEGIES[strategy],
+                        }
+                        try:
+                            case = run_case(path, file_hash, settings, max(1, args.repeat))
+                        except Exception as e:
+                            # Un caso roto no invalida la matriz: queda registrado en el JSON
+                            case = {"error": f"{type(e).__name__}: {str(e).splitlines()[0]}"}
+                        cases.append({
+                            "fixture": kind,
+                            "precision": precision,
+                            "audio_profile": profile,
+                            "strategy": strategy,
+                            "int8": settings["int8"],
+                            **case,
+                        })
+
+    ok = [c for c in cases if "error" not in c]
+    dump_json({
+        "model": model_key,
+        "standin_model": not args.model,
+        "env": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "cpu_count": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "cases": cases,
+        "summary": {
+            "mean_rtf": round(statistics.mean(c["rtf"] for c in ok), 4) if ok else None,
+            "max_rtf": max((c["rtf"] for c in ok), default=None),
+            "failed_cases": len(cases) - len(ok),
+        },
+    }, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Utilidades compartidas por los benchmarks.
+"""
+import json
+import sys
+from typing import Dict
+
+from src.config import headless_settings  # noqa: F401  (re-export para los benchmarks)
+
+
+def dump_json(data: Dict, path: str = ""):
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+def standin_model(seed: int = 0):
+    """
+    Whisper con pesos aleatorios y dimensiones mínimas: misma arquitectura y
+    mismo camino de código que un modelo real, sin descargas. El texto que
+    produce no tiene sentido; sirve para medir el pipeline, no la calidad.
+    """
+    import torch
+    from whisper.model import Whisper, ModelDimensions
+
+    torch.manual_seed(seed)
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1,
+    )
+    model = Whisper(dims)
+    model.eval()
+    return model
+
+
+def install_standin(name: str = "standin"):
+    """
+    Deja el modelo de reemplazo residente en el registro bajo `name` (float e
+    int8), así whisper_model(name) lo encuentra sin intentar descargarlo.
+    """
+    from src.model_registry import get_model_registry
+    from src.transcriber import quantize_int8
+
+    registry = get_model_registry()
+    # acquire sin release: quedan fijados durante todo el benchmark
+    registry.acquire(f"whisper:{name}", standin_model)
+    registry.acquire(f"whisper:{name}:int8", lambda: quantize_int8(standin_model()))
+    return name
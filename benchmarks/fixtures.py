@@ -0,0 +1,98 @@
+"""
+Audio sintético para benchmarks (sin archivos en el repo, sin red).
+
+- speech_like: sílabas armónicas con formantes y pausas, parecido a una clase.
+- music_like: acordes sostenidos + percusión, sin silencios reales.
+"""
+import wave
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Formantes aproximados (F1, F2) de vocales del español
+_VOWEL_FORMANTS = [(800, 1200), (500, 1900), (300, 2300), (500, 900), (350, 800)]
+
+
+def _syllable(rng: np.random.Generator, dur: float, sr: int) -> np.ndarray:
+    n = int(dur * sr)
+    t = np.arange(n) / sr
+    f0 = rng.uniform(100, 220) * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    f1, f2 = _VOWEL_FORMANTS[rng.integers(len(_VOWEL_FORMANTS))]
+
+    out = np.zeros(n, dtype=np.float64)
+    for h in range(1, 30):
+        freq = f0.mean() * h
+        if freq > sr / 2:
+            break
+        # Envolvente espectral con dos picos (formantes)
+        gain = np.exp(-((freq - f1) / 150) ** 2) + 0.6 * np.exp(-((freq - f2) / 250) ** 2) + 0.02
+        out += gain * np.sin(h * phase)
+
+    env = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.03)
+    return out * env
+
+
+def speech_like(duration_sec: float, seed: int = 0, sr: int = SAMPLE_RATE) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(duration_sec * sr), dtype=np.float64)
+    t = 0.3
+    while t < duration_sec - 0.5:
+        # Una "frase": varias sílabas seguidas, luego una pausa
+        for _ in range(int(rng.integers(4, 18))):
+            dur = rng.uniform(0.12, 0.3)
+            if t + dur >= duration_sec:
+                break
+            syl = _syllable(rng, dur, sr)
+            s = int(t * sr)
+            audio[s:s + len(syl)] += syl
+            t += dur + rng.uniform(0.0, 0.05)
+        t += rng.uniform(0.4, 1.6)
+
+    audio += 0.003 * rng.standard_normal(len(audio))
+    return (0.25 * audio / max(1e-6, np.abs(audio).max())).astype(np.float32)
+
+
+def music_like(duration_sec: float, seed: int = 0, sr: int = SAMPLE_RATE) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = int(duration_sec * sr)
+    t = np.arange(n) / sr
+    audio = np.zeros(n, dtype=np.float64)
+
+    # Acordes que cambian cada 2s
+    bar = 2.0
+    for b in range(int(np.ceil(duration_sec / bar))):
+        root = 110 * 2 ** (rng.integers(0, 12) / 12)
+        s, e = int(b * bar * sr), min(n, int((b + 1) * bar * sr))
+        for ratio in (1.0, 1.26, 1.5, 2.0):
+            audio[s:e] += 0.2 * np.sin(2 * np.pi * root * ratio * t[s:e])
+
+    # Percusión: ráfagas de ruido en cada tiempo
+    beat = 0.5
+    decay = np.exp(-np.arange(int(0.12 * sr)) / (0.03 * sr))
+    for k in range(int(duration_sec / beat)):
+        s = int(k * beat * sr)
+        burst = rng.standard_normal(len(decay)) * decay
+        audio[s:s + len(burst)] += 0.5 * burst[: n - s]
+
+    # Una "voz" por encima para que haya algo que transcribir
+    audio += 0.8 * speech_like(duration_sec, seed=seed + 1, sr=sr)
+    return (0.3 * audio / max(1e-6, np.abs(audio).max())).astype(np.float32)
+
+
+def write_wav(audio: np.ndarray, path: str, sr: int = SAMPLE_RATE):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+
+
+def make_fixture(kind: str, duration_sec: float, seed: int = 0, path: Optional[str] = None) -> np.ndarray:
+    audio = speech_like(duration_sec, seed) if kind == "speech" else music_like(duration_sec, seed)
+    if path:
+        write_wav(audio, path)
+    return audio
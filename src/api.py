@@ -0,0 +1,560 @@
+"""
+API HTTP asíncrona (tornado) sobre el mismo pipeline que la app.
+
+    python -m src.api --port 8600 --warm medium
+
+    POST   /jobs                   sube el archivo (multipart "file" o cuerpo crudo
+                                   con ?filename=) y encola; 202 {"id", ...}
+    GET    /jobs/<id>              estado y progreso
+    GET    /jobs/<id>/events       server-sent events: progreso y cada segmento
+    GET    /jobs/<id>/result       texto final (?format=json: texto crudo + stats)
+    GET    /jobs/<id>/trace        spans del trabajo (con VIDEOSCRIBE_TRACE)
+    DELETE /jobs/<id>              detiene el trabajo (conserva lo transcrito)
+    GET    /health                 trabajos en cola, precarga y modelos residentes
+    GET    /metrics                métricas de este proceso (texto de Prometheus)
+    GET    /ready                  200 cuando los modelos precargados están listos, si no 503
+
+Ajustes por query string o campos del formulario: model, precision,
+profile (voz|musica), language (es|en) y, para borrador rápido + revisión,
+draft_model / draft_precision.
+
+La subida se lee por bloques: el SHA-256 se calcula mientras llega y el
+archivo queda en memoria (nunca en el directorio de trabajo) hasta que
+ffmpeg lo lee por stdin. Los trabajos pasan por el JobManager, que limita
+cuántos corren a la vez (VIDEOSCRIBE_MAX_JOBS); con más de
+VIDEOSCRIBE_API_MAX_QUEUED en cola, los envíos nuevos reciben 503 antes de
+leer el cuerpo. Las subidas que todavía se están recibiendo cuentan como
+en cola, y los bytes retenidos (subidas en curso + trabajos que aún no
+terminaron) se limitan a VIDEOSCRIBE_API_MAX_BUFFERED_MB.
+"""
+import re
+import sys
+import json
+import hashlib
+import argparse
+from email.message import Message
+from typing import Dict, Optional
+
+import tornado.ioloop
+import tornado.queues
+import tornado.web
+from tornado.httputil import HTTPHeaders
+from tornado.iostream import StreamClosedError
+from tornado.util import TimeoutError as QueueTimeout
+
+from .config import (
+    API_MAX_BUFFERED_MB,
+    API_MAX_MB,
+    API_MAX_MINUTES,
+    API_MAX_QUEUED,
+    AUDIO_PROFILE_ALIASES,
+    LANG_OPTIONS,
+    PRECISION_LEVELS,
+    ALL_MODEL_OPTIONS,
+    headless_settings,
+)
+from .ffmpeg_audio import MediaSource, is_supported_file
+from .model_registry import get_model_registry
+from .jobs import get_job_manager, FINAL_STATES, JOB_CANCELLED, JOB_DONE
+from .pipeline import transcription_job
+from .postprocess import postprocess_transcript, POSTPROCESS_SETTINGS
+from .tracing import load_trace, metrics_text, set_process_role
+from .warmup import start_warmup, get_warmup
+
+_LANGUAGE_LABELS = {code: label for label, code in LANG_OPTIONS.items()}
+_KEEPALIVE_SEC = 15
+_MAX_FIELD_BYTES = 4096
+
+
+class MultipartStream:
+    """
+    Parser incremental de multipart/form-data: feed() recibe los bloques tal
+    como llegan y reparte el contenido de cada parte sin juntar el cuerpo.
+
+      on_part(headers) -> destino: callable(bytes) o None para descartar
+    """
+
+    def __init__(self, boundary: bytes, on_part):
+        self._delim = b"\r\n--" + boundary
+        self._on_part = on_part
+        # Se antepone CRLF: así el primer delimitador tiene la misma forma que los demás
+        self._buf = b"\r\n"
+        self._state = "preamble"
+        self._sink = None
+
+    def feed(self, data: bytes):
+        self._buf += data
+        while True:
+            if self._state == "preamble":
+                i = self._buf.find(self._delim)
+                if i < 0:
+                    self._buf = self._buf[-len(self._delim):]
+                    return
+                self._buf = self._buf[i + len(self._delim):]
+                self._state = "after_delim"
+            elif self._state == "after_delim":
+                if len(self._buf) < 2:
+                    return
+                if self._buf[:2] == b"--":
+                    self._state = "done"
+                    return
+                self._buf = self._buf[2:]  # CRLF
+                self._state = "headers"
+            elif self._state == "headers":
+                i = self._buf.find(b"\r\n\r\n")
+                if i < 0:
+                    if len(self._buf) > 16384:
+                        raise ValueError("cabeceras de parte demasiado largas")
+                    return
+                headers = HTTPHeaders.parse(self._buf[:i].decode("utf-8", errors="replace"))
+                self._buf = self._buf[i + 4:]
+                self._sink = self._on_part(headers)
+                self._state = "body"
+            elif self._state == "body":
+                i = self._buf.find(self._delim)
+                if i < 0:
+                    # Lo último puede ser el comienzo de un delimitador
+                    keep = len(self._delim) - 1
+                    if len(self._buf) > keep:
+                        self._emit(self._buf[:-keep])
+                        self._buf = self._buf[-keep:]
+                    return
+                self._emit(self._buf[:i])
+                self._buf = self._buf[i + len(self._delim):]
+                self._sink = None
+                self._state = "after_delim"
+            else:
+                return
+
+    def _emit(self, data: bytes):
+        if data and self._sink is not None:
+            self._sink(data)
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+
+def _disposition(headers: HTTPHeaders) -> Dict[str, Optional[str]]:
+    msg = Message()
+    msg["content-disposition"] = headers.get("Content-Disposition", "")
+    return {
+        "name": msg.get_param("name", header="content-disposition"),
+        "filename": msg.get_param("filename", header="content-disposition"),
+    }
+
+
+def build_settings(params: Dict[str, str]) -> Dict:
+    """Ajustes del trabajo a partir de los parámetros; ValueError si no son válidos."""
+    model = params.get("model") or "medium"
+    precision = params.get("precision") or "Equilibrado"
+    profile = params.get("profile") or "voz"
+    language = params.get("language") or "es"
+    if model not in set(ALL_MODEL_OPTIONS.values()):
+        raise ValueError(f"model debe ser uno de {sorted(set(ALL_MODEL_OPTIONS.values()))}")
+    if precision not in PRECISION_LEVELS:
+        raise ValueError(f"precision debe ser uno de {PRECISION_LEVELS}")
+    if profile not in AUDIO_PROFILE_ALIASES:
+        raise ValueError(f"profile debe ser uno de {sorted(AUDIO_PROFILE_ALIASES)}")
+    if language not in _LANGUAGE_LABELS:
+        raise ValueError(f"language debe ser uno de {sorted(_LANGUAGE_LABELS)}")
+    draft_model = params.get("draft_model") or ""
+    draft_precision = params.get("draft_precision") or "Rápido"
+    if draft_model and draft_model not in set(ALL_MODEL_OPTIONS.values()):
+        raise ValueError(f"draft_model debe ser uno de {sorted(set(ALL_MODEL_OPTIONS.values()))}")
+    if draft_precision not in PRECISION_LEVELS:
+        raise ValueError(f"draft_precision debe ser uno de {PRECISION_LEVELS}")
+    settings = headless_settings(model, precision, AUDIO_PROFILE_ALIASES[profile], _LANGUAGE_LABELS[language])
+    settings.update(draft_model=draft_model, draft_precision=draft_precision)
+    return settings
+
+
+def _job_summary(job: Dict) -> Dict:
+    jobs = get_job_manager()
+    out = {k: job.get(k) for k in (
+        "id", "label", "state", "stage", "progress", "message", "error",
+        "created_at", "started_at", "finished_at",
+    )}
+    out["queue_position"] = jobs.queue_position(job["id"])
+    out["segments_done"] = len(job.get("partial") or [])
+    result = job.get("result")
+    if result:
+        out["duration_sec"] = result["duration_sec"]
+        out["cache_hit"] = result["cache_hit"]
+        out["timings"] = result["timings"]
+        out["two_pass"] = result["stats"].get("two_pass")
+    return out
+
+
+class _JSONHandler(tornado.web.RequestHandler):
+    def write_json(self, data: Dict, status: int = 200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(data, ensure_ascii=False))
+
+    def write_error(self, status_code: int, **kwargs):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps({"error": self._reason}, ensure_ascii=False))
+
+    def get_job(self, job_id: str) -> Dict:
+        job = get_job_manager().get(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason="trabajo no encontrado")
+        return job
+
+
+class UploadBudget:
+    """
+    Subidas en curso y bytes retenidos en memoria. Todo corre en el hilo del
+    IOLoop, así que no hace falta lock. Los bytes de una subida pasan al
+    trabajo al encolarla y se liberan cuando el trabajo llega a un estado
+    final (transcription_job suelta el buffer al terminar).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._uploads: Dict[int, int] = {}  # id(handler) -> bytes recibidos
+        self._jobs: Dict[str, int] = {}     # id de trabajo -> bytes
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._uploads)
+
+    def held_bytes(self) -> int:
+        jobs = get_job_manager()
+        for job_id in list(self._jobs):
+            job = jobs.get(job_id)
+            if job is None or job["state"] in FINAL_STATES:
+                del self._jobs[job_id]
+        return sum(self._uploads.values()) + sum(self._jobs.values())
+
+    def begin(self, handler):
+        self._uploads[id(handler)] = 0
+
+    def add(self, handler, n: int) -> bool:
+        """Suma n bytes a la subida; False si se pasa del límite total."""
+        self._uploads[id(handler)] = self._uploads.get(id(handler), 0) + n
+        return self.held_bytes() <= self.max_bytes
+
+    def hand_over(self, handler, job_id: str):
+        self._jobs[job_id] = self._uploads.pop(id(handler), 0)
+
+    def end(self, handler):
+        self._uploads.pop(id(handler), None)
+
+
+_UPLOADS = UploadBudget(API_MAX_BUFFERED_MB * 1024 * 1024)
+
+
+@tornado.web.stream_request_body
+class SubmitHandler(_JSONHandler):
+    def prepare(self):
+        if self.request.method != "POST":
+            return
+        # Contrapresión: se rechaza antes de recibir el cuerpo. Las subidas en
+        # curso cuentan como en cola (todavía no llegaron al JobManager)
+        if get_job_manager().queue_length() + _UPLOADS.in_flight >= API_MAX_QUEUED:
+            self._busy("demasiados trabajos en cola, reintenta más tarde")
+
+        max_bytes = API_MAX_MB * 1024 * 1024
+        self.request.connection.set_max_body_size(max_bytes + 64 * 1024)
+        length = int(self.request.headers.get("Content-Length") or 0)
+        if length > max_bytes + 64 * 1024:
+            raise tornado.web.HTTPError(413, reason=f"el archivo excede {API_MAX_MB} MB")
+        if _UPLOADS.held_bytes() + length > _UPLOADS.max_bytes:
+            self._busy("demasiados datos en memoria, reintenta más tarde")
+        _UPLOADS.begin(self)
+
+        self._params = {k: self.get_query_argument(k) for k in self.request.query_arguments}
+        self._hash = hashlib.sha256()
+        self._data = bytearray()
+        self._filename = self._params.get("filename")
+        self._fields: Dict[str, bytearray] = {}
+
+        ctype = self.request.headers.get("Content-Type", "")
+        m = re.search(r"boundary=\"?([^\";]+)\"?", ctype)
+        if ctype.startswith("multipart/form-data") and m:
+            self._multipart = MultipartStream(m.group(1).encode(), self._on_part)
+        else:
+            self._multipart = None
+
+    def _busy(self, reason: str):
+        self.set_header("Retry-After", "30")
+        raise tornado.web.HTTPError(503, reason=reason)
+
+    def on_finish(self):
+        _UPLOADS.end(self)
+
+    def on_connection_close(self):
+        _UPLOADS.end(self)
+        super().on_connection_close()
+
+    def _append_file(self, data: bytes):
+        if len(self._data) + len(data) > API_MAX_MB * 1024 * 1024:
+            raise tornado.web.HTTPError(413, reason=f"el archivo excede {API_MAX_MB} MB")
+        if not _UPLOADS.add(self, len(data)):
+            self._busy("demasiados datos en memoria, reintenta más tarde")
+        self._hash.update(data)
+        self._data += data
+
+    def _on_part(self, headers: HTTPHeaders):
+        disp = _disposition(headers)
+        if disp["filename"] is not None:
+            if self._data:
+                return None  # un solo archivo por envío
+            self._filename = self._filename or disp["filename"]
+            return self._append_file
+        if disp["name"]:
+            field = self._fields.setdefault(disp["name"], bytearray())
+
+            def sink(data: bytes):
+                if len(field) + len(data) > _MAX_FIELD_BYTES:
+                    raise tornado.web.HTTPError(400, reason=f"campo {disp['name']} demasiado largo")
+                field.extend(data)
+            return sink
+        return None
+
+    def data_received(self, chunk: bytes):
+        if self._multipart is not None:
+            try:
+                self._multipart.feed(chunk)
+            except ValueError as e:
+                raise tornado.web.HTTPError(400, reason=str(e))
+        else:
+            self._append_file(chunk)
+
+    def post(self):
+        params = {k: v.decode("utf-8", errors="replace") for k, v in self._fields.items()}
+        params.update(self._params)
+        filename = (self._filename or "upload").replace("\\", "/").rsplit("/", 1)[-1]
+
+        if not self._data:
+            raise tornado.web.HTTPError(400, reason="falta el archivo (campo multipart con filename, o cuerpo crudo)")
+        # Sin extensión no se puede validar el formato (ni elegir cómo leerlo)
+        if not is_supported_file(filename):
+            raise tornado.web.HTTPError(415, reason=f"formato no soportado o sin extensión: {filename}")
+        try:
+            settings = build_settings(params)
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+
+        jobs = get_job_manager()
+        job_id = jobs.submit(
+            transcription_job,
+            MediaSource(self._data, filename),
+            settings,
+            file_hash=self._hash.hexdigest(),
+            max_duration_sec=API_MAX_MINUTES * 60,
+            label=filename,
+            # El resultado se post-procesa con los ajustes de este envío
+            meta={"text_settings": {k: settings[k] for k in POSTPROCESS_SETTINGS}},
+        )
+        self._data = bytearray()  # la referencia queda solo en el trabajo
+        _UPLOADS.hand_over(self, job_id)
+        self.set_header("Location", f"/jobs/{job_id}")
+        self.write_json({
+            "id": job_id,
+            "status_url": f"/jobs/{job_id}",
+            "events_url": f"/jobs/{job_id}/events",
+            "result_url": f"/jobs/{job_id}/result",
+            "queue_position": jobs.queue_position(job_id),
+        }, status=202)
+
+
+class JobHandler(_JSONHandler):
+    def get(self, job_id: str):
+        self.write_json(_job_summary(self.get_job(job_id)))
+
+    def delete(self, job_id: str):
+        self.get_job(job_id)
+        cancelled = get_job_manager().cancel(job_id)
+        self.write_json({"id": job_id, "cancelled": cancelled})
+
+
+class EventsHandler(_JSONHandler):
+    """
+    Server-sent events. Cada evento lleva id = seq del JobManager: un cliente
+    que se reconecta con Last-Event-ID recibe solo lo que le faltó.
+
+      event: progress  {"stage", "progress", "message", "state"…}
+      event: segment   {"index", "start", "end", "text", …}
+      event: end       resumen del trabajo (y se cierra la conexión)
+    """
+
+    async def get(self, job_id: str):
+        jobs = get_job_manager()
+        self.get_job(job_id)
+
+        self.set_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")
+
+        try:
+            last = int(self.request.headers.get("Last-Event-ID") or self.get_query_argument("since", "-1"))
+        except ValueError:
+            last = -1
+
+        loop = tornado.ioloop.IOLoop.current()
+        inbox: tornado.queues.Queue = tornado.queues.Queue()
+
+        def listener(event: Dict):
+            # Llega desde el hilo del trabajo: se pasa al IOLoop
+            loop.add_callback(inbox.put_nowait, event)
+
+        # Primero el listener y después el historial: no se pierde nada en medio.
+        # Se corta al enviar el evento que deja el trabajo en un estado final
+        # (los segmentos previos ya salieron en orden de seq).
+        jobs.add_listener(job_id, listener)
+        try:
+            finished = False
+            for event in jobs.events(job_id, last + 1):
+                last = await self._send(event)
+                finished = finished or event.get("state") in FINAL_STATES
+            if not finished and self.get_job(job_id)["state"] in FINAL_STATES:
+                # Terminó mientras se enviaba el historial, o ya salió de memoria
+                # (se lee del disco y no le quedan eventos)
+                for event in jobs.events(job_id, last + 1):
+                    last = await self._send(event)
+                finished = True
+            while not finished:
+                try:
+                    event = await inbox.get(timeout=loop.time() + _KEEPALIVE_SEC)
+                except QueueTimeout:
+                    self.write(": keepalive\n\n")
+                    await self.flush()
+                    continue
+                if event["seq"] > last:
+                    last = await self._send(event)
+                    finished = event.get("state") in FINAL_STATES
+            self.write(f"event: end\ndata: {json.dumps(_job_summary(self.get_job(job_id)), ensure_ascii=False)}\n\n")
+            await self.flush()
+        except StreamClosedError:
+            pass
+        finally:
+            jobs.remove_listener(job_id, listener)
+
+    async def _send(self, event: Dict) -> int:
+        if "partial" in event:
+            name, data = "segment", event["partial"]
+        else:
+            name, data = "progress", {k: v for k, v in event.items() if k not in ("t", "seq", "traceback")}
+        self.write(f"id: {event['seq']}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+        await self.flush()
+        return event["seq"]
+
+
+class ResultHandler(_JSONHandler):
+    def get(self, job_id: str):
+        job = self.get_job(job_id)
+        if job["state"] == JOB_DONE:
+            raw_text, stats = job["result"]["raw_text"], job["result"]["stats"]
+        elif job["state"] == JOB_CANCELLED:
+            segments = [seg for seg in job.get("partial") or [] if seg["text"]]
+            raw_text, stats = "\n".join(seg["text"] for seg in segments), None
+        else:
+            raise tornado.web.HTTPError(409, reason=f"el trabajo está en estado {job['state']}")
+
+        settings = (job.get("meta") or {}).get("text_settings") or build_settings({})
+        text = postprocess_transcript(
+            raw_text,
+            clean_text=settings["clean_text"],
+            normalize_elongations=settings["normalize_elongations"],
+            max_consecutive_repeats=settings["max_consecutive_repeats"],
+        )
+        if self.get_query_argument("format", "txt") == "json":
+            self.write_json({"id": job_id, "state": job["state"], "text": text, "raw_text": raw_text, "stats": stats})
+            return
+
+        name = (job.get("label") or job_id).rsplit(".", 1)[0]
+        self.set_header("Content-Type", "text/plain; charset=utf-8")
+        self.set_header("Content-Disposition", f'attachment; filename="{name}.txt"')
+        self.finish(text)
+
+
+class TraceHandler(_JSONHandler):
+    """Spans del trabajo (con VIDEOSCRIBE_TRACE): se guardan al terminar."""
+
+    def get(self, job_id: str):
+        trace = load_trace(job_id)
+        if trace is None:
+            raise tornado.web.HTTPError(404, reason="traza no encontrada")
+        self.write_json(trace)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Métricas de este proceso en formato texto de Prometheus."""
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(metrics_text())
+
+
+class HealthHandler(_JSONHandler):
+    def get(self):
+        jobs = get_job_manager()
+        warmup = get_warmup()
+        self.write_json({
+            "status": "ok",
+            "queued": jobs.queue_length(),
+            "max_queued": API_MAX_QUEUED,
+            "warmup": warmup.status()["state"] if warmup else None,
+            # Cargas/desalojos recientes: cuánto pesa cada modelo y si el presupuesto alcanza
+            "models": dict(get_model_registry().stats(), events=get_model_registry().events()[-20:]),
+        })
+
+
+class ReadyHandler(_JSONHandler):
+    """Readiness probe: el balanceador no manda tráfico hasta que la precarga termina."""
+
+    def get(self):
+        warmup = get_warmup()
+        if warmup is None:
+            self.write_json({"ready": True})
+            return
+        status = warmup.status()
+        self.write_json(status, status=200 if status["ready"] else 503)
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/jobs", SubmitHandler),
+        (r"/jobs/([0-9a-f]+)", JobHandler),
+        (r"/jobs/([0-9a-f]+)/events", EventsHandler),
+        (r"/jobs/([0-9a-f]+)/result", ResultHandler),
+        (r"/jobs/([0-9a-f]+)/trace", TraceHandler),
+        (r"/metrics", MetricsHandler),
+        (r"/health", HealthHandler),
+        (r"/ready", ReadyHandler),
+    ])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="API HTTP de transcripción.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument(
+        "--warm",
+        action="append",
+        default=[],
+        help="modelo a precargar y dejar fijado (se puede repetir; por defecto VIDEOSCRIBE_WARMUP)",
+    )
+    args = parser.parse_args(argv)
+    set_process_role("api")
+
+    # En segundo plano: el servidor escucha de inmediato y /ready responde 503 hasta terminar
+    warmup = start_warmup(args.warm or None, pin=bool(args.warm))
+
+    # El límite real lo aplica SubmitHandler por petición
+    make_app().listen(args.port, address=args.host, max_body_size=API_MAX_MB * 1024 * 1024 + 64 * 1024)
+    print(f"--- API escuchando en http://{args.host}:{args.port} ---", flush=True)
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        warmup.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
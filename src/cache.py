@@ -0,0 +1,186 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from .config import CACHE_DIR, CACHE_MAX_MB, two_pass_enabled, escalation_thresholds
+
+
+def hash_buffer(data, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 de un archivo que ya está en memoria (p. ej. UploadedFile.getbuffer())."""
+    h = hashlib.sha256()
+    view = memoryview(data)
+    for i in range(0, view.nbytes, chunk_size):
+        h.update(view[i:i + chunk_size])
+    return h.hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 de un archivo en disco, leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_keys(file_hash: str, settings: Dict, decode_kwargs: Dict) -> Dict[str, str]:
+    """
+    Claves por etapa. Cada una encadena la anterior, así un cambio en una
+    etapa temprana invalida todas las siguientes:
+
+      pcm        -> hash del archivo + normalización
+      audio      -> pcm + separación de voz (si aplica)
+      transcript -> audio + modelo + decode kwargs + segmentación
+                    (+ borrador y umbrales si hay dos pasadas)
+    """
+    pcm = make_key("pcm", file_hash, bool(settings.get("normalize_audio")))
+
+    use_vocals = bool(settings.get("use_vocals")) and "Música" in settings["audio_profile"]
+    audio = make_key("vocals", pcm, "htdemucs") if use_vocals else pcm
+
+    parts = [
+        "transcript",
+        audio,
+        settings["model_key"],
+        bool(settings.get("int8")),
+        decode_kwargs,
+        bool(settings.get("auto_silence", True)),
+        settings["silence_db"],
+        settings["min_silence"],
+        settings["min_segment"],
+        bool(settings.get("pack_segments", True)),
+    ]
+    if two_pass_enabled(settings):
+        # Solo en dos pasadas: las claves de una pasada no cambian
+        parts += [settings["draft_model"], settings.get("draft_precision", "Rápido"), escalation_thresholds(settings)]
+    transcript = make_key(*parts)
+    return {"pcm": pcm, "audio": audio, "transcript": transcript}
+
+
+class ResultCache:
+    """
+    Caché en disco direccionada por contenido, con desalojo LRU por tamaño.
+
+    - Cada entrada es un archivo <key>.npy (audio) o <key>.json (textos/stats).
+    - Un acierto actualiza el mtime; al superar max_bytes se borran primero
+      las entradas con mtime más antiguo.
+    - Las escrituras son atómicas (archivo temporal + os.replace).
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _write_atomic(self, path: str, write_fn):
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            write_fn(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                if name.endswith(".tmp"):
+                    continue
+                p = os.path.join(self.root, name)
+                try:
+                    info = os.stat(p)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, p))
+                total += info.st_size
+
+            entries.sort()
+            for _mtime, size, p in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(p)
+                    total -= size
+                except OSError:
+                    pass
+
+    def get_array(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key, ".npy")
+        try:
+            arr = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return arr
+
+    def put_array(self, key: str, arr: np.ndarray):
+        # np.save agrega .npy si el nombre no lo trae: se abre el archivo a mano
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, arr, allow_pickle=False)
+        self._write_atomic(self._path(key, ".npy"), write)
+
+    def get_json(self, key: str) -> Optional[Dict]:
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return data
+
+    def put_json(self, key: str, data: Dict):
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        self._write_atomic(self._path(key, ".json"), write)
+
+
+class NullCache:
+    """Misma interfaz que ResultCache, sin guardar nada (benchmarks, --no-cache)."""
+
+    def get_array(self, key: str) -> Optional[np.ndarray]:
+        return None
+
+    def put_array(self, key: str, arr: np.ndarray):
+        pass
+
+    def get_json(self, key: str) -> Optional[Dict]:
+        return None
+
+    def put_json(self, key: str, data: Dict):
+        pass
+
+
+_CACHE: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ResultCache(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024)
+    return _CACHE
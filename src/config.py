@@ -31,12 +31,78 @@ AUDIO_PROFILES = [
     "Música / ruido (canciones, conciertos, fondo fuerte)",
 ]
 
+# Nombres cortos de los perfiles para CLI / API
+AUDIO_PROFILE_ALIASES = {
+    "voz": AUDIO_PROFILES[0],
+    "musica": AUDIO_PROFILES[1],
+}
+
 PRECISION_LEVELS = [
     "Rápido",
     "Equilibrado",
     "Máxima precisión",
 ]
 
+# Caché de resultados en disco (PCM, voz separada y textos por segmento)
+CACHE_DIR = os.getenv("VIDEOSCRIBE_CACHE_DIR", "cache")
+CACHE_MAX_MB = int(os.getenv("VIDEOSCRIBE_CACHE_MAX_MB", "2048"))
+
+# Trabajos en segundo plano: máximo de transcripciones pesadas simultáneas por host
+MAX_CONCURRENT_JOBS = int(os.getenv("VIDEOSCRIBE_MAX_JOBS", "2"))
+JOBS_DIR = os.getenv("VIDEOSCRIBE_JOBS_DIR", "jobs")
+# Trabajos terminados en memoria (los más viejos se siguen leyendo de JOBS_DIR)
+# y días que se conserva cada <id>.json en disco
+JOBS_KEEP_FINISHED = int(os.getenv("VIDEOSCRIBE_JOBS_KEEP", "50"))
+JOBS_MEMORY_TTL_SEC = float(os.getenv("VIDEOSCRIBE_JOBS_MEMORY_TTL_MIN", "60")) * 60
+JOBS_DISK_TTL_SEC = float(os.getenv("VIDEOSCRIBE_JOBS_TTL_DAYS", "7")) * 86400
+
+# Presupuesto de RAM para modelos residentes (Whisper + Demucs).
+# 0 = automático (la mitad de la RAM del equipo).
+MODEL_RAM_BUDGET_MB = int(os.getenv("VIDEOSCRIBE_MODEL_RAM_MB", "0"))
+
+# Inferencia int8 (cuantización dinámica de las capas Linear, solo CPU).
+# VIDEOSCRIBE_INT8: "off" | "all" | presets separados por coma ("Rápido,Equilibrado").
+# Por defecto solo en Rápido; el usuario lo puede cambiar en "Rendimiento".
+INT8_MODE = (os.getenv("VIDEOSCRIBE_INT8") or "Rápido").strip()
+
+# Contador de usos por cliente (rate limit), SQLite compartido entre sesiones
+RATE_LIMIT_DB = os.getenv("VIDEOSCRIBE_RATE_LIMIT_DB", "limit_tracker.db")
+
+# API HTTP (src/api.py): tamaño máximo de subida, trabajos en cola antes de
+# responder 503 y duración máxima (0 = sin límite)
+API_MAX_MB = int(os.getenv("VIDEOSCRIBE_API_MAX_MB", "250"))
+API_MAX_QUEUED = int(os.getenv("VIDEOSCRIBE_API_MAX_QUEUED", "16"))
+API_MAX_MINUTES = float(os.getenv("VIDEOSCRIBE_API_MAX_MINUTES", "0"))
+# Bytes de subidas retenidos en memoria a la vez (en curso + en cola sin decodificar)
+API_MAX_BUFFERED_MB = int(os.getenv("VIDEOSCRIBE_API_MAX_BUFFERED_MB", "1024"))
+
+# Presupuesto de re-decodificaciones por temperatura (escalera de fallback):
+# promedio permitido por ventana en un trabajo. < 0 = sin límite.
+FALLBACK_BUDGET = float(os.getenv("VIDEOSCRIBE_FALLBACK_BUDGET", "0.5"))
+
+# Dos pasadas (borrador con un modelo/preset rápido + revisión selectiva):
+# un segmento del borrador se vuelve a decodificar con el modelo elegido si
+# su peor ventana queda fuera de estos umbrales.
+DRAFT_LOGPROB_THRESHOLD = float(os.getenv("VIDEOSCRIBE_DRAFT_LOGPROB", "-0.6"))
+DRAFT_NO_SPEECH_THRESHOLD = float(os.getenv("VIDEOSCRIBE_DRAFT_NO_SPEECH", "0.4"))
+DRAFT_COMPRESSION_THRESHOLD = float(os.getenv("VIDEOSCRIBE_DRAFT_COMPRESSION", "2.2"))
+
+# Precarga al arrancar (src/warmup.py): "off" | "all" (los de get_model_options)
+# | claves separadas por coma ("small,medium"). Se cargan en segundo plano y
+# se corre una inferencia corta sobre silencio.
+WARMUP_MODELS = (os.getenv("VIDEOSCRIBE_WARMUP") or "off").strip()
+# Archivo que existe solo cuando la precarga terminó ("" = no se escribe):
+# sirve de readiness probe para el balanceador
+READY_FILE = os.getenv("VIDEOSCRIBE_READY_FILE", "")
+
+# Trazas por etapa/segmento (src/tracing.py). Apagado = costo casi nulo.
+TRACING_ENABLED = (os.getenv("VIDEOSCRIBE_TRACE") or "").strip().lower() in {"1", "true", "yes", "on"}
+TRACE_DIR = os.getenv("VIDEOSCRIBE_TRACE_DIR", "traces")
+# Métricas en formato texto de Prometheus (para node_exporter textfile o similar).
+# Cada proceso escribe el suyo: al nombre se le agrega rol y PID
+# (traces/videoscribe.api-1234.prom). La API también las sirve en /metrics.
+METRICS_FILE = os.getenv("VIDEOSCRIBE_METRICS_FILE", os.path.join(TRACE_DIR, "videoscribe.prom"))
+
 
 def is_streamlit_cloud() -> bool:
     """
@@ -71,3 +137,85 @@ def get_model_options() -> dict:
     Retorna el catálogo de modelos disponible según el entorno.
     """
     return CLOUD_SAFE_MODEL_OPTIONS if is_streamlit_cloud() else ALL_MODEL_OPTIONS
+
+
+def int8_default(precision: str) -> bool:
+    """
+    ¿Este despliegue usa el modelo int8 para el preset dado?
+    """
+    mode = INT8_MODE.lower()
+    if mode in {"", "off", "0", "false"}:
+        return False
+    if mode in {"all", "1", "true"}:
+        return True
+    presets = {p.strip() for p in INT8_MODE.split(",")}
+    return precision in presets
+
+
+def warmup_model_keys() -> list:
+    """
+    Modelos Whisper a precargar según VIDEOSCRIBE_WARMUP (solo los que este
+    entorno ofrece en get_model_options).
+    """
+    mode = WARMUP_MODELS.lower()
+    available = list(dict.fromkeys(get_model_options().values()))
+    if mode in {"", "off", "0", "false"}:
+        return []
+    if mode in {"all", "1", "true"}:
+        return available
+    wanted = [k.strip() for k in WARMUP_MODELS.split(",") if k.strip()]
+    return [k for k in wanted if k in available]
+
+
+def two_pass_enabled(settings: dict) -> bool:
+    """
+    ¿Borrador + revisión? Solo si el borrador usa otro modelo u otro preset.
+    """
+    draft = settings.get("draft_model")
+    if not draft:
+        return False
+    return (draft, settings.get("draft_precision", "Rápido")) != (settings["model_key"], settings["precision"])
+
+
+def escalation_thresholds(settings: dict) -> dict:
+    """
+    Umbrales de confianza del borrador (los ajustes pueden sobrescribir los
+    de entorno con draft_logprob / draft_no_speech / draft_compression).
+    """
+    return {
+        "logprob": float(settings.get("draft_logprob", DRAFT_LOGPROB_THRESHOLD)),
+        "no_speech": float(settings.get("draft_no_speech", DRAFT_NO_SPEECH_THRESHOLD)),
+        "compression_ratio": float(settings.get("draft_compression", DRAFT_COMPRESSION_THRESHOLD)),
+    }
+
+
+def headless_settings(model_key: str, precision: str, audio_profile: str, language_label: str = "Español") -> dict:
+    """
+    Mismo dict que arma ui.sidebar_settings, con los valores por defecto de la
+    UI para el perfil dado, pero sin Streamlit (CLI, benchmarks, servicios).
+    """
+    is_music = "Música" in audio_profile
+    return {
+        "language_label": language_label,
+        "language_code": LANG_OPTIONS[language_label],
+        "model_label": model_key,
+        "model_key": model_key,
+        "audio_profile": audio_profile,
+        "precision": precision,
+        "normalize_audio": True,
+        "use_vocals": False,
+        "clean_text": True,
+        "normalize_elongations": is_music,
+        "max_consecutive_repeats": 6 if is_music else 3,
+        "auto_silence": True,
+        "silence_db": -35 if is_music else -40,
+        "min_silence": 0.30 if is_music else 0.45,
+        "min_segment": 1.20 if is_music else 1.50,
+        "pack_segments": True,
+        "batch_decode": True,
+        "parallel_workers": 1,
+        "int8": int8_default(precision),
+        "draft_model": "",
+        "draft_precision": "Rápido",
+        "secret_code": "",
+    }
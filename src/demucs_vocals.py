@@ -1,87 +1,67 @@
-import sys
-import subprocess
-import shutil
-import uuid
-from pathlib import Path
-from typing import Optional
+import numpy as np
 
+from .model_registry import get_model_registry
 
-def separate_vocals_demucs(
-    input_wav: str,
-    out_root: str = "demucs_out",
-    model_name: str = "htdemucs",
-    device: str = "cpu",
-    mp3_bitrate: int = 256,
-) -> tuple[str, str]:
-    """
-    Ejecuta Demucs y retorna:
-      (ruta_a_vocals_mp3, carpeta_run_dir)
+# Modelo por defecto (mismo que usaba el CLI: -n htdemucs)
+DEMUCS_MODEL = "htdemucs"
 
-    - Usamos --mp3 para evitar guardado WAV vía torchaudio/torchcodec en Windows.
-    - Requiere ffmpeg en PATH.
-    - out_root se usa como raíz, pero cada ejecución crea un subfolder único.
-    """
-    input_path = Path(input_wav)
-    if not input_path.exists():
-        raise RuntimeError(f"No existe el archivo de entrada: {input_wav}")
 
-    out_root_path = Path(out_root)
-    out_root_path.mkdir(parents=True, exist_ok=True)
+def _load_demucs(model_name: str):
+    from demucs.pretrained import get_model
 
-    # Carpeta única por ejecución (evita colisiones y facilita limpieza)
-    run_id = uuid.uuid4().hex[:10]
-    run_dir = out_root_path / f"run_{run_id}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    model = get_model(model_name)
+    model.cpu()
+    model.eval()
+    return model
 
-    cmd = [
-        sys.executable, "-m", "demucs",
-        "-n", model_name,
-        "--two-stems=vocals",
-        "-d", device,
-        "--mp3",
-        "--mp3-bitrate", str(mp3_bitrate),
-        "--filename", "{stem}.{ext}",
-        "-o", str(run_dir),
-        str(input_path),
-    ]
 
-    r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+def demucs_model(model_name: str = DEMUCS_MODEL):
+    """
+    Context manager: pesos de Demucs residentes en el registro de modelos
+    (igual que whisper_model para Whisper).
+    """
+    return get_model_registry().lease(f"demucs:{model_name}", lambda: _load_demucs(model_name))
 
-    if r.returncode != 0:
-        err_tail = (r.stderr or "").strip()
-        out_tail = (r.stdout or "").strip()
-        raise RuntimeError(
-            "Demucs falló separando la voz.\n\n"
-            f"Comando:\n{' '.join(cmd)}\n\n"
-            f"STDOUT:\n{out_tail[-1500:]}\n\n"
-            f"STDERR:\n{err_tail[-2000:]}\n"
-        )
 
-    stem = input_path.stem
+def separate_vocals(
+    audio: np.ndarray,
+    sr: int = 16000,
+    model_name: str = DEMUCS_MODEL,
+    device: str = "cpu",
+    shifts: int = 1,
+    overlap: float = 0.25,
+) -> np.ndarray:
+    """
+    Separa la voz en memoria, sin subprocess ni MP3 intermedio.
 
-    # Salida típica: <run_dir>/<model_name>/<stem>/vocals.mp3
-    vocals_mp3 = run_dir / model_name / stem / "vocals.mp3"
-    if vocals_mp3.exists():
-        return str(vocals_mp3), str(run_dir)
+    Entrada y salida: float32 mono a `sr` (16 kHz para Whisper).
+    Internamente se remuestrea a la frecuencia/canales del modelo y se
+    normaliza igual que `python -m demucs`.
+    """
+    # demucs y torch solo se cargan si se pide separar la voz
+    import torch
+    from demucs.apply import apply_model
+    from demucs.audio import convert_audio
 
-    # Búsqueda defensiva
-    candidates = list((run_dir / model_name).glob("**/vocals.mp3"))
-    if candidates:
-        return str(candidates[0]), str(run_dir)
+    with demucs_model(model_name) as model:
+        wav = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))[None]
+        wav = convert_audio(wav, sr, model.samplerate, model.audio_channels)
 
-    raise RuntimeError(
-        "Demucs terminó sin error, pero no se encontró vocals.mp3. "
-        f"Revisa: {run_dir / model_name}"
-    )
+        ref = wav.mean(0)
+        mean, std = ref.mean(), ref.std()
+        wav = (wav - mean) / (std + 1e-8)
 
+        with torch.no_grad():
+            sources = apply_model(
+                model,
+                wav[None],
+                device=device,
+                shifts=shifts,
+                split=True,
+                overlap=overlap,
+                progress=False,
+            )[0]
 
-def cleanup_demucs_artifacts(run_dir: Optional[str]) -> None:
-    """
-    Borra la carpeta temporal de Demucs (run_dir).
-    Llamar en finally() para evitar acumulación en servidor.
-    """
-    if not run_dir:
-        return
-    p = Path(run_dir)
-    if p.exists() and p.is_dir():
-        shutil.rmtree(p, ignore_errors=True)
+        vocals = sources[model.sources.index("vocals")] * std + mean
+        vocals = convert_audio(vocals, model.samplerate, sr, 1)[0]
+    return vocals.cpu().numpy().astype(np.float32)
@@ -1,6 +1,16 @@
 import os
-import json
+import re
+import tempfile
+import threading
 import subprocess
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .silence import parse_silencedetect, silencedetect_filter
+
+# Formato que espera Whisper
+SAMPLE_RATE = 16000
 
 # Extensiones de audio reconocidas
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".flac", ".m4a", ".aac", ".wma", ".opus"}
@@ -9,6 +19,37 @@ AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".flac", ".m4a", ".aac", ".wma", ".o
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".wmv", ".flv"}
 
 
+# Contenedores ISO-BMFF: sin "faststart" el índice (moov) va al final y
+# ffmpeg necesita poder saltar hacia él (no se puede leer desde un pipe)
+SEEKABLE_EXTENSIONS = {".mp4", ".mov", ".m4a", ".3gp"}
+
+# "Duration: 00:01:02.34" en el log de ffmpeg (N/A si no la conoce)
+_DURATION_RE = re.compile(rb"Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+class MediaSource:
+    """
+    Archivo subido que está en memoria (bytes o memoryview, p. ej.
+    UploadedFile.getbuffer()) con su nombre original. decode_to_pcm16k lo
+    envía a ffmpeg por stdin sin escribirlo en el directorio de trabajo.
+    """
+
+    def __init__(self, data, name: str):
+        self.data = memoryview(data)
+        self.name = name
+
+    def __len__(self) -> int:
+        return self.data.nbytes
+
+    def release(self):
+        """Suelta la referencia al buffer (el UploadedFile se puede liberar)."""
+        self.data.release()
+
+
+class MediaTooLong(ValueError):
+    """La duración del archivo supera el máximo permitido."""
+
+
 def is_audio_file(path: str) -> bool:
     """Retorna True si la extensión del archivo es de audio."""
     return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
@@ -24,39 +65,197 @@ def is_supported_file(path: str) -> bool:
     return is_audio_file(path) or is_video_file(path)
 
 
-def get_media_duration(file_path: str) -> float:
+def parse_duration(log: bytes) -> Optional[float]:
+    """Duración (s) de la primera línea "Duration:" del log de ffmpeg, o None."""
+    m = _DURATION_RE.search(log)
+    if not m:
+        return None
+    h, mnt, sec = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+
+def needs_seekable_input(data: memoryview, name: str) -> bool:
     """
-    Obtiene la duración de un archivo de audio o video usando FFprobe.
-    Funciona con cualquier formato soportado por FFmpeg.
+    True si ffmpeg no puede leer el archivo desde un pipe: MP4/MOV cuyo átomo
+    moov (índice) viene después de mdat (los datos), es decir, sin faststart.
+    Solo recorre las cabeceras de los átomos de primer nivel.
     """
-    cmd = [
-        "ffprobe", "-v", "quiet",
-        "-print_format", "json",
-        "-show_format",
-        file_path,
-    ]
+    if os.path.splitext(name)[1].lower() not in SEEKABLE_EXTENSIONS:
+        return False
+    pos, total = 0, data.nbytes
+    while pos + 8 <= total:
+        size = int.from_bytes(data[pos:pos + 4], "big")
+        kind = bytes(data[pos + 4:pos + 8])
+        if kind == b"moov":
+            return False
+        if kind == b"mdat":
+            return True
+        if size == 1 and pos + 16 <= total:
+            size = int.from_bytes(data[pos + 8:pos + 16], "big")
+        if size < 8:
+            break
+        pos += size
+    # Estructura rara: mejor darle a ffmpeg un archivo con seek
+    return True
+
+
+def _feed(stdin, data: memoryview, chunk_size: int):
+    # Escribe el buffer a stdin por bloques (ffmpeg empieza a decodificar con el primero)
     try:
-        r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if r.returncode == 0:
-            info = json.loads(r.stdout)
-            return float(info.get("format", {}).get("duration", 0))
-    except Exception:
+        for i in range(0, data.nbytes, chunk_size):
+            stdin.write(data[i:i + chunk_size])
+    except (BrokenPipeError, ValueError, OSError):
+        # ffmpeg terminó antes (error o se lo detuvo): el código de salida lo reporta
         pass
-    return 0.0
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def _read_log(stream, on_line: Callable[[bytes], None]):
+    # Vacía stderr en paralelo para que ffmpeg nunca se bloquee escribiendo logs
+    for line in stream:
+        on_line(line)
+
 
+def decode_to_pcm16k(
+    source: Union[str, MediaSource],
+    normalize: bool,
+    chunk_size: int = 1 << 20,
+    on_duration: Optional[Callable[[float], None]] = None,
+) -> np.ndarray:
+    """
+    Decodifica audio/video a PCM mono 16kHz con un único proceso ffmpeg y lo
+    lee por pipe directamente a un buffer NumPy (sin WAV intermedio en disco).
+
+    source puede ser una ruta o un MediaSource en memoria: este se escribe
+    por bloques en stdin desde otro hilo, así la extracción empieza de
+    inmediato. Un MP4/MOV sin faststart no se puede leer desde un pipe; ese
+    caso se copia a un temporal del sistema (nunca al directorio de trabajo).
+
+    on_duration(segundos) se llama apenas ffmpeg informa la duración del
+    archivo (en la misma pasada, sin ffprobe). Si lanza una excepción, ffmpeg
+    se detiene y la excepción se propaga.
 
-def convert_to_wav_16k_mono(input_path: str, wav_path: str, normalize: bool):
+    Retorna float32 en [-1, 1], igual que whisper.load_audio.
     """
-    Convierte un archivo de audio o video a WAV mono 16kHz.
-    Normalización ligera opcional. Requiere ffmpeg instalado.
+    return _decode_source(source, normalize, chunk_size, on_duration)[0]
+
+
+def decode_with_silences(
+    source: Union[str, MediaSource],
+    normalize: bool,
+    silence_db: int,
+    min_silence: float,
+    chunk_size: int = 1 << 20,
+    on_duration: Optional[Callable[[float], None]] = None,
+) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
     """
-    af = "loudnorm=I=-16:TP=-1.5:LRA=11" if normalize else None
+    decode_to_pcm16k + silencedetect en el mismo proceso ffmpeg: el archivo
+    se decodifica una sola vez. silencedetect no modifica el audio, así que
+    va al final de la cadena (sobre el PCM 16kHz mono ya normalizado, igual
+    que detect_silences_ffmpeg sobre el buffer). Antes va un aresample/aformat
+    explícito, el mismo resampler que aplican -ar/-ac: el PCM sale byte a byte
+    igual al de decode_to_pcm16k (tests/test_ffmpeg_audio.py), así que la
+    caché de PCM no depende del camino. No se usa asplit + anullsink: en
+    ffmpeg 7.0 esa rama falla con "best_input >= 0".
+
+    Retorna (audio, [(start, end), ...]).
+    """
+    return _decode_source(source, normalize, chunk_size, on_duration, silencedetect_filter(silence_db, min_silence))
+
+
+def _decode_source(source, normalize: bool, chunk_size: int, on_duration, detect: Optional[str] = None):
+    spill = None
+    if isinstance(source, MediaSource) and needs_seekable_input(source.data, source.name):
+        spill = tempfile.NamedTemporaryFile(suffix=os.path.splitext(source.name)[1], delete=False)
+        with spill:
+            for i in range(0, source.data.nbytes, chunk_size):
+                spill.write(source.data[i:i + chunk_size])
+        source = spill.name
+    try:
+        return _decode_pcm(source, normalize, chunk_size, on_duration, detect)
+    finally:
+        if spill is not None:
+            os.remove(spill.name)
+
 
-    cmd = ["ffmpeg", "-y", "-i", input_path, "-vn", "-ac", "1", "-ar", "16000"]
-    if af:
-        cmd += ["-af", af]
-    cmd += ["-f", "wav", wav_path]
+def _decode_pcm(source, normalize: bool, chunk_size: int, on_duration, detect: Optional[str]):
+    filters = ["loudnorm=I=-16:TP=-1.5:LRA=11"] if normalize else []
+    if detect:
+        # Conversión explícita antes de silencedetect (-ac/-ar la harían después)
+        filters += [f"aresample={SAMPLE_RATE}", "aformat=sample_fmts=s16:channel_layouts=mono", detect]
+    streaming = isinstance(source, MediaSource)
 
-    r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if r.returncode != 0:
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    cmd += ["-i", "pipe:0"] if streaming else ["-nostdin", "-i", source]
+    cmd += ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE)]
+    if filters:
+        cmd += ["-af", ",".join(filters)]
+    cmd += ["-f", "s16le", "-acodec", "pcm_s16le", "-"]
+
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if streaming else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
         raise RuntimeError("FFmpeg falló al procesar el archivo. Verifica que ffmpeg esté instalado y en el PATH.")
+
+    failure: list = []
+    silence_log: List[bytes] = []
+    seen_duration = False
+
+    def on_line(line: bytes):
+        nonlocal seen_duration
+        if detect and b"silence_" in line:
+            silence_log.append(line)
+            return
+        if seen_duration or on_duration is None or b"Duration:" not in line:
+            return
+        seen_duration = True
+        duration = parse_duration(line)
+        if duration is None:
+            return
+        try:
+            on_duration(duration)
+        except BaseException as e:
+            failure.append(e)
+            proc.kill()
+
+    threads = [threading.Thread(target=_read_log, args=(proc.stderr, on_line), daemon=True)]
+    if streaming:
+        threads.append(threading.Thread(target=_feed, args=(proc.stdin, source.data, chunk_size), daemon=True))
+    for t in threads:
+        t.start()
+
+    buf = bytearray()
+    try:
+        while True:
+            data = proc.stdout.read(chunk_size)
+            if not data:
+                break
+            buf += data
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        proc.wait()
+        for t in threads:
+            t.join()
+
+    if failure:
+        raise failure[0]
+    if proc.returncode != 0:
+        raise RuntimeError("FFmpeg falló al procesar el archivo. Verifica que ffmpeg esté instalado y en el PATH.")
+
+    # Un byte suelto al final no forma muestra s16
+    usable = len(buf) - (len(buf) % 2)
+    audio = np.frombuffer(buf, dtype=np.int16, count=usable // 2).astype(np.float32) / 32768.0
+    silences = parse_silencedetect(b"".join(silence_log).decode("utf-8", errors="replace")) if detect else None
+    return audio, silences
+
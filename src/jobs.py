@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import MAX_CONCURRENT_JOBS, JOBS_DIR, JOBS_KEEP_FINISHED, JOBS_MEMORY_TTL_SEC, JOBS_DISK_TTL_SEC
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+JOB_CANCELLED = "cancelled"
+
+FINAL_STATES = {JOB_DONE, JOB_ERROR, JOB_CANCELLED}
+
+# Guardar en disco cada evento de progreso sería excesivo: como mucho 1/seg
+_PERSIST_EVERY_SEC = 1.0
+
+# Cada cuánto se barren los <id>.json vencidos
+_SWEEP_EVERY_SEC = 3600.0
+
+
+class JobCancelled(Exception):
+    """Lo lanza el JobContext cuando el usuario detuvo el trabajo."""
+
+
+class JobContext:
+    """
+    Handle que recibe la función del trabajo para reportar progreso.
+    Se pasa como primer argumento: fn(ctx, *args, **kwargs).
+
+    progress() y partial() lanzan JobCancelled si se pidió detener el
+    trabajo: así se corta en el siguiente punto de avance sin más chequeos.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self.job_id = job_id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._manager._cancel_requested(self.job_id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def partial(self, item: Dict):
+        """Agrega un resultado parcial (p. ej. un segmento ya transcrito)."""
+        self.check_cancelled()
+        self._manager._append_partial(self.job_id, item)
+
+    def progress(self, stage: str, fraction: Optional[float] = None, message: Optional[str] = None):
+        self.check_cancelled()
+        fields: Dict = {"stage": stage}
+        if fraction is not None:
+            fields["progress"] = float(fraction)
+        if message is not None:
+            fields["message"] = message
+        self._manager._update(self.job_id, **fields)
+
+
+class JobManager:
+    """
+    Ejecutor de trabajos pesados fuera del hilo del script de Streamlit.
+
+    - Pool acotado de hilos: como máximo max_workers trabajos a la vez,
+      el resto espera en cola.
+    - Cada trabajo tiene un ID, un estado persistido en <jobs_dir>/<id>.json
+      y una lista de eventos de progreso (para polling o listeners).
+    - Memoria acotada: al terminar, los eventos de un trabajo se compactan
+      (quedan segmentos y cambios de estado); los terminados salen de memoria
+      pasados memory_ttl_sec o más allá de keep_finished y se siguen leyendo
+      del disco; los .json con más de disk_ttl_sec se borran.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        jobs_dir: str,
+        keep_finished: int = JOBS_KEEP_FINISHED,
+        memory_ttl_sec: float = JOBS_MEMORY_TTL_SEC,
+        disk_ttl_sec: float = JOBS_DISK_TTL_SEC,
+    ):
+        self.jobs_dir = jobs_dir
+        self.keep_finished = keep_finished
+        self.memory_ttl_sec = memory_ttl_sec
+        self.disk_ttl_sec = disk_ttl_sec
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._next_sweep = 0.0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="videoscribe-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._events: Dict[str, List[Dict]] = {}
+        self._listeners: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._last_persist: Dict[str, float] = {}
+        self._cancel: Dict[str, threading.Event] = {}
+
+    # ---- API pública ----
+
+    def submit(self, fn: Callable, *args, label: str = "", meta: Optional[Dict] = None, **kwargs) -> str:
+        """
+        meta: datos del envío que se guardan con el trabajo (y en su .json),
+        p. ej. los ajustes de texto con que hay que mostrar el resultado.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "label": label,
+            "meta": dict(meta or {}),
+            "state": JOB_QUEUED,
+            "stage": None,
+            "progress": 0.0,
+            "message": "En cola…",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+            "partial": [],
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._events[job_id] = []
+            self._cancel[job_id] = threading.Event()
+            self._persist(job, force=True)
+            self._prune()
+
+        self._sweep_files()
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                # La lista de parciales la sigue llenando el hilo del trabajo
+                return dict(job, partial=list(job["partial"]))
+        return self._load(job_id)
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict]:
+        """
+        Eventos con seq >= since. Vacío si el trabajo ya salió de memoria; de
+        uno terminado solo quedan sus segmentos y cambios de estado.
+        """
+        with self._lock:
+            return [e for e in self._events.get(job_id, []) if e["seq"] >= since]
+
+    def add_listener(self, job_id: str, fn: Callable[[Dict], None]):
+        with self._lock:
+            self._listeners.setdefault(job_id, []).append(fn)
+
+    def remove_listener(self, job_id: str, fn: Callable[[Dict], None]):
+        with self._lock:
+            listeners = self._listeners.get(job_id, [])
+            if fn in listeners:
+                listeners.remove(fn)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Pide detener el trabajo. Si aún está en cola no llega a correr; si está
+        corriendo se detiene en el siguiente punto de avance y conserva los
+        resultados parciales.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] in FINAL_STATES:
+                return False
+            self._cancel[job_id].set()
+            # Mismo lock que el paso a RUNNING en _run: o no llega a correr, o
+            # ya corre y se detiene en el siguiente punto de avance
+            if job["state"] == JOB_QUEUED:
+                notify = self._update_locked(job_id, state=JOB_CANCELLED, finished_at=time.time(), message="Detenido antes de empezar.")
+            else:
+                notify = self._update_locked(job_id, message="Deteniendo…")
+        self._notify(notify)
+        return True
+
+    def queue_length(self) -> int:
+        """Trabajos que esperan turno (sin contar los que ya corren)."""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["state"] == JOB_QUEUED)
+
+    def queue_position(self, job_id: str) -> int:
+        """0 si ya está corriendo (o terminó); 1 = siguiente en la cola, etc."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != JOB_QUEUED:
+                return 0
+            queued = sorted(
+                (j["created_at"], j["id"]) for j in self._jobs.values() if j["state"] == JOB_QUEUED
+            )
+            return [jid for _t, jid in queued].index(job_id) + 1
+
+    # ---- internos ----
+
+    def _run(self, job_id: str, fn: Callable, args, kwargs):
+        with self._lock:
+            if self._cancel_requested(job_id):
+                return
+            notify = self._update_locked(job_id, state=JOB_RUNNING, started_at=time.time(), message="Iniciando…")
+        self._notify(notify)
+        ctx = JobContext(self, job_id)
+        try:
+            result = fn(ctx, *args, **kwargs)
+        except JobCancelled:
+            self._update(job_id, state=JOB_CANCELLED, finished_at=time.time(), message="Detenido por el usuario.")
+            return
+        except Exception as e:
+            self._update(
+                job_id,
+                state=JOB_ERROR,
+                finished_at=time.time(),
+                error=f"{type(e).__name__}: {e}",
+                traceback=traceback.format_exc(),
+            )
+            return
+        self._update(job_id, state=JOB_DONE, progress=1.0, finished_at=time.time(), result=result)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            notify = self._update_locked(job_id, **fields)
+        self._notify(notify)
+
+    def _update_locked(self, job_id: str, **fields) -> Optional[Tuple[Dict, List]]:
+        """Aplica el cambio con el lock tomado; retorna (evento, listeners) para _notify."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+
+        # El resultado puede ser grande: no se copia en cada evento
+        event = {k: v for k, v in fields.items() if k != "result"}
+        event["t"] = time.time()
+        event["seq"] = self._next_seq(job_id)
+        self._events[job_id].append(event)
+        listeners = list(self._listeners.get(job_id, []))
+
+        self._persist(job, force="state" in fields)
+        if fields.get("state") in FINAL_STATES:
+            self._compact(job_id)
+        return event, listeners
+
+    def _notify(self, notify: Optional[Tuple[Dict, List]]):
+        # Fuera del lock: un listener puede volver a llamar al JobManager
+        if notify is None:
+            return
+        event, listeners = notify
+        for fn in listeners:
+            try:
+                fn(event)
+            except Exception:
+                pass
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        event = self._cancel.get(job_id)
+        return event is not None and event.is_set()
+
+    def _append_partial(self, job_id: str, item: Dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["partial"].append(item)
+
+            # El evento lleva solo el nuevo elemento, no la lista completa
+            event = {"partial": item, "t": time.time(), "seq": self._next_seq(job_id)}
+            self._events[job_id].append(event)
+            listeners = list(self._listeners.get(job_id, []))
+
+            self._persist(job)
+
+        self._notify((event, listeners))
+
+    def _next_seq(self, job_id: str) -> int:
+        events = self._events[job_id]
+        return events[-1]["seq"] + 1 if events else 0
+
+    def _compact(self, job_id: str):
+        """Trabajo terminado: sin los eventos de solo progreso/mensaje."""
+        self._events[job_id] = [e for e in self._events[job_id] if "partial" in e or "state" in e]
+        self._last_persist.pop(job_id, None)
+
+    def _prune(self):
+        """Saca de memoria los trabajos terminados viejos (siguen en disco). Con el lock tomado."""
+        now = time.time()
+        finished = sorted(
+            (j["finished_at"] or 0.0, j["id"]) for j in self._jobs.values() if j["state"] in FINAL_STATES
+        )
+        excess = len(finished) - max(0, self.keep_finished)
+        for i, (finished_at, job_id) in enumerate(finished):
+            if i >= excess and now - finished_at < self.memory_ttl_sec:
+                continue
+            for table in (self._jobs, self._events, self._cancel, self._listeners, self._last_persist):
+                table.pop(job_id, None)
+
+    def _sweep_files(self):
+        """Borra los <id>.json vencidos (como mucho una vez por hora)."""
+        now = time.time()
+        if self.disk_ttl_sec <= 0 or now < self._next_sweep:
+            return
+        self._next_sweep = now + _SWEEP_EVERY_SEC
+        with self._lock:
+            active = set(self._jobs)
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.split(".", 1)[0] in active:
+                continue
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.disk_ttl_sec:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: Dict, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_persist.get(job["id"], 0.0) < _PERSIST_EVERY_SEC:
+            return
+        self._last_persist[job["id"]] = now
+
+        path = self._path(job["id"])
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception:
+            pass
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except Exception:
+            return None
+
+        # Estaba en curso cuando el proceso se reinició: ya no va a terminar
+        if job.get("state") not in FINAL_STATES:
+            job["state"] = JOB_ERROR
+            job["error"] = "El trabajo se interrumpió (reinicio del servidor)."
+        return job
+
+
+_MANAGER: Optional[JobManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = JobManager(MAX_CONCURRENT_JOBS, JOBS_DIR)
+        return _MANAGER
@@ -0,0 +1,216 @@
+import gc
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from .config import MODEL_RAM_BUDGET_MB
+
+
+def model_size_bytes(model) -> int:
+    """
+    Bytes residentes de parámetros + buffers (torch.nn.Module).
+    Las capas cuantizadas guardan sus pesos empaquetados fuera de parameters():
+    se suman aparte.
+    """
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+
+    for module in model.modules():
+        if hasattr(module, "_packed_params") and hasattr(module, "_weight_bias"):
+            weight, bias = module._weight_bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return total
+
+
+def _default_budget_bytes() -> int:
+    # Sin configuración: la mitad de la RAM total (Linux), o 4 GB si no se puede leer
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024 // 2
+    except Exception:
+        pass
+    return 4 * 1024 ** 3
+
+
+class ModelRegistry:
+    """
+    Registro de modelos residentes con presupuesto de RAM y desalojo LRU.
+
+    - lease(key, loader) entrega el modelo y lo fija (refcount) mientras dure
+      el bloque with; un modelo con refcount > 0 nunca se desaloja.
+    - Al cargar o liberar, si el total supera el presupuesto se desalojan los
+      modelos libres menos usados recientemente.
+    - Cada carga/desalojo queda registrado como evento (events(), stats()),
+      se imprime en el log y se cuenta en las métricas (ver log_event).
+    """
+
+    def __init__(self, budget_bytes: int, max_events: int = 500):
+        self.budget_bytes = budget_bytes
+        # RLock: los listeners pueden consultar stats() desde _emit
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._known_sizes: Dict[str, int] = {}
+        self._events: deque = deque(maxlen=max_events)
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._counters = {"loads": 0, "hits": 0, "evictions": 0}
+
+    # ---- API pública ----
+
+    @contextmanager
+    def lease(self, key: str, loader: Callable[[], object]):
+        model = self.acquire(key, loader)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def acquire(self, key: str, loader: Callable[[], object]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._pin(key, entry)
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Un solo hilo carga cada modelo; los demás esperan y reutilizan
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._pin(key, entry)
+                # Si ya conocemos el tamaño, liberar espacio ANTES de cargar
+                self._evict_locked(extra_bytes=self._known_sizes.get(key, 0))
+
+            t0 = time.time()
+            model = loader()
+            load_sec = time.time() - t0
+            size = model_size_bytes(model)
+
+            with self._lock:
+                self._known_sizes[key] = size
+                self._entries[key] = {
+                    "model": model,
+                    "size": size,
+                    "refs": 1,
+                    "loaded_at": time.time(),
+                    "last_used": time.time(),
+                }
+                self._counters["loads"] += 1
+                self._emit("load", key, size_bytes=size, load_sec=round(load_sec, 3))
+                self._evict_locked()
+                return model
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["refs"] = max(0, entry["refs"] - 1)
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(key)
+            self._evict_locked()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": sum(e["size"] for e in self._entries.values()),
+                "models": [
+                    {"key": k, "size_bytes": e["size"], "refs": e["refs"], "last_used": e["last_used"]}
+                    for k, e in self._entries.items()
+                ],
+                **self._counters,
+            }
+
+    def events(self, since: float = 0.0) -> List[Dict]:
+        with self._lock:
+            return [e for e in self._events if e["t"] > since]
+
+    def add_listener(self, fn: Callable[[Dict], None]):
+        with self._lock:
+            self._listeners.append(fn)
+
+    # ---- internos (llamar con self._lock tomado) ----
+
+    def _pin(self, key: str, entry: Dict):
+        entry["refs"] += 1
+        entry["last_used"] = time.time()
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return entry["model"]
+
+    def _evict_locked(self, extra_bytes: int = 0):
+        total = sum(e["size"] for e in self._entries.values()) + extra_bytes
+        if total <= self.budget_bytes:
+            return
+
+        evicted = False
+        # OrderedDict: el primero es el menos usado recientemente
+        for key in list(self._entries.keys()):
+            if total <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            if entry["refs"] > 0:
+                continue
+            del self._entries[key]
+            total -= entry["size"]
+            self._counters["evictions"] += 1
+            self._emit("evict", key, size_bytes=entry["size"])
+            evicted = True
+
+        if total > self.budget_bytes:
+            # Todo lo que queda está en uso: no se puede desalojar más
+            self._emit("over_budget", None, resident_bytes=total)
+
+        if evicted:
+            gc.collect()
+
+    def _emit(self, kind: str, key: Optional[str], **data):
+        event = {"t": time.time(), "event": kind, "key": key, **data}
+        self._events.append(event)
+        for fn in self._listeners:
+            try:
+                fn(event)
+            except Exception:
+                pass
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.0f} MB"
+
+
+def log_event(event: Dict):
+    """Listener por defecto: una línea en el log y el contador en tracing."""
+    from .tracing import model_event
+
+    model_event(event)
+    kind = event["event"]
+    if kind == "load":
+        detail = f"{event['key']} · {_mb(event['size_bytes'])} en {event['load_sec']:.1f}s"
+    elif kind == "evict":
+        detail = f"{event['key']} · {_mb(event['size_bytes'])} liberados"
+    else:
+        detail = f"en uso {_mb(event['resident_bytes'])}, todo fijado"
+    labels = {"load": "cargado", "evict": "desalojado", "over_budget": "presupuesto excedido"}
+    print(f"📦 Modelo {labels.get(kind, kind)}: {detail}", flush=True)
+
+
+_REGISTRY: Optional[ModelRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            budget = MODEL_RAM_BUDGET_MB * 1024 * 1024 if MODEL_RAM_BUDGET_MB > 0 else _default_budget_bytes()
+            _REGISTRY = ModelRegistry(budget)
+            _REGISTRY.add_listener(log_event)
+        return _REGISTRY
@@ -0,0 +1,131 @@
+import os
+import time
+import atexit
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from .tracing import record
+
+# Modelo propio de cada proceso worker (se carga una sola vez en el initializer)
+_WORKER_MODEL = None
+
+# Pools vivos: (modelo, n_workers, int8) -> executor, y cuántos trabajos lo usan.
+# Compartidos entre sesiones e hilos de trabajo: siempre con _POOLS_LOCK.
+_POOLS: Dict[Tuple[str, int, bool], ProcessPoolExecutor] = {}
+_POOL_REFS: Dict[Tuple[str, int, bool], int] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """Reparte los hilos intra-op de torch entre los procesos."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(model_name: str, threads: int, int8: bool = False):
+    global _WORKER_MODEL
+    import torch
+    from .transcriber import load_whisper
+
+    torch.set_num_threads(threads)
+    _WORKER_MODEL = load_whisper(model_name, int8)
+
+
+def _transcribe_chunk(idx: int, chunk, decode_kwargs: Dict) -> Tuple[int, str, Dict]:
+    from .transcriber import temperature_fallbacks, segment_confidence
+    from .whisper_decoding import transcribe_guarded
+
+    t0 = time.perf_counter()
+    res, loop_aborts = transcribe_guarded(_WORKER_MODEL, chunk, **decode_kwargs)
+    fallbacks, temperature = temperature_fallbacks(res, decode_kwargs)
+    info = {
+        "wall_sec": time.perf_counter() - t0,
+        "chunk_sec": round(len(chunk) / 16000, 2),
+        "fallbacks": fallbacks,
+        "temperature": temperature,
+        "aborted": loop_aborts > 0,
+        "confidence": segment_confidence(res),
+        "pid": os.getpid(),
+    }
+    return idx, (res.get("text") or "").strip(), info
+
+
+@contextmanager
+def pool_lease(model_name: str, workers: int, int8: bool = False):
+    """
+    Context manager: pool de procesos con el modelo ya cargado en cada worker.
+    Se reutiliza entre trabajos y queda en uso mientras dure el bloque with.
+    Al pedir otro modelo/tamaño se cierran los pools que nadie usa (para no
+    duplicar modelos en RAM); uno en uso por otro trabajo nunca se cierra.
+    """
+    key = (model_name, workers, int8)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            for other in [k for k in _POOLS if _POOL_REFS.get(k, 0) == 0]:
+                _POOLS.pop(other).shutdown(wait=False)
+                _POOL_REFS.pop(other, None)
+            # spawn: fork + torch con hilos activos no es seguro
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, default_threads_per_worker(workers), int8),
+            )
+            _POOLS[key] = pool
+        _POOL_REFS[key] = _POOL_REFS.get(key, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _POOLS_LOCK:
+            _POOL_REFS[key] -= 1
+
+
+def shutdown_pools():
+    """Cierra todos los pools (al salir del proceso)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+        _POOL_REFS.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def iter_chunks_parallel(
+    model_name: str,
+    chunks: List,
+    decode_kwargs: Dict,
+    workers: int,
+    int8: bool = False,
+) -> Iterator[Tuple[int, str, Dict]]:
+    """
+    Reparte los chunks entre procesos worker y produce (índice, texto, info)
+    a medida que terminan (en cualquier orden). Si el consumidor deja de
+    iterar o hay un error, se cancelan los chunks que aún no empezaron.
+    info: {"fallbacks", "temperature", "confidence"} de esa ventana. Cada
+    worker aplica la escalera completa (el presupuesto del trabajo no cruza
+    procesos).
+    """
+    with pool_lease(model_name, workers, int8) as pool:
+        futures = [
+            pool.submit(_transcribe_chunk, i, chunk, decode_kwargs)
+            for i, chunk in enumerate(chunks)
+        ]
+
+        try:
+            for fut in as_completed(futures):
+                idx, txt, info = fut.result()
+                confidence = info.pop("confidence")
+                # El span se midió en el worker; se registra en la traza de este hilo
+                record("segment", info.pop("wall_sec"), mode="parallel", **info)
+                yield idx, txt, {"fallbacks": info["fallbacks"], "temperature": info["temperature"], "confidence": confidence}
+        finally:
+            # Solo los futuros de este trabajo
+            for fut in futures:
+                fut.cancel()
+
@@ -0,0 +1,268 @@
+import os
+import time
+import threading
+from contextlib import contextmanager, closing, ExitStack
+from typing import Callable, Dict, Optional, Union
+
+from .cache import get_result_cache, cache_keys, NullCache
+from .config import two_pass_enabled
+from .demucs_vocals import separate_vocals
+from .ffmpeg_audio import decode_to_pcm16k, decode_with_silences, is_audio_file, MediaSource, MediaTooLong, SAMPLE_RATE
+from .tracing import span, trace
+from .transcriber import whisper_model, iter_transcription, build_decode_kwargs
+
+# on_progress(etapa, fracción 0..1 o None, mensaje o None = conservar el anterior)
+ProgressFn = Callable[[str, Optional[float], Optional[str]], None]
+# on_segment({"index", "start", "end", "text"}): cada ventana transcrita, en orden
+SegmentFn = Callable[[Dict], None]
+
+# Una instancia de Whisper no admite dos decodificaciones a la vez (los hooks
+# de la caché KV son por módulo): un lock por modelo serializa esos trabajos.
+_MODEL_LOCKS: Dict[str, threading.Lock] = {}
+_MODEL_LOCKS_GUARD = threading.Lock()
+
+
+def _model_lock(model_key: str) -> threading.Lock:
+    with _MODEL_LOCKS_GUARD:
+        return _MODEL_LOCKS.setdefault(model_key, threading.Lock())
+
+
+def _fmt_duration(sec: float) -> str:
+    m, s = divmod(int(sec), 60)
+    return f"{m}:{s:02d}"
+
+
+def run_transcription(
+    source: Union[str, MediaSource],
+    settings: Dict,
+    *,
+    file_hash: str,
+    duration_sec: float = 0.0,
+    max_duration_sec: float = 0.0,
+    on_progress: Optional[ProgressFn] = None,
+    on_segment: Optional[SegmentFn] = None,
+    use_cache: bool = True,
+) -> Dict:
+    """
+    Pipeline completo sin Streamlit: conversión -> (Demucs) -> modelo -> transcripción.
+
+    source: ruta o MediaSource (archivo subido en memoria, se envía a ffmpeg
+    por stdin). Si no se conoce duration_sec, se toma del log de ffmpeg en la
+    misma conversión; max_duration_sec > 0 corta con MediaTooLong apenas se
+    sabe que el archivo es más largo.
+
+    Consulta la caché por etapas; un acierto en cualquier etapa se salta todo
+    el trabajo anterior. Retorna:
+      {"raw_text", "stats", "duration_sec", "cache_hit", "timings"}
+
+    timings: segundos de pared por etapa (cache_lookup, convert, vocals, model,
+    transcribe) y first_text: desde el inicio hasta el primer segmento con
+    texto. Con VIDEOSCRIBE_TRACE las mismas etapas quedan como spans.
+
+    on_segment recibe cada ventana apenas se transcribe (texto parcial en la
+    UI); si lanza una excepción, la transcripción se corta ahí.
+    """
+    run_t0 = time.perf_counter()
+    def notify(stage: str, fraction: Optional[float], message: Optional[str]):
+        if on_progress:
+            on_progress(stage, fraction, message)
+
+    timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(name: str, **attrs):
+        # Tiempo de pared para el resultado + span para la traza (si está activa)
+        t0 = time.perf_counter()
+        with span(name, **attrs) as sp:
+            yield sp
+        timings[name] = time.perf_counter() - t0
+
+    cache = get_result_cache() if use_cache else NullCache()
+    keys = cache_keys(file_hash, settings, build_decode_kwargs(settings))
+
+    with stage("cache_lookup") as sp:
+        cached = cache.get_json(keys["transcript"])
+        sp.set(cache_hit="transcript" if cached is not None else None)
+    if cached is not None:
+        # Mismo archivo y mismos ajustes: no se repite nada
+        notify("done", 1.0, "Resultado recuperado de caché")
+        return {
+            "raw_text": cached["raw_text"],
+            "stats": cached["stats"],
+            "duration_sec": duration_sec or cached.get("duration_sec", 0),
+            "cache_hit": "transcript",
+            "timings": timings,
+        }
+
+    def check_duration(sec: float):
+        if max_duration_sec > 0 and sec > max_duration_sec:
+            raise MediaTooLong(
+                f"El archivo excede el máximo permitido ({int(max_duration_sec // 60)} minutos). "
+                f"Duración: {_fmt_duration(sec)}."
+            )
+
+    def on_duration(sec: float):
+        nonlocal duration_sec
+        check_duration(sec)
+        if duration_sec <= 0:
+            duration_sec = sec
+        notify("convert", None, f"1/4 Extrayendo audio… (duración {_fmt_duration(sec)})")
+
+    name = source.name if isinstance(source, MediaSource) else source
+    # silencedetect fijo sobre el audio sin separar: va en la misma decodificación
+    fuse_silences = not settings.get("auto_silence", True) and keys["audio"] == keys["pcm"]
+    silences = None
+    cache_hit = None
+    with stage("convert", streamed=isinstance(source, MediaSource)) as sp:
+        audio = cache.get_array(keys["audio"])
+        if audio is not None:
+            cache_hit = "audio"
+            notify("convert", None, "1/4 Audio recuperado de caché…")
+        else:
+            audio = cache.get_array(keys["pcm"])
+            if audio is not None:
+                cache_hit = "pcm"
+            else:
+                if is_audio_file(name):
+                    notify("convert", None, "1/4 Convirtiendo audio…")
+                else:
+                    notify("convert", None, "1/4 Extrayendo audio del video…")
+                # PCM 16kHz directo a memoria: sin WAV intermedio
+                if fuse_silences:
+                    audio, silences = decode_with_silences(
+                        source,
+                        normalize=settings["normalize_audio"],
+                        silence_db=settings["silence_db"],
+                        min_silence=settings["min_silence"],
+                        on_duration=on_duration,
+                    )
+                else:
+                    audio = decode_to_pcm16k(source, normalize=settings["normalize_audio"], on_duration=on_duration)
+                cache.put_array(keys["pcm"], audio)
+        sp.set(cache_hit=cache_hit, audio_sec=round(len(audio) / SAMPLE_RATE, 2), silencedetect=silences is not None)
+
+    if cache_hit != "audio":
+        if keys["audio"] != keys["pcm"]:
+            notify("vocals", None, "2/4 Separando voz… (esto puede tardar unos minutos)")
+            with stage("vocals"):
+                audio = separate_vocals(audio, sr=SAMPLE_RATE)
+                cache.put_array(keys["audio"], audio)
+        else:
+            notify("vocals", None, "2/4 Saltando separación de voz…")
+
+    if duration_sec <= 0:
+        duration_sec = len(audio) / SAMPLE_RATE
+    # Formatos sin duración en la cabecera (N/A en el log): se mide el PCM
+    check_duration(len(audio) / SAMPLE_RATE)
+
+    notify("model", None, "3/4 Cargando modelo de Inteligencia Artificial…")
+    model_key = settings["model_key"]
+    int8 = bool(settings.get("int8"))
+    draft_key = settings["draft_model"] if two_pass_enabled(settings) else None
+    with ExitStack() as held:
+        with stage("model", model=model_key, draft_model=draft_key) as sp:
+            # El lease fija el modelo en el registro: no se desaloja mientras se usa
+            model = held.enter_context(whisper_model(model_key, int8=int8))
+            draft = None
+            if draft_key:
+                draft = model if draft_key == model_key else held.enter_context(whisper_model(draft_key, int8=int8))
+            # Siempre en el mismo orden: dos trabajos con dos modelos no se bloquean entre sí
+            locks = [_model_lock(key) for key in sorted({model_key, draft_key} - {None})]
+            sp.set(lock_wait=any(lock.locked() for lock in locks))
+            if any(lock.locked() for lock in locks):
+                notify("model", None, "3/4 Esperando a que el modelo quede libre…")
+            for lock in locks:
+                held.enter_context(lock)
+
+        notify("transcribe", 0.0, "4/4 Transcribiendo audio…")
+        with stage("transcribe", model=model_key, precision=settings["precision"], int8=int8) as sp:
+            segments = iter_transcription(
+                model=model,
+                audio=audio,
+                duration_sec=duration_sec,
+                settings=settings,
+                on_progress=lambda frac, msg: notify("transcribe", frac, msg),
+                silences=silences,
+                draft=draft,
+            )
+            # closing: si on_segment corta, el generador libera sus workers
+            with closing(segments):
+                while True:
+                    try:
+                        segment = next(segments)
+                    except StopIteration as stop:
+                        stats = stop.value
+                        break
+                    if segment["text"] and "first_text" not in timings:
+                        timings["first_text"] = time.perf_counter() - run_t0
+                    if on_segment:
+                        on_segment(segment)
+            raw_text = "\n".join(stats["segment_texts"]).strip()
+            # Los fallbacks ya se cuentan por segmento; aquí solo los totales del trabajo
+            sp.set(loop_aborts=stats["loop_aborts"], fallback_budget=stats["fallback_budget"])
+            if stats.get("two_pass"):
+                sp.set(
+                    segments_escalated=stats["two_pass"]["segments_escalated"],
+                    saved_sec_est=stats["two_pass"]["saved_sec_est"],
+                )
+
+    cache.put_json(keys["transcript"], {
+        "raw_text": raw_text,
+        "stats": stats,
+        "duration_sec": duration_sec,
+    })
+
+    notify("done", 1.0, "Transcripción finalizada con éxito")
+    return {
+        "raw_text": raw_text,
+        "stats": stats,
+        "duration_sec": duration_sec,
+        "cache_hit": cache_hit,
+        "timings": timings,
+    }
+
+
+def transcription_job(
+    job,
+    source: Union[str, MediaSource],
+    settings: Dict,
+    *,
+    file_hash: str,
+    duration_sec: float = 0.0,
+    max_duration_sec: float = 0.0,
+    cleanup_input: bool = True,
+) -> Dict:
+    """
+    Adaptador para JobManager.submit: reporta progreso y segmentos parciales
+    en el JobContext (que también corta si el usuario detiene el trabajo),
+    abre la traza del trabajo (mismo ID) y al terminar (con o sin error)
+    borra el archivo temporal de entrada o suelta el buffer en memoria.
+    """
+    try:
+        with trace(
+            job.job_id,
+            model=settings["model_key"],
+            precision=settings["precision"],
+            audio_profile=settings["audio_profile"],
+            int8=bool(settings.get("int8")),
+            file_hash=file_hash,
+        ) as root:
+            result = run_transcription(
+                source,
+                settings,
+                file_hash=file_hash,
+                duration_sec=duration_sec,
+                max_duration_sec=max_duration_sec,
+                on_progress=job.progress,
+                on_segment=job.partial,
+            )
+            root.set(cache_hit=result["cache_hit"], audio_sec=round(result["duration_sec"], 2))
+            return result
+    finally:
+        if isinstance(source, MediaSource):
+            source.release()
+        elif cleanup_input and os.path.exists(source):
+            try:
+                os.remove(source)
+            except Exception:
+                pass
@@ -1,13 +1,20 @@
 import re
-from typing import List
+from typing import Iterable, Iterator, List
 
 
+# Ajustes (de ui.sidebar_settings) que solo afectan esta etapa: cambiarlos no
+# requiere volver a transcribir
+POSTPROCESS_SETTINGS = ("clean_text", "normalize_elongations", "max_consecutive_repeats")
+
 # 7+ repeticiones de un mismo signo -> lo reducimos
 _PUNCT_RUN_RE = re.compile(r"([!¡?¿.,…])\1{6,}")
 
 # Líneas que son casi solo signos / separadores
 _ONLY_PUNCT_RE = re.compile(r"^[\W_]+$")
 
+# Espacios/tabs repetidos dentro de una línea
+_SPACE_RUN_RE = re.compile(r"[ \t]{2,}")
+
 # Alargamientos tipo "su-u-u-u" o "sooooo"
 _ELONG_HYPHEN_RE = re.compile(r"([aeiouáéíóú])(?:-\1){2,}", flags=re.IGNORECASE)  # su-u-u
 _ELONG_REPEAT_RE = re.compile(r"([aeiouáéíóú])\1{5,}", flags=re.IGNORECASE)       # soooo
@@ -112,3 +119,120 @@ def postprocess_transcript(
     out = re.sub(r"[ \t]{2,}", " ", out)
     out = re.sub(r"\n{3,}", "\n\n", out).strip()
     return out
+
+
+class StreamingPostprocessor:
+    """
+    Mismo resultado que postprocess_transcript, pero consumiendo el texto por
+    partes y emitiendo líneas limpias a medida que se completan.
+
+        pp = StreamingPostprocessor(clean_text=True, max_consecutive_repeats=3)
+        out = pp.feed(parte1) + pp.feed(parte2) + pp.close()
+        # out == postprocess_transcript(parte1 + parte2, ...)
+
+    Todos los pasos de postprocess_transcript son locales a cada línea salvo
+    el límite de repeticiones y los saltos en blanco: ese estado (línea previa,
+    contador, salto pendiente) es lo único que se guarda entre partes, además
+    de la línea incompleta. Memoria acotada por la línea más larga.
+    """
+
+    def __init__(
+        self,
+        *,
+        clean_text: bool = True,
+        normalize_elongations: bool = False,
+        max_consecutive_repeats: int = 4,
+    ):
+        self.clean_text = clean_text
+        self.normalize_elongations = normalize_elongations
+        self.max_repeat = max_consecutive_repeats
+
+        self._buf = ""            # línea incompleta (puede terminar en "\r")
+        self._prev = None         # estado de _limit_consecutive_repeats
+        self._count = 0
+        self._started = False     # ya se emitió alguna línea
+        self._blank = False       # hay una línea vacía pendiente (se emite si sigue texto)
+
+    def feed(self, text: str) -> str:
+        """Agrega texto crudo; retorna la salida de las líneas que quedaron completas."""
+        if not text:
+            return ""
+        buf = self._buf + text
+        # Un "\r" final puede ser la mitad de un "\r\n": se decide con la próxima parte
+        carry = ""
+        if buf.endswith("\r"):
+            buf, carry = buf[:-1], "\r"
+        lines = buf.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        self._buf = lines.pop() + carry
+        return "".join(self._line(ln) for ln in lines)
+
+    def close(self) -> str:
+        """Procesa la última línea. El procesador no se reutiliza después."""
+        buf, self._buf = self._buf, ""
+        if not buf:
+            return ""
+        lines = buf.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "".join(self._line(ln) for ln in lines)
+
+    def preview(self) -> str:
+        """Lo que agregaría close() ahora mismo, sin modificar el estado."""
+        state = (self._buf, self._prev, self._count, self._started, self._blank)
+        try:
+            return self.close()
+        finally:
+            self._buf, self._prev, self._count, self._started, self._blank = state
+
+    def _line(self, ln: str) -> str:
+        # Mismo orden que postprocess_transcript, aplicado a una sola línea
+        if self.clean_text:
+            ln = _normalize_punct_runs(ln)
+        if self.normalize_elongations:
+            ln = _normalize_elongations(ln)
+        ln = ln.strip()
+
+        if self.clean_text:
+            kept = _drop_garbage_lines([ln])
+            if not kept:
+                return ""
+            ln = kept[0]
+
+        # _limit_consecutive_repeats, una línea a la vez
+        if ln == "":
+            if self._started:
+                self._blank = True
+            self._prev = None
+            self._count = 0
+            return ""
+
+        if ln == self._prev:
+            self._count += 1
+            if self._count >= self.max_repeat:
+                return ""
+        else:
+            self._prev = ln
+            self._count = 0
+
+        # Unión final: " ".join de espacios, a lo sumo una línea en blanco,
+        # y nada en blanco al principio ni al final (el .strip() del original)
+        ln = _SPACE_RUN_RE.sub(" ", ln)
+        if not self._started:
+            self._started = True
+            return ln
+        sep = "\n\n" if self._blank else "\n"
+        self._blank = False
+        return sep + ln
+
+
+def postprocess_segments(segments: Iterable[str], **options) -> Iterator[str]:
+    """
+    Post-proceso incremental de textos de segmento. La concatenación de lo
+    que produce es idéntica a postprocess_transcript("\\n".join(segments), ...).
+    """
+    pp = StreamingPostprocessor(**options)
+    for i, segment in enumerate(segments):
+        out = pp.feed(segment if i == 0 else "\n" + segment)
+        if out:
+            yield out
+    out = pp.close()
+    if out:
+        yield out
@@ -0,0 +1,31 @@
+"""
+Arranca la app de Streamlit con la precarga de modelos ya en marcha.
+
+    VIDEOSCRIBE_WARMUP=all VIDEOSCRIBE_READY_FILE=/tmp/videoscribe.ready \\
+        python -m src.serve --server.port 8501
+
+Streamlit solo ejecuta app.py cuando se conecta la primera sesión; este
+lanzador inicia src.warmup antes de levantar el servidor (mismo proceso,
+mismo registro de modelos), así el nodo se calienta sin esperar tráfico.
+Los argumentos se pasan tal cual a `streamlit run app.py`.
+"""
+import os
+import sys
+
+from .tracing import set_process_role
+from .warmup import start_warmup
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def main(argv=None) -> int:
+    from streamlit.web import cli as stcli
+
+    set_process_role("app")
+    start_warmup()
+    sys.argv = ["streamlit", "run", APP_PATH] + list(sys.argv[1:] if argv is None else argv)
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,22 @@
 import json
 import os
 import hashlib
+import sqlite3
+import threading
 import time
+from typing import Dict, Optional, Tuple
+
 import streamlit as st
 
+from .config import RATE_LIMIT_DB
+
+# Formato anterior (se migra a RATE_LIMIT_DB la primera vez)
 TRACKER_FILE = "limit_tracker.json"
 MAX_RUNS_PER_SESSION = 3
+RESET_WINDOW_SEC = 86400
+
+_COMPACT_EVERY_SEC = 3600
+_CACHE_MAX_ENTRIES = 4096
 
 # Hash"
 SECRET_CODE_HASH = "ebec6f726fee7a9baf75628bcb9b0dec4d219f097f5c8c4cb91fc4495e6c1f83"
@@ -35,21 +46,158 @@ def _get_client_ip() -> str:
 
     return "unknown_client"
 
-def _load_tracker() -> dict:
-    if os.path.exists(TRACKER_FILE):
+class UsageStore:
+    """
+    Usos por cliente en SQLite (WAL): varias sesiones/procesos pueden leer y
+    escribir a la vez sin perder incrementos.
+
+    - increment(): un solo UPSERT atómico (con el reseteo diario incluido).
+    - runs(): una fila por clave primaria, con caché en memoria. La caché se
+      descarta solo cuando otra conexión escribió (PRAGMA data_version), así
+      que cada rerun cuesta lo mismo aunque la tabla crezca.
+    - Las filas vencidas se borran como mucho una vez por hora.
+    - Si existe el limit_tracker.json anterior, se importa una vez; la
+      migración queda anotada en la tabla meta (el archivo no se toca).
+    """
+
+    def __init__(self, path: str, legacy_json: str = TRACKER_FILE, window_sec: float = RESET_WINDOW_SEC):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.window_sec = window_sec
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._cache: Dict[str, Tuple[int, float]] = {}
+        self._data_version = None
+        self._next_compact = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "client_id TEXT PRIMARY KEY, runs INTEGER NOT NULL, reset_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS usage_reset_at ON usage (reset_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+            self._migrate_json(conn)
+        return self._conn
+
+    def _migrate_json(self, conn: sqlite3.Connection):
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone():
+            return
         try:
-            with open(TRACKER_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                data = json.load(f)
         except Exception:
-            return {}
-    return {}
+            data = {}
+        now = time.time()
+        rows = [
+            (client_id, int(u.get("runs", 0)), float(u.get("reset_at", 0)))
+            for client_id, u in data.items()
+            if isinstance(u, dict) and float(u.get("reset_at", 0)) >= now
+        ]
+        # Una transacción: si otro proceso migra a la vez, solo uno inserta la marca.
+        # OR IGNORE: si ya hay usos nuevos de ese cliente, gana la base
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            marked = conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                (json.dumps({"file": os.path.abspath(self.legacy_json), "at": now, "rows": len(rows)}),),
+            ).rowcount
+            if marked:
+                conn.executemany("INSERT OR IGNORE INTO usage (client_id, runs, reset_at) VALUES (?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _sync_cache(self, conn: sqlite3.Connection):
+        # data_version cambia solo si OTRA conexión hizo commit
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version or len(self._cache) > _CACHE_MAX_ENTRIES:
+            self._cache.clear()
+            self._data_version = version
+
+    def runs(self, client_id: str, now: Optional[float] = None) -> int:
+        """Usos vigentes del cliente (0 si nunca usó o si ya pasó su reseteo)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            conn = self._connect()
+            self._sync_cache(conn)
+            row = self._cache.get(client_id)
+            if row is None:
+                found = conn.execute(
+                    "SELECT runs, reset_at FROM usage WHERE client_id = ?", (client_id,)
+                ).fetchone()
+                row = self._cache[client_id] = tuple(found) if found else (0, 0.0)
+        runs, reset_at = row
+        return runs if now <= reset_at else 0
+
+    def increment(self, client_id: str, now: Optional[float] = None) -> int:
+        """Suma un uso (reiniciando la ventana si venció) y retorna el total vigente."""
+        now = time.time() if now is None else now
+        with self._lock:
+            conn = self._connect()
+            self._sync_cache(conn)
+            runs, reset_at = conn.execute(
+                """
+                INSERT INTO usage (client_id, runs, reset_at) VALUES (?, 1, ?)
+                ON CONFLICT (client_id) DO UPDATE SET
+                    runs = CASE WHEN usage.reset_at < ? THEN 1 ELSE usage.runs + 1 END,
+                    reset_at = CASE WHEN usage.reset_at < ? THEN excluded.reset_at ELSE usage.reset_at END
+                RETURNING runs, reset_at
+                """,
+                (client_id, now + self.window_sec, now, now),
+            ).fetchone()
+            self._cache[client_id] = (runs, reset_at)
+
+            if now >= self._next_compact:
+                conn.execute("DELETE FROM usage WHERE reset_at < ?", (now,))
+                self._next_compact = now + _COMPACT_EVERY_SEC
+        return runs
+
+    def refund(self, client_id: str, now: Optional[float] = None) -> int:
+        """Devuelve un uso (p. ej. de un trabajo que falló) y retorna el total vigente."""
+        now = time.time() if now is None else now
+        with self._lock:
+            conn = self._connect()
+            self._sync_cache(conn)
+            row = conn.execute(
+                """
+                UPDATE usage SET runs = MAX(runs - 1, 0)
+                WHERE client_id = ? AND reset_at >= ?
+                RETURNING runs, reset_at
+                """,
+                (client_id, now),
+            ).fetchone()
+            self._cache.pop(client_id, None)
+        return row[0] if row else 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+
+
+_STORE: Optional[UsageStore] = None
+_STORE_GUARD = threading.Lock()
+
+
+def get_usage_store() -> UsageStore:
+    global _STORE
+    with _STORE_GUARD:
+        if _STORE is None:
+            _STORE = UsageStore(RATE_LIMIT_DB)
+        return _STORE
 
-def _save_tracker(data: dict):
-    try:
-        with open(TRACKER_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f)
-    except Exception:
-        pass
 
 def is_vip(code: str) -> bool:
     if not code:
@@ -62,46 +210,45 @@ def check_rate_limit(settings: dict) -> bool:
     if is_vip(settings.get("secret_code")):
         return True
 
-    client_id = _get_client_ip()
-    data = _load_tracker()
-    
-    now = time.time()
-    user_data = data.get(client_id, {"runs": 0, "reset_at": now + 86400})
-    
-    # Reseteo diario
-    if now > user_data["reset_at"]:
-        user_data = {"runs": 0, "reset_at": now + 86400}
-        
-    if user_data["runs"] >= MAX_RUNS_PER_SESSION:
-        return False
-        
-    return True
+    try:
+        runs = get_usage_store().runs(_get_client_ip())
+    except sqlite3.Error:
+        return True
 
-def increment_usage(settings: dict):
-    """Suma 1 uso a la cuenta. No hace nada si es VIP."""
+    return runs < MAX_RUNS_PER_SESSION
+
+def increment_usage(settings: dict) -> Optional[str]:
+    """
+    Suma 1 uso a la cuenta. No hace nada si es VIP.
+    Retorna el cliente al que se le contó (para refund_usage), o None.
+    """
     if is_vip(settings.get("secret_code")):
-        return
-        
+        return None
+
     client_id = _get_client_ip()
-    data = _load_tracker()
-    
-    now = time.time()
-    user_data = data.get(client_id, {"runs": 0, "reset_at": now + 86400})
-    
-    if now > user_data["reset_at"]:
-        user_data = {"runs": 1, "reset_at": now + 86400}
-    else:
-        user_data["runs"] += 1
-        
-    data[client_id] = user_data
-    _save_tracker(data)
+    try:
+        get_usage_store().increment(client_id)
+    except sqlite3.Error:
+        return None
+    return client_id
+
+def refund_usage(client_id: Optional[str]):
+    """Devuelve el uso contado por increment_usage. Se puede llamar fuera del hilo del script."""
+    if client_id is None:
+        return
+
+    try:
+        get_usage_store().refund(client_id)
+    except sqlite3.Error:
+        pass
 
 def get_runs_for_user(settings: dict) -> tuple[int, int]:
     """Devuelve (usos_actuales, limite_maximo). Para VIP devuelve (0, 999)."""
     if is_vip(settings.get("secret_code")):
         return 0, 999
-        
-    client_id = _get_client_ip()
-    data = _load_tracker()
-    user_data = data.get(client_id, {"runs": 0})
-    return user_data["runs"], MAX_RUNS_PER_SESSION
+
+    try:
+        runs = get_usage_store().runs(_get_client_ip())
+    except sqlite3.Error:
+        runs = 0
+    return runs, MAX_RUNS_PER_SESSION
@@ -1,30 +1,12 @@
 import re
 import subprocess
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
+import numpy as np
 
-def detect_silences_ffmpeg(
-    wav_path: str,
-    silence_db: int,
-    min_silence: float
-) -> List[Tuple[float, float]]:
-    """
-    Detecta silencios usando ffmpeg silencedetect.
-    Retorna [(start, end), ...]
-    """
-    cmd = [
-        "ffmpeg", "-hide_banner", "-i", wav_path,
-        "-af", f"silencedetect=n={silence_db}dB:d={min_silence}",
-        "-f", "null", "-"
-    ]
-    p = subprocess.run(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
 
-    log = p.stderr
+def parse_silencedetect(log: str) -> List[Tuple[float, float]]:
+    """[(start, end), ...] a partir del log de ffmpeg silencedetect."""
     silences = []
     start = None
 
@@ -45,6 +27,99 @@ def detect_silences_ffmpeg(
     return silences
 
 
+def silencedetect_filter(silence_db: int, min_silence: float) -> str:
+    return f"silencedetect=n={silence_db}dB:d={min_silence}"
+
+
+def detect_silences_ffmpeg(
+    audio: Union[str, np.ndarray],
+    silence_db: int,
+    min_silence: float,
+    sr: int = 16000,
+) -> List[Tuple[float, float]]:
+    """
+    Detecta silencios usando ffmpeg silencedetect.
+    audio puede ser una ruta o un buffer float32 mono (se envía por stdin, sin archivo).
+    Retorna [(start, end), ...]
+    """
+    af = silencedetect_filter(silence_db, min_silence)
+    if isinstance(audio, np.ndarray):
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostdin",
+            "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0",
+            "-af", af,
+            "-f", "null", "-"
+        ]
+        stdin_data = np.ascontiguousarray(audio, dtype="<f4").tobytes()
+    else:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-i", audio,
+            "-af", af,
+            "-f", "null", "-"
+        ]
+        stdin_data = None
+
+    p = subprocess.run(
+        cmd,
+        input=stdin_data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    return parse_silencedetect(p.stderr.decode("utf-8", errors="replace"))
+
+
+def detect_silences_energy(
+    audio: np.ndarray,
+    min_silence: float,
+    sr: int = 16000,
+    frame_sec: float = 0.02,
+) -> Tuple[List[Tuple[float, float]], float]:
+    """
+    VAD por energía, en memoria y en una sola pasada vectorizada.
+
+    - Calcula el RMS (dBFS) de tramas de 20ms.
+    - Estima el piso de ruido (percentil 10) y el nivel de voz (percentil 95)
+      de ESTE archivo y coloca el umbral entre ambos, así no depende del slider.
+    - Retorna ([(start, end), ...], umbral_db) con el mismo formato que
+      detect_silences_ffmpeg.
+    """
+    hop = max(1, int(sr * frame_sec))
+    n_frames = len(audio) // hop
+    if n_frames == 0:
+        return [], -40.0
+
+    frames = np.asarray(audio[: n_frames * hop], dtype=np.float32).reshape(n_frames, hop)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    frame_db = 20.0 * np.log10(rms + 1e-10)
+
+    noise_db, speech_db = np.percentile(frame_db, [10, 95])
+    dynamic_range = speech_db - noise_db
+
+    # Sin contraste entre ruido y voz (música continua, ruido constante):
+    # no hay silencios fiables, se deja que el llamador use chunks fijos.
+    if dynamic_range < 6.0:
+        return [], float(round(noise_db))
+
+    # Umbral: un poco por encima del piso, sin acercarse demasiado a la voz
+    threshold_db = noise_db + max(6.0, 0.25 * dynamic_range)
+    threshold_db = float(np.clip(threshold_db, -60.0, -15.0))
+
+    # Rachas de tramas silenciosas (detección de bordes con diff)
+    silent = np.concatenate(([False], frame_db < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    min_frames = max(1, int(round(min_silence / frame_sec)))
+    keep = (ends - starts) >= min_frames
+
+    silences = [
+        (float(s0 * frame_sec), float(s1 * frame_sec))
+        for s0, s1 in zip(starts[keep], ends[keep])
+    ]
+    return silences, threshold_db
+
+
 def build_segments_from_silences(
     total_sec: float,
     silences: List[Tuple[float, float]],
@@ -91,3 +166,25 @@ def build_fixed_segments(
         t += chunk_sec
 
     return segments
+
+
+def pack_segments(
+    segments: List[Tuple[float, float]],
+    max_window: float = 29.5,
+) -> List[Tuple[float, float]]:
+    """
+    Agrupa segmentos consecutivos en ventanas de hasta `max_window` segundos.
+
+    Whisper rellena cada llamada a 30s, así que un segmento de 1.5s cuesta lo
+    mismo en el encoder que uno de 30s. Cada ventana va del inicio de su primer
+    segmento al final del último: solo se corta en silencios ya detectados
+    (el silencio entre segmentos queda dentro de la ventana).
+    Un segmento que por sí solo supera max_window se deja tal cual.
+    """
+    packed: List[Tuple[float, float]] = []
+    for s, e in segments:
+        if packed and e - packed[-1][0] <= max_window:
+            packed[-1] = (packed[-1][0], e)
+        else:
+            packed.append((s, e))
+    return packed
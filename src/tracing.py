@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .config import TRACING_ENABLED, TRACE_DIR, METRICS_FILE
+
+# Traza y span activos del contexto actual (cada hilo/tarea tiene el suyo)
+_CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar("videoscribe_trace", default=None)
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("videoscribe_span", default=None)
+
+_SPAN_IDS = itertools.count(1)
+
+# Atributos que se usan como labels en las métricas (baja cardinalidad)
+_METRIC_LABELS = ("model", "precision", "mode", "cache_hit")
+
+_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Rol del proceso en el nombre del archivo de métricas (ver set_process_role)
+_PROCESS_ROLE = "proc"
+
+# Spans fuera de una traza (p. ej. en el hilo de Streamlit): como mucho un
+# volcado del archivo de métricas cada tantos segundos
+_FLUSH_EVERY_SEC = 5.0
+
+
+class _NoopSpan:
+    """Lo que devuelve span() con el trazado apagado: no mide ni guarda nada."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "start", "wall_start", "duration", "_trace", "_token")
+
+    def __init__(self, name: str, attrs: Dict, trace: Optional["Trace"]):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_SPAN_IDS)
+        self.parent_id = None
+        self.start = 0.0
+        self.wall_start = 0.0
+        self.duration = 0.0
+        self._trace = trace
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _CURRENT_SPAN.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self._token = _CURRENT_SPAN.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _CURRENT_SPAN.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _finish(self)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start": round(self.wall_start, 6),
+            "duration_sec": round(self.duration, 6),
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    """Spans de un trabajo; se guarda como <TRACE_DIR>/<trace_id>.json al cerrar."""
+
+    def __init__(self, trace_id: str, attrs: Dict):
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"trace_id": self.trace_id, "attrs": self.attrs, "spans": list(self.spans)}
+
+
+class _Metrics:
+    """Histograma de duración por (etapa, labels) + contadores sumados desde atributos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple, Dict] = {}
+        self._fallbacks: Dict[Tuple, float] = {}
+        self._model_events: Dict[Tuple, int] = {}
+        self._last_flush = 0.0
+
+    def model_event(self, event: Dict):
+        labels = (("event", event["event"]), ("key", event.get("key") or ""))
+        with self._lock:
+            self._model_events[labels] = self._model_events.get(labels, 0) + 1
+
+    def observe(self, name: str, duration: float, attrs: Dict):
+        labels = (("stage", name),) + tuple(
+            (k, str(attrs[k])) for k in _METRIC_LABELS if attrs.get(k) is not None
+        )
+        with self._lock:
+            h = self._hist.get(labels)
+            if h is None:
+                h = self._hist[labels] = {"buckets": [0] * len(_BUCKETS), "count": 0, "sum": 0.0}
+            for i, bound in enumerate(_BUCKETS):
+                if duration <= bound:
+                    h["buckets"][i] += 1
+            h["count"] += 1
+            h["sum"] += duration
+            if attrs.get("fallbacks"):
+                self._fallbacks[labels] = self._fallbacks.get(labels, 0) + attrs["fallbacks"]
+
+    def render(self) -> str:
+        # Label del proceso: el textfile collector junta los archivos de todos
+        # y las series no pueden repetirse entre archivos
+        process = (("process", f"{_PROCESS_ROLE}-{os.getpid()}"),)
+
+        def fmt(labels, extra=()):
+            items = list(process) + list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+        lines = [
+            "# HELP videoscribe_stage_seconds Tiempo de pared por etapa/segmento del pipeline.",
+            "# TYPE videoscribe_stage_seconds histogram",
+        ]
+        with self._lock:
+            for labels, h in sorted(self._hist.items()):
+                for bound, n in zip(_BUCKETS, h["buckets"]):
+                    lines.append(f"videoscribe_stage_seconds_bucket{fmt(labels, [('le', bound)])} {n}")
+                lines.append(f"videoscribe_stage_seconds_bucket{fmt(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"videoscribe_stage_seconds_sum{fmt(labels)} {h['sum']:.6f}")
+                lines.append(f"videoscribe_stage_seconds_count{fmt(labels)} {h['count']}")
+
+            lines.append("# HELP videoscribe_temperature_fallbacks_total Ventanas re-decodificadas con temperatura mayor.")
+            lines.append("# TYPE videoscribe_temperature_fallbacks_total counter")
+            for labels, n in sorted(self._fallbacks.items()):
+                lines.append(f"videoscribe_temperature_fallbacks_total{fmt(labels)} {n}")
+
+            lines.append("# HELP videoscribe_model_events_total Cargas, desalojos y excesos de presupuesto del registro de modelos.")
+            lines.append("# TYPE videoscribe_model_events_total counter")
+            for labels, n in sorted(self._model_events.items()):
+                lines.append(f"videoscribe_model_events_total{fmt(labels)} {n}")
+
+        # Estado actual del registro (para dimensionar la RAM de los nodos)
+        from .model_registry import get_model_registry
+
+        stats = get_model_registry().stats()
+        lines += [
+            "# HELP videoscribe_model_budget_bytes Presupuesto de RAM para modelos residentes.",
+            "# TYPE videoscribe_model_budget_bytes gauge",
+            f"videoscribe_model_budget_bytes{fmt(())} {stats['budget_bytes']}",
+            "# HELP videoscribe_model_resident_bytes RAM ocupada por modelos residentes.",
+            "# TYPE videoscribe_model_resident_bytes gauge",
+            f"videoscribe_model_resident_bytes{fmt(())} {stats['resident_bytes']}",
+            "# HELP videoscribe_model_size_bytes Tamaño de cada modelo residente.",
+            "# TYPE videoscribe_model_size_bytes gauge",
+        ]
+        for m in stats["models"]:
+            lines.append(f"videoscribe_model_size_bytes{fmt([('key', m['key'])])} {m['size_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, path: str, force: bool = True):
+        now = time.time()
+        if not force and now - self._last_flush < _FLUSH_EVERY_SEC:
+            return
+        self._last_flush = now
+        _write_atomic(path, self.render())
+
+
+_METRICS = _Metrics()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, text: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _finish(span: Span):
+    _METRICS.observe(span.name, span.duration, span.attrs)
+    if span._trace is not None:
+        span._trace.add(span)
+    else:
+        _METRICS.flush(metrics_file(), force=False)
+
+
+# ---- API pública ----
+
+def span(name: str, **attrs):
+    """
+    with span("convert", model=...) as sp: ...; sp.set(cache_hit=True)
+
+    Con el trazado apagado devuelve un objeto vacío compartido: sin reloj,
+    sin asignaciones, sin locks.
+    """
+    if not TRACING_ENABLED:
+        return _NOOP
+    return Span(name, attrs, _CURRENT_TRACE.get())
+
+
+def record(name: str, duration_sec: float, **attrs):
+    """Span ya medido en otro lado (p. ej. dentro de un proceso worker)."""
+    if not TRACING_ENABLED:
+        return
+    sp = Span(name, attrs, _CURRENT_TRACE.get())
+    parent = _CURRENT_SPAN.get()
+    sp.parent_id = parent.span_id if parent is not None else None
+    sp.duration = float(duration_sec)
+    sp.wall_start = time.time() - sp.duration
+    _finish(sp)
+
+
+@contextmanager
+def trace(trace_id: str, **attrs):
+    """
+    Traza de un trabajo: todos los spans abiertos dentro (en este contexto)
+    quedan en <TRACE_DIR>/<trace_id>.json. Devuelve el span raíz ("job").
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+
+    tr = Trace(trace_id, attrs)
+    token = _CURRENT_TRACE.set(tr)
+    try:
+        with Span("job", dict(attrs), tr) as root:
+            yield root
+    finally:
+        _CURRENT_TRACE.reset(token)
+        _write_atomic(os.path.join(TRACE_DIR, f"{trace_id}.json"), json.dumps(tr.to_dict(), ensure_ascii=False))
+        _METRICS.flush(metrics_file())
+
+
+def set_process_role(role: str):
+    """Rol del proceso ("api", "app", "cli", "watch") para el nombre del archivo de métricas."""
+    global _PROCESS_ROLE
+    _PROCESS_ROLE = role
+
+
+def metrics_file() -> str:
+    """METRICS_FILE con rol y PID: procesos distintos no se pisan el archivo."""
+    base, ext = os.path.splitext(METRICS_FILE)
+    return f"{base}.{_PROCESS_ROLE}-{os.getpid()}{ext}"
+
+
+def model_event(event: Dict):
+    """Cuenta un evento del registro de modelos (load/evict/over_budget)."""
+    _METRICS.model_event(event)
+
+
+def load_trace(trace_id: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(TRACE_DIR, f"{trace_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def metrics_text() -> str:
+    return _METRICS.render()
@@ -1,21 +1,78 @@
+import math
 import time
-from typing import Dict, Tuple, List
-
-import streamlit as st
-import whisper
-
+import itertools
+from collections import deque
+from dataclasses import fields
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Generator, Iterator, Tuple, List, Optional, Union
+
+import numpy as np
+
+from .config import FALLBACK_BUDGET, escalation_thresholds, two_pass_enabled
+from .model_registry import get_model_registry
+from .parallel import iter_chunks_parallel
+from .tracing import record, span
 from .silence import (
     detect_silences_ffmpeg,
+    detect_silences_energy,
     build_segments_from_silences,
     build_fixed_segments,
+    pack_segments,
 )
 
+if TYPE_CHECKING:
+    import whisper
+
+# Mismos valores que whisper.audio (ventana de 30 s a 16 kHz, hop de 160).
+# whisper y torch se importan dentro de las funciones que decodifican: este
+# módulo lo importan la app y el CLI al arrancar.
+N_SAMPLES = 30 * 16000
+N_FRAMES = N_SAMPLES // 160
+
+
+def quantize_int8(model):
+    """
+    Cuantización dinámica int8 de las capas Linear (inferencia en CPU).
+
+    whisper usa su propia subclase de nn.Linear, que quantize_dynamic no
+    reconoce: primero se reemplaza por nn.Linear con los mismos pesos.
+    """
+    import torch
 
-@st.cache_resource
-def load_model_cached(model_name: str):
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                if child.bias is not None:
+                    plain.bias = child.bias
+                setattr(parent, name, plain)
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_whisper(model_name: str, int8: bool = False):
+    import whisper
+
+    if int8:
+        return quantize_int8(whisper.load_model(model_name, device="cpu"))
     return whisper.load_model(model_name)
 
 
+def whisper_registry_key(model_name: str, int8: bool = False) -> str:
+    return f"whisper:{model_name}:int8" if int8 else f"whisper:{model_name}"
+
+
+def whisper_model(model_name: str, int8: bool = False):
+    """
+    Context manager: entrega el modelo desde el registro con presupuesto de RAM
+    y lo mantiene fijado (no desalojable) mientras dure el bloque with.
+    La variante int8 se registra aparte ("whisper:<nombre>:int8").
+    """
+    key = whisper_registry_key(model_name, int8)
+    return get_model_registry().lease(key, lambda: load_whisper(model_name, int8))
+
+
 def build_decode_kwargs(settings: Dict) -> Dict:
     precision = settings["precision"]
     audio_profile = settings["audio_profile"]
@@ -51,94 +108,762 @@ def build_decode_kwargs(settings: Dict) -> Dict:
     return kwargs
 
 
+# Límite duro del lote: más allá de esto la ganancia en CPU es marginal
+MAX_DECODE_BATCH = 16
+
+
+@lru_cache(maxsize=1)
+def _decoding_option_keys() -> frozenset:
+    """Claves de build_decode_kwargs que whisper.DecodingOptions entiende."""
+    import whisper
+
+    return frozenset(f.name for f in fields(whisper.DecodingOptions))
+
+
+def _available_memory_bytes(device) -> int:
+    """
+    Memoria libre aproximada para el dispositivo del modelo.
+    En CPU lee MemAvailable de /proc/meminfo (Linux); si no existe, asume 2 GB.
+    """
+    if device is not None and getattr(device, "type", "cpu") == "cuda":
+        try:
+            import torch
+
+            free, _total = torch.cuda.mem_get_info(device)
+            return int(free)
+        except Exception:
+            pass
+
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return 2 * 1024 ** 3
+
+
+def auto_batch_size(model, decode_kwargs: Dict) -> int:
+    """
+    Elige cuántas ventanas de 30s decodificar juntas según la memoria disponible.
+
+    Por elemento del lote se estima:
+      - caché KV del decoder (self + cross attention) por cada beam/muestra
+      - activaciones del encoder (incluida la matriz de atención 1500x1500)
+    Se usa como máximo la mitad de la memoria libre.
+    """
+    dims = model.dims
+    bytes_per_value = 4  # fp32 en CPU
+    n_group = max(int(decode_kwargs.get("beam_size") or 1), 1)
+
+    kv_cache = dims.n_text_layer * 2 * (dims.n_audio_ctx + dims.n_text_ctx) * dims.n_text_state
+    encoder = dims.n_audio_ctx * dims.n_audio_state * 8 + dims.n_audio_head * dims.n_audio_ctx ** 2
+    per_item = (n_group * kv_cache + encoder + dims.n_mels * N_FRAMES) * bytes_per_value
+
+    budget = _available_memory_bytes(getattr(model, "device", None)) // 2
+    return int(max(1, min(MAX_DECODE_BATCH, budget // max(per_item, 1))))
+
+
+def temperature_ladder(decode_kwargs: Dict) -> Tuple[float, ...]:
+    """Temperaturas a probar por ventana (una sola = sin fallback)."""
+    t = decode_kwargs.get("temperature", 0.0)
+    return tuple(float(x) for x in t) if isinstance(t, (list, tuple)) else (float(t),)
+
+
+def _decoding_options(decode_kwargs: Dict, temperature: Optional[float] = None) -> "whisper.DecodingOptions":
+    """
+    Traduce build_decode_kwargs a DecodingOptions, igual que whisper.transcribe:
+    con temperatura 0 se descarta best_of y con temperatura > 0 se descarta beam_size.
+    """
+    t = temperature_ladder(decode_kwargs)[0] if temperature is None else float(temperature)
+    import whisper
+
+    kwargs = {k: v for k, v in decode_kwargs.items() if k in _decoding_option_keys()}
+    if t > 0:
+        kwargs.pop("beam_size", None)
+        kwargs.pop("patience", None)
+    else:
+        kwargs.pop("best_of", None)
+    kwargs["temperature"] = t
+    return whisper.DecodingOptions(**kwargs)
+
+
+def _needs_fallback(result, decode_kwargs: Dict) -> bool:
+    """Mismo criterio que decode_with_fallback de whisper.transcribe."""
+    compression_ratio_threshold = decode_kwargs.get("compression_ratio_threshold")
+    logprob_threshold = decode_kwargs.get("logprob_threshold")
+    no_speech_threshold = decode_kwargs.get("no_speech_threshold")
+
+    needs = False
+    if compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold:
+        needs = True  # demasiado repetitivo
+    if logprob_threshold is not None and result.avg_logprob < logprob_threshold:
+        needs = True  # poca confianza
+    if (
+        no_speech_threshold is not None
+        and result.no_speech_prob > no_speech_threshold
+        and logprob_threshold is not None
+        and result.avg_logprob < logprob_threshold
+    ):
+        needs = False  # silencio: se salta, no se reintenta
+    return needs
+
+
+class FallbackBudget:
+    """
+    Re-decodificaciones con una temperatura mayor permitidas en un trabajo.
+    Así unos pocos segmentos problemáticos (ruido, música) no multiplican el
+    tiempo total: cuando se agota, cada ventana se queda con su resultado.
+    """
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.used = 0
+
+    @classmethod
+    def for_windows(cls, n_windows: int, per_window: float = FALLBACK_BUDGET) -> "FallbackBudget":
+        if per_window < 0:
+            return cls(None)
+        return cls(int(math.ceil(per_window * n_windows)))
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.limit is None else max(0, self.limit - self.used)
+
+    def take(self) -> bool:
+        if self.limit is not None and self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def charge(self, n: int):
+        # Re-decodificaciones que ya ocurrieron (p. ej. dentro de model.transcribe)
+        self.used += max(0, n)
+
+
+def _window_skipped(result, decode_kwargs: Dict) -> bool:
+    """Ventana descartada como silencio (mismo criterio que whisper.transcribe)."""
+    no_speech_threshold = decode_kwargs.get("no_speech_threshold")
+    logprob_threshold = decode_kwargs.get("logprob_threshold")
+    if no_speech_threshold is None or result.no_speech_prob <= no_speech_threshold:
+        return False
+    return logprob_threshold is None or result.avg_logprob <= logprob_threshold
+
+
+def _worse_confidence(conf: Optional[Dict], avg_logprob: float, no_speech_prob: float, compression_ratio: float) -> Dict:
+    """Acumula la peor ventana de un chunk (menor logprob, mayor no_speech y compresión)."""
+    if conf is None:
+        return {
+            "avg_logprob": float(avg_logprob),
+            "no_speech_prob": float(no_speech_prob),
+            "compression_ratio": float(compression_ratio),
+        }
+    return {
+        "avg_logprob": min(conf["avg_logprob"], float(avg_logprob)),
+        "no_speech_prob": max(conf["no_speech_prob"], float(no_speech_prob)),
+        "compression_ratio": max(conf["compression_ratio"], float(compression_ratio)),
+    }
+
+
+def segment_confidence(result: Dict) -> Optional[Dict]:
+    """
+    Peor ventana del resultado de model.transcribe (None si todo fue silencio).
+    Los segmentos de una misma ventana repiten sus métricas.
+    """
+    conf = None
+    for seg in result.get("segments") or []:
+        conf = _worse_confidence(conf, seg["avg_logprob"], seg["no_speech_prob"], seg["compression_ratio"])
+    return conf
+
+
+def _advance_window(state: Dict, result, segment_size: int, tokenizer, decode_kwargs: Dict) -> None:
+    """
+    Aplica el resultado de una ventana al estado de un chunk.
+    Replica la lógica de whisper.transcribe (sin word_timestamps) para que el
+    texto final sea el mismo que con model.transcribe(chunk).
+    """
+    import torch
+
+    input_stride = N_FRAMES // state["n_audio_ctx"]
+
+    if _window_skipped(result, decode_kwargs):
+        state["seek"] += segment_size
+        return
+
+    tokens = torch.tensor(result.tokens)
+    timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+    single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+
+    def keep(sliced: "torch.Tensor", same_start_end: bool) -> None:
+        text_tokens = [t for t in sliced.tolist() if t < tokenizer.eot]
+        if same_start_end or tokenizer.decode(text_tokens).strip() == "":
+            return
+        state["tokens"].extend(sliced.tolist())
+
+    consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+    consecutive.add_(1)
+    if len(consecutive) > 0:
+        slices = consecutive.tolist()
+        if single_timestamp_ending:
+            slices.append(len(tokens))
+
+        last_slice = 0
+        for current_slice in slices:
+            sliced = tokens[last_slice:current_slice]
+            keep(sliced, sliced[0].item() == sliced[-1].item())
+            last_slice = current_slice
+
+        if single_timestamp_ending:
+            state["seek"] += segment_size
+        else:
+            last_timestamp_pos = tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+            state["seek"] += last_timestamp_pos * input_stride
+    else:
+        keep(tokens, False)
+        state["seek"] += segment_size
+
+
+def iter_chunks_batched(
+    model,
+    chunks: List,
+    decode_kwargs: Dict,
+    batch_size: int,
+    budget: Optional[FallbackBudget] = None,
+) -> Iterator[Tuple[int, str, Dict]]:
+    """
+    Transcribe varios chunks (<= 30s) apilando sus log-mel en un solo tensor y
+    produce (índice, texto, info) apenas termina cada chunk.
+
+    Encoder y decoder (greedy o beam) corren sobre el lote completo. Cada chunk
+    mantiene su propio "seek" como en whisper.transcribe, así que si una ventana
+    termina a mitad de audio, se vuelve a decodificar la cola en la siguiente ronda.
+    El lote se rellena en orden con los chunks pendientes a medida que otros
+    terminan: los primeros textos salen pronto y el lote se mantiene lleno.
+
+    Con escalera de temperaturas, una ventana que no pasa los umbrales se
+    vuelve a decodificar con la siguiente temperatura en la ronda siguiente
+    (un lote por temperatura), mientras quede presupuesto en `budget`.
+    info: {"fallbacks": re-decodificaciones, "temperature": máxima usada,
+    "aborted": alguna ventana cortada por LoopGuard, "confidence": peor
+    ventana no descartada como silencio (ver segment_confidence)}.
+    """
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+    from .whisper_decoding import BatchDecodingTask
+
+    ladder = temperature_ladder(decode_kwargs)
+    options = [_decoding_options(decode_kwargs, t) for t in ladder]
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=options[0].language,
+        task=options[0].task,
+    )
+    if budget is None:
+        budget = FallbackBudget(None)
+
+    queue = deque(range(len(chunks)))
+    states: Dict[int, Dict] = {}
+    active: List[int] = []
+
+    def info(state: Dict) -> Dict:
+        return {
+            "fallbacks": state["fallbacks"],
+            "temperature": state["max_t"],
+            "aborted": state["aborted"],
+            "confidence": state["confidence"],
+        }
+
+    while queue or active:
+        while queue and len(active) < batch_size:
+            i = queue.popleft()
+            # Igual que transcribe(): 30s de padding para poder recortar ventanas
+            mel = whisper.log_mel_spectrogram(chunks[i], model.dims.n_mels, padding=N_SAMPLES)
+            state = {
+                "mel": mel,
+                "content_frames": mel.shape[-1] - N_FRAMES,
+                "seek": 0,
+                "tokens": [],
+                "n_audio_ctx": model.dims.n_audio_ctx,
+                "t_idx": 0,
+                "fallbacks": 0,
+                "max_t": ladder[0],
+                "aborted": False,
+                "confidence": None,
+            }
+            if state["seek"] < state["content_frames"]:
+                states[i] = state
+                active.append(i)
+            else:
+                yield i, "", info(state)
+        if not active:
+            continue
+
+        # Un lote por temperatura (DecodingOptions es por tarea)
+        groups: Dict[int, List[int]] = {}
+        for i in active:
+            groups.setdefault(states[i]["t_idx"], []).append(i)
+
+        finished = set()
+        for t_idx, members in sorted(groups.items()):
+            mels, sizes = [], []
+            for i in members:
+                item = states[i]
+                size = min(N_FRAMES, item["content_frames"] - item["seek"])
+                segment = item["mel"][:, item["seek"]:item["seek"] + size]
+                mels.append(whisper.pad_or_trim(segment, N_FRAMES))
+                sizes.append(size)
+
+            batch = torch.stack(mels).to(model.device).to(torch.float32)
+            with span("segment_batch", mode="batched", chunks=len(members), frames=sum(sizes), temperature=ladder[t_idx]) as sp:
+                task = BatchDecodingTask(model, options[t_idx])
+                results = task.run(batch)
+                aborted = task.aborted_audio()
+                sp.set(loop_aborts=len(aborted))
+
+            for n, (i, size, result) in enumerate(zip(members, sizes, results)):
+                state = states[i]
+                state["aborted"] = state["aborted"] or n in aborted
+                state["max_t"] = max(state["max_t"], ladder[t_idx])
+                if t_idx + 1 < len(ladder) and _needs_fallback(result, decode_kwargs) and budget.take():
+                    # Misma ventana, siguiente temperatura en la próxima ronda
+                    state["t_idx"] += 1
+                    state["fallbacks"] += 1
+                    continue
+                state["t_idx"] = 0
+                if not _window_skipped(result, decode_kwargs):
+                    state["confidence"] = _worse_confidence(
+                        state["confidence"], result.avg_logprob, result.no_speech_prob, result.compression_ratio
+                    )
+                _advance_window(state, result, size, tokenizer, decode_kwargs)
+                if state["seek"] >= state["content_frames"]:
+                    finished.add(i)
+
+        still_active = []
+        for i in active:
+            if i in finished:
+                state = states.pop(i)
+                yield i, tokenizer.decode(state["tokens"]).strip(), info(state)
+            else:
+                still_active.append(i)
+        active = still_active
+
+
+def temperature_fallbacks(result: Dict, decode_kwargs: Dict) -> Tuple[int, float]:
+    """
+    (ventanas re-decodificadas con una temperatura mayor a la inicial,
+    temperatura máxima usada) a partir del resultado de model.transcribe.
+    """
+    temperature = decode_kwargs.get("temperature", 0.0)
+    base = temperature[0] if isinstance(temperature, (list, tuple)) else temperature
+    segments = result.get("segments") or []
+    temps = [seg.get("temperature", base) for seg in segments]
+    # Una ventana re-decodificada puede dar varios segmentos (mismo seek)
+    windows = {seg.get("seek") for seg in segments if seg.get("temperature", base) > base}
+    return len(windows), max(temps, default=base)
+
+
 def _segments_total_audio_sec(segments: List[Tuple[float, float]]) -> float:
     return max(0.01, sum(max(0.0, e - s) for s, e in segments))
 
 
-def transcribe_with_silence_segments(
+def _in_order(results: Iterator[Tuple], start: int = 0) -> Iterator[Tuple]:
+    """Reordena (índice, ...) que llegan en cualquier orden: solo emite prefijos completos."""
+    pending: Dict[int, Tuple] = {}
+    nxt = start
+    for item in results:
+        pending[item[0]] = item
+        while nxt in pending:
+            yield pending.pop(nxt)
+            nxt += 1
+
+
+# RTF del modelo/preset pesado medido en la última revisión de este proceso:
+# estima el ahorro de las dos pasadas aunque en un trabajo no se revise nada
+_ESCALATION_RTF: Dict[Tuple[str, str, bool], float] = {}
+
+
+def needs_escalation(text: str, info: Dict, thresholds: Dict) -> bool:
+    """
+    ¿El segmento del borrador se re-decodifica con el modelo pesado?
+    Sí si LoopGuard lo cortó, o si tiene texto y su peor ventana queda con
+    poca confianza, mucha repetición o dudosa entre voz y silencio.
+    """
+    if info.get("aborted"):
+        return True
+    conf = info.get("confidence")
+    if not text or conf is None:
+        return False  # todo silencio para el borrador
+    return (
+        conf["avg_logprob"] < thresholds["logprob"]
+        or conf["compression_ratio"] > thresholds["compression_ratio"]
+        or conf["no_speech_prob"] > thresholds["no_speech"]
+    )
+
+
+def _timed(results: Iterator[Tuple], clock: Dict[str, float], key: str) -> Iterator[Tuple]:
+    # Suma en clock[key] lo que tarda en producirse cada elemento (sin el tiempo del consumidor)
+    results = iter(results)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(results)
+        except StopIteration:
+            return
+        finally:
+            clock[key] += time.perf_counter() - t0
+        yield item
+
+
+def iter_transcription(
     model,
-    wav_path: str,
+    audio: Union[str, np.ndarray],
     duration_sec: float,
-    settings: Dict
-) -> Tuple[str, Dict]:
+    settings: Dict,
+    on_progress: Optional[Callable[[float, Optional[str]], None]] = None,
+    silences: Optional[List[Tuple[float, float]]] = None,
+    draft=None,
+) -> Generator[Dict, None, Dict]:
+    """
+    Igual que transcribe_with_silence_segments, pero como generador: produce
+    {"index", "start", "end", "text"} por ventana, en orden, apenas cada una
+    está lista (el texto parcial siempre es un prefijo del final). Al agotarse
+    retorna las stats (StopIteration.value / `stats = yield from ...`).
+
+    audio: buffer float32 16kHz mono (ffmpeg_audio.decode_to_pcm16k) o ruta a un archivo.
+    on_progress(fracción 0..1, mensaje o None): no depende de Streamlit, así
+    puede correr en un hilo de fondo (ver src/jobs.py).
+    silences: resultado de silencedetect ya calculado sobre este mismo audio
+    (ffmpeg_audio.decode_with_silences); solo se usa sin auto_silence.
+
+    draft: modelo ya cargado para settings["draft_model"]. Con dos pasadas
+    (config.two_pass_enabled), el borrador transcribe todo con
+    draft_precision y solo los segmentos que no pasan
+    config.escalation_thresholds se re-decodifican con `model` y el preset
+    elegido; stats["two_pass"] reporta cuántos y el tiempo ahorrado estimado.
+    """
+    def notify(fraction: float, message: Optional[str] = None):
+        if on_progress:
+            on_progress(fraction, message)
+
     decode_kwargs = build_decode_kwargs(settings)
     audio_profile = settings["audio_profile"]
     is_music = "Música" in audio_profile
 
-    silences = detect_silences_ffmpeg(
-        wav_path,
-        settings["silence_db"],
-        settings["min_silence"],
-    )
-
-    segments = build_segments_from_silences(
-        duration_sec,
-        silences,
-        settings["min_segment"],
-    )
+    if isinstance(audio, str):
+        import whisper
 
-    # Si hay demasiados cortes (pasa en música), reduce cantidad de llamadas:
-    # fallback a chunks fijos de 22s si hay más de 18 segmentos.
-    if len(segments) > 18 and duration_sec > 0:
-        segments = build_fixed_segments(duration_sec, chunk_sec=22.0)
-
-    if len(segments) <= 1:
-        chunk = 20.0
-        segments = build_fixed_segments(duration_sec, chunk_sec=chunk)
+        audio = whisper.load_audio(audio)
+    sr = 16000
 
     # Overlap pequeño (reduce cortes, pero no dispara costo)
     overlap_sec = 0.15 if is_music else 0.10
 
-    audio = whisper.load_audio(wav_path)
-    sr = 16000
+    silence_db = settings["silence_db"]
+    auto_silence = settings.get("auto_silence", True)
+    with span("segmentation", method="energy" if auto_silence else "silencedetect") as sp:
+        if auto_silence:
+            # VAD en memoria con umbral calibrado por archivo
+            silences, threshold_db = detect_silences_energy(audio, settings["min_silence"], sr=sr)
+            silence_db = int(round(threshold_db))
+        elif silences is None:
+            silences = detect_silences_ffmpeg(
+                audio,
+                settings["silence_db"],
+                settings["min_silence"],
+            )
+
+        segments = build_segments_from_silences(
+            duration_sec,
+            silences,
+            settings["min_segment"],
+        )
+
+        speech_segments = len(segments)
+        if len(segments) <= 1:
+            chunk = 20.0
+            segments = build_fixed_segments(duration_sec, chunk_sec=chunk)
+        elif settings.get("pack_segments", True) and duration_sec > 0:
+            # Varios segmentos por llamada, cortando solo en silencios: deja
+            # margen para el overlap de ambos lados dentro de los 30s
+            segments = pack_segments(segments, max_window=30.0 - 2 * overlap_sec)
+        elif len(segments) > 18 and duration_sec > 0:
+            # Sin agrupar: demasiados cortes (pasa en música) -> chunks fijos de 22s
+            segments = build_fixed_segments(duration_sec, chunk_sec=22.0)
+
+        sp.set(silences=len(silences), speech_segments=speech_segments, segments=len(segments), silence_db=silence_db)
 
     total_audio_sec = _segments_total_audio_sec(segments)
-    progress = st.progress(0)
-    status = st.empty()
-    eta_box = st.empty()
-
-    texts: List[str] = []
-    processed = 0.0
-    rtf = None
+    notify(0.0, None)
 
-    for i, (s, e) in enumerate(segments, start=1):
+    # Ventanas a transcribir (con overlap) en orden
+    windows = []
+    for s, e in segments:
         s2 = max(0.0, s - overlap_sec)
         e2 = min(duration_sec, e + overlap_sec) if duration_sec > 0 else e + overlap_sec
-
-        status.info(f"Transcribiendo segmento {i}/{len(segments)}")
-
         start_sample = int(s2 * sr)
         end_sample = int(e2 * sr)
-        chunk = audio[start_sample:end_sample]
-        chunk_dur = max(0.01, (end_sample - start_sample) / sr)
-
-        if rtf is not None:
-            remaining = max(0.0, total_audio_sec - processed)
-            eta_box.info(f"Tiempo estimado restante: ~{int(remaining * rtf)}s")
+        windows.append({
+            "seg_sec": max(0.0, e - s),
+            "chunk": audio[start_sample:end_sample],
+            "chunk_dur": max(0.01, (end_sample - start_sample) / sr),
+        })
 
-        t0 = time.time()
-        res = model.transcribe(chunk, **decode_kwargs)
-        t1 = time.time()
-
-        txt = (res.get("text") or "").strip()
+    texts: List[str] = []
+    processed = 0.0
+    rtf = None
+    segment_fallbacks: List[int] = [0] * len(windows)
+    segment_conf: List[Optional[Dict]] = [None] * len(windows)
+    loop_aborts = 0
+
+    def mark_done(i: int):
+        nonlocal processed
+        processed += windows[i]["seg_sec"]
+        notify(min(1.0, processed / total_audio_sec))
+
+    def segment_result(i: int, txt: str, info: Dict) -> Dict:
+        nonlocal loop_aborts
+        s, e = segments[i]
         if txt:
             texts.append(txt)
-
-        wall = max(0.001, t1 - t0)
-        if rtf is None:
-            rtf = min(max(wall / chunk_dur, 0.4), 12.0)
-
-        processed += max(0.0, (e - s))
-        progress.progress(int(min(1.0, processed / total_audio_sec) * 100))
-
-    status.success("Transcripción completada.")
-    eta_box.empty()
-
-    stats = {
+        fallbacks = int(info.get("fallbacks") or 0)
+        aborted = bool(info.get("aborted"))
+        segment_fallbacks[i] = fallbacks
+        segment_conf[i] = info.get("confidence")
+        loop_aborts += aborted
+        return {
+            "index": i,
+            "start": s,
+            "end": e,
+            "text": txt,
+            "fallbacks": fallbacks,
+            "aborted": aborted,
+            "escalated": bool(info.get("escalated")),
+        }
+
+    def decode_windows(
+        model,
+        decode_kwargs: Dict,
+        idx: List[int],
+        budget: FallbackBudget,
+        workers: int = 1,
+        prefix: str = "",
+    ) -> Iterator[Tuple[int, str, Dict]]:
+        # (i, texto, info) de las ventanas idx en el orden en que terminan:
+        # procesos worker, o lotes (ventanas <= 30s) y luego las largas una a una
+        nonlocal rtf
+
+        # Modo multiproceso: cada worker tiene su propia copia del modelo
+        if workers > 1:
+            notify(min(1.0, processed / total_audio_sec), f"{prefix}Transcribiendo {len(idx)} segmentos en {workers} procesos")
+
+            t0 = time.time()
+            done = iter_chunks_parallel(
+                settings["model_key"],
+                [windows[i]["chunk"] for i in idx],
+                decode_kwargs,
+                workers=workers,
+                int8=bool(settings.get("int8")),
+            )
+            for j, txt, info in done:
+                yield idx[j], txt, info
+            t1 = time.time()
+
+            total_chunk_sec = sum(windows[i]["chunk_dur"] for i in idx)
+            rtf = min(max(max(0.001, t1 - t0) / total_chunk_sec, 0.4), 12.0)
+            return
+
+        # Modo por lotes: solo chunks que caben en una ventana de 30s
+        batched_idx: List[int] = []
+        if settings.get("batch_decode", True):
+            batched_idx = [i for i in idx if len(windows[i]["chunk"]) <= N_SAMPLES]
+        batched_set = set(batched_idx)
+        serial_idx = [i for i in idx if i not in batched_set]
+
+        ladder = temperature_ladder(decode_kwargs)
+
+        def serial_results() -> Iterator[Tuple[int, str, Dict]]:
+            nonlocal rtf
+            from .whisper_decoding import transcribe_guarded
+
+            for n, i in enumerate(serial_idx, start=1):
+                w = windows[i]
+                message = f"{prefix}Transcribiendo segmento {n}/{len(serial_idx)}"
+                if rtf is not None:
+                    remaining = max(0.0, total_audio_sec - processed)
+                    message += f" · tiempo estimado restante: ~{int(remaining * rtf)}s"
+                notify(min(1.0, processed / total_audio_sec), message)
+
+                kwargs = decode_kwargs
+                if len(ladder) > 1 and budget.remaining is not None:
+                    # model.transcribe no admite presupuesto: se recorta la escalera
+                    # a lo que queda (aproximado: puede usarla en varias ventanas)
+                    kwargs = dict(decode_kwargs, temperature=ladder[: 1 + budget.remaining])
+                with span("segment", mode="serial", seg_sec=round(w["seg_sec"], 2), chunk_sec=round(w["chunk_dur"], 2)) as sp:
+                    t0 = time.time()
+                    res, window_aborts = transcribe_guarded(model, w["chunk"], **kwargs)
+                    t1 = time.time()
+                    fallbacks, temperature = temperature_fallbacks(res, decode_kwargs)
+                    budget.charge(fallbacks)
+                    sp.set(fallbacks=fallbacks, temperature=temperature, loop_aborts=window_aborts)
+
+                wall = max(0.001, t1 - t0)
+                if rtf is None:
+                    rtf = min(max(wall / w["chunk_dur"], 0.4), 12.0)
+
+                yield i, (res.get("text") or "").strip(), {
+                    "fallbacks": fallbacks,
+                    "temperature": temperature,
+                    "aborted": window_aborts > 0,
+                    "confidence": segment_confidence(res),
+                }
+
+        def batched_results() -> Iterator[Tuple[int, str, Dict]]:
+            nonlocal rtf
+            batch_size = auto_batch_size(model, decode_kwargs)
+            notify(
+                min(1.0, processed / total_audio_sec),
+                f"{prefix}Transcribiendo {len(batched_idx)} segmentos en lotes de {batch_size}",
+            )
+
+            t0 = time.time()
+            chunks = [windows[i]["chunk"] for i in batched_idx]
+            for j, txt, info in iter_chunks_batched(model, chunks, decode_kwargs, batch_size=batch_size, budget=budget):
+                yield batched_idx[j], txt, info
+            t1 = time.time()
+
+            batch_audio = sum(windows[i]["chunk_dur"] for i in batched_idx)
+            rtf = min(max(max(0.001, t1 - t0) / batch_audio, 0.4), 12.0)
+
+        if batched_idx:
+            yield from batched_results()
+        yield from serial_results()
+
+    workers = int(settings.get("parallel_workers") or 1)
+    all_idx = list(range(len(windows)))
+    two_pass = None
+
+    if draft is None or not two_pass_enabled(settings):
+        budget = FallbackBudget.for_windows(len(windows))
+        local = decode_windows(model, decode_kwargs, all_idx, budget, workers)
+        for i, txt, info in _in_order(_marking(local, mark_done)):
+            yield segment_result(i, txt, info)
+        fallback_budget = budget.limit
+    else:
+        # Borrador + revisión. El pool de procesos es de un solo modelo: las
+        # dos pasadas corren en este proceso (lotes / una a una)
+        thresholds = escalation_thresholds(settings)
+        draft_key = settings["draft_model"]
+        draft_precision = settings.get("draft_precision", "Rápido")
+        draft_kwargs = build_decode_kwargs(dict(settings, precision=draft_precision))
+        draft_budget = FallbackBudget.for_windows(len(windows))
+        clock = {"draft": 0.0, "escalation": 0.0}
+
+        # Pasada 1: todo con el borrador. Lo confiable sale de inmediato mientras
+        # no haya antes un segmento pendiente de revisión (el texto parcial
+        # siempre es prefijo del final)
+        escalated: List[int] = []
+        held: List[Tuple[int, str, Dict]] = []
+        drafts = _timed(decode_windows(draft, draft_kwargs, all_idx, draft_budget, prefix=f"Borrador ({draft_key}) · "), clock, "draft")
+        for i, txt, info in _in_order(drafts):
+            if needs_escalation(txt, info, thresholds):
+                escalated.append(i)
+                continue
+            mark_done(i)
+            if escalated:
+                held.append((i, txt, info))
+            else:
+                yield segment_result(i, txt, info)
+        record("draft_pass", clock["draft"], model=draft_key, precision=draft_precision, segments=len(windows), escalated=len(escalated))
+
+        # Pasada 2: solo los segmentos dudosos, con el modelo y preset elegidos
+        budget_limits = [draft_budget.limit]
+        if escalated:
+            budget = FallbackBudget.for_windows(len(escalated))
+            budget_limits.append(budget.limit)
+            heavy = decode_windows(model, decode_kwargs, escalated, budget, prefix=f"Revisión ({settings['model_key']}) · ")
+            revised = ((i, txt, dict(info, escalated=True)) for i, txt, info in _marking(_timed(heavy, clock, "escalation"), mark_done))
+            for i, txt, info in _in_order(itertools.chain(held, revised), start=escalated[0]):
+                yield segment_result(i, txt, info)
+            record(
+                "escalation_pass",
+                clock["escalation"],
+                model=settings["model_key"],
+                precision=settings["precision"],
+                segments=len(escalated),
+            )
+        fallback_budget = None if None in budget_limits else sum(budget_limits)
+
+        # Ahorro estimado: lo que habría tardado el modelo pesado con todo el audio
+        # (a su RTF medido en la revisión; sin revisión, el último conocido)
+        window_audio = sum(w["chunk_dur"] for w in windows) or 0.01
+        escalated_audio = sum(windows[i]["chunk_dur"] for i in escalated)
+        rtf_key = (settings["model_key"], settings["precision"], bool(settings.get("int8")))
+        if escalated_audio > 0:
+            _ESCALATION_RTF[rtf_key] = clock["escalation"] / escalated_audio
+        heavy_rtf = _ESCALATION_RTF.get(rtf_key)
+        spent = clock["draft"] + clock["escalation"]
+        rtf = min(max(spent / window_audio, 0.4), 12.0)
+
+        two_pass = {
+            "draft_model": draft_key,
+            "draft_precision": draft_precision,
+            "thresholds": thresholds,
+            "segments_escalated": len(escalated),
+            "escalated": escalated,
+            "escalated_audio_sec": round(escalated_audio, 2),
+            "draft_sec": round(clock["draft"], 3),
+            "escalation_sec": round(clock["escalation"], 3),
+            "single_pass_sec_est": round(heavy_rtf * window_audio, 3) if heavy_rtf is not None else None,
+            "saved_sec_est": round(heavy_rtf * window_audio - spent, 3) if heavy_rtf is not None else None,
+        }
+
+    notify(1.0, "Transcripción completada.")
+
+    return {
         "segments_count": len(segments),
-        "silence_db": settings["silence_db"],
+        "speech_segments": speech_segments,
+        "silence_db": silence_db,
         "min_silence": settings["min_silence"],
         "min_segment": settings["min_segment"],
         "rtf": rtf or 0.0,
+        "segment_texts": texts,
+        "fallbacks_total": sum(segment_fallbacks),
+        "fallback_budget": fallback_budget,
+        "segment_fallbacks": segment_fallbacks,
+        "segment_confidence": segment_conf,
+        "loop_aborts": loop_aborts,
+        "two_pass": two_pass,
     }
-    return "\n".join(texts).strip(), stats
+
+
+def _marking(results: Iterator[Tuple], mark_done: Callable[[int], None]) -> Iterator[Tuple]:
+    # Progreso por ventana terminada (antes de reordenar)
+    for item in results:
+        mark_done(item[0])
+        yield item
+
+
+def transcribe_with_silence_segments(
+    model,
+    audio: Union[str, np.ndarray],
+    duration_sec: float,
+    settings: Dict,
+    on_progress: Optional[Callable[[float, Optional[str]], None]] = None,
+    silences: Optional[List[Tuple[float, float]]] = None,
+    draft=None,
+) -> Tuple[str, Dict]:
+    """
+    Transcripción completa de una vez: consume iter_transcription y retorna
+    (texto, stats).
+    """
+    gen = iter_transcription(model, audio, duration_sec, settings, on_progress, silences, draft)
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            stats = stop.value
+            break
+    return "\n".join(stats["segment_texts"]).strip(), stats
@@ -1,3 +1,5 @@
+import os
+
 import streamlit as st
 
 from .config import (
@@ -7,6 +9,7 @@ from .config import (
     PRECISION_LEVELS,
     get_model_options,
     is_streamlit_cloud,
+    int8_default,
 )
 from .session_sec import get_runs_for_user
 
@@ -233,9 +236,53 @@ def sidebar_settings() -> dict:
             default_min_sil = 0.30 if "Música" in audio_profile else 0.45
             default_min_seg = 1.20 if "Música" in audio_profile else 1.50
 
-            silence_db = st.slider("Umbral de silencio (dB)", -60, -15, default_db)
+            auto_silence = st.checkbox(
+                "Umbral de silencio automático",
+                value=True,
+                help="Mide el ruido de fondo de cada archivo y elige el umbral solo.",
+            )
+            silence_db = st.slider("Umbral de silencio (dB)", -60, -15, default_db, disabled=auto_silence)
             min_silence = st.slider("Silencio mínimo (seg)", 0.10, 2.0, default_min_sil, 0.05)
             min_segment = st.slider("Segmento mínimo (seg)", 0.50, 5.0, default_min_seg, 0.10)
+            pack_segments = st.checkbox(
+                "Agrupar segmentos en ventanas de 30s",
+                value=True,
+                help="Une segmentos seguidos (cortando solo en silencios) para hacer menos llamadas al modelo.",
+            )
+
+        with st.expander("⚙️ Rendimiento", expanded=False):
+            batch_decode = st.checkbox(
+                "Decodificar segmentos por lotes",
+                value=True,
+                help="Procesa varios segmentos cortos a la vez en el modelo. Mismo texto, menos tiempo.",
+            )
+
+            cpu_count = os.cpu_count() or 1
+            worker_options = [n for n in (1, 2, 4, 8, 16) if n <= cpu_count]
+            parallel_workers = st.selectbox(
+                "Procesos en paralelo",
+                worker_options,
+                index=0,
+                help="Reparte los segmentos entre varios procesos. Cada proceso carga su propia copia del modelo (más RAM).",
+            )
+
+            int8 = st.checkbox(
+                "Modelo cuantizado int8 (CPU)",
+                value=int8_default(precision),
+                help="Más rápido y con menos RAM en CPU; el texto puede variar levemente.",
+            )
+
+            draft_model = ""
+            if precision != "Rápido" or model_key != "small":
+                two_pass = st.checkbox(
+                    "Borrador rápido + revisión",
+                    value=False,
+                    help="Un modelo rápido transcribe todo y solo los segmentos dudosos se vuelven "
+                         "a transcribir con el modelo y la precisión elegidos.",
+                )
+                if two_pass:
+                    draft_label = st.selectbox("Modelo del borrador", tuple(model_options.keys()), index=0)
+                    draft_model = model_options[draft_label]
 
         st.divider()
         st.subheader("Acceso VIP")
@@ -255,9 +302,16 @@ def sidebar_settings() -> dict:
         "clean_text": clean_text,
         "normalize_elongations": normalize_elongations,
         "max_consecutive_repeats": max_consecutive_repeats,
+        "auto_silence": auto_silence,
         "silence_db": silence_db,
         "min_silence": min_silence,
         "min_segment": min_segment,
+        "pack_segments": pack_segments,
+        "batch_decode": batch_decode,
+        "parallel_workers": parallel_workers,
+        "int8": int8,
+        "draft_model": draft_model,
+        "draft_precision": "Rápido",
         "secret_code": secret_code,
     }
 
@@ -0,0 +1,184 @@
+"""
+Precarga de modelos al arrancar el servidor.
+
+Sin esto, el primer usuario después de un deploy paga whisper.load_model
+dentro de "3/4 Cargando modelo" y, en su primer segmento, la primera
+inferencia de PyTorch (reserva de memoria, elección de kernels).
+start_warmup() carga en un hilo de fondo los modelos de VIDEOSCRIBE_WARMUP
+(variantes float/int8 que este despliegue usa) y corre con cada uno una
+decodificación corta sobre silencio, por preset de precisión.
+
+Disponibilidad: status() y, si VIDEOSCRIBE_READY_FILE está configurado, ese
+archivo (se borra al arrancar y se escribe con el estado al terminar), para
+que el balanceador solo mande tráfico a nodos ya calientes.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+from .config import AUDIO_PROFILES, PRECISION_LEVELS, READY_FILE, headless_settings, int8_default, warmup_model_keys
+
+WARMUP_RUNNING = "warming"
+WARMUP_READY = "ready"
+# Terminó, pero algún modelo falló (el resto se puede usar)
+WARMUP_DEGRADED = "degraded"
+
+# Audio de la inferencia de calentamiento
+_WARMUP_SAMPLES = 2 * 16000
+
+
+class Warmup:
+    """
+    Un hilo que recorre los modelos en orden. Con pin=True los modelos
+    quedan fijados en el registro mientras viva el proceso (p. ej. la API
+    con --warm); si no, quedan residentes pero desalojables por el
+    presupuesto de RAM.
+    """
+
+    def __init__(self, models: List[str], pin: bool = False, ready_file: str = READY_FILE):
+        self.models = models
+        self.pin = pin
+        self.ready_file = ready_file
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._held = ExitStack()
+        self._state = WARMUP_RUNNING
+        self._models: Dict[str, Dict] = {key: {"state": "pending"} for key in models}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Warmup":
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="videoscribe-warmup", daemon=True)
+        # Un archivo de una ejecución anterior no debe dar el nodo por listo
+        if self.ready_file and os.path.exists(self.ready_file):
+            os.remove(self.ready_file)
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict:
+        from .model_registry import get_model_registry
+
+        resident = {m["key"] for m in get_model_registry().stats()["models"]}
+        with self._lock:
+            models = {key: dict(info) for key, info in self._models.items()}
+            out = {
+                "state": self._state,
+                "ready": self._state != WARMUP_RUNNING,
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+            }
+        for info in models.values():
+            if "variants" in info:
+                # Un modelo precargado puede haber sido desalojado después
+                info["resident"] = all(v in resident for v in info["variants"])
+        out["models"] = models
+        return out
+
+    def close(self):
+        """Suelta los modelos fijados con pin=True."""
+        self._held.close()
+
+    # ---- internos ----
+
+    def _set(self, key: str, **fields):
+        with self._lock:
+            self._models[key].update(fields)
+
+    def _run(self):
+        for key in self.models:
+            self._set(key, state="loading")
+            print(f"--- Precargando modelo Whisper {key.upper()} ---", flush=True)
+            try:
+                info = self._warm(key)
+            except Exception as e:
+                self._set(key, state="error", error=f"{type(e).__name__}: {e}")
+                print(f"⚠️ No se pudo precargar {key}: {e}", flush=True)
+                continue
+            self._set(key, state="ready", **info)
+
+        with self._lock:
+            failed = any(info["state"] == "error" for info in self._models.values())
+            self._state = WARMUP_DEGRADED if failed else WARMUP_READY
+            self._finished_at = time.time()
+            total = self._finished_at - self._started_at
+        # Primero el archivo: quien espere con wait() ya lo encuentra escrito
+        self._write_ready_file()
+        self._done.set()
+        print(f"--- Precarga terminada en {total:.1f}s ({self._state}) ---", flush=True)
+
+    def _warm(self, key: str) -> Dict:
+        import numpy as np
+        from .pipeline import _model_lock
+        from .transcriber import build_decode_kwargs, iter_chunks_batched, whisper_model, whisper_registry_key
+
+        silence = np.zeros(_WARMUP_SAMPLES, dtype=np.float32)
+        load_sec = warm_sec = 0.0
+        variants = []
+        for int8 in sorted({int8_default(p) for p in PRECISION_LEVELS}):
+            t0 = time.perf_counter()
+            with whisper_model(key, int8=int8) as model:
+                t1 = time.perf_counter()
+                # Mismo lock que los trabajos: no decodificar a la vez sobre la misma instancia
+                with _model_lock(key):
+                    for precision in PRECISION_LEVELS:
+                        if int8_default(precision) != int8:
+                            continue
+                        decode_kwargs = build_decode_kwargs(headless_settings(key, precision, AUDIO_PROFILES[0]))
+                        for _ in iter_chunks_batched(model, [silence], decode_kwargs, batch_size=1):
+                            pass
+                warm_sec += time.perf_counter() - t1
+                load_sec += t1 - t0
+                if self.pin:
+                    self._held.enter_context(whisper_model(key, int8=int8))
+            variants.append(whisper_registry_key(key, int8))
+        return {"load_sec": round(load_sec, 3), "warm_sec": round(warm_sec, 3), "variants": variants}
+
+    def _write_ready_file(self):
+        if not self.ready_file:
+            return
+        directory = os.path.dirname(self.ready_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.ready_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.status(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.ready_file)
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir {self.ready_file}: {e}", flush=True)
+
+
+_WARMUP: Optional[Warmup] = None
+_WARMUP_LOCK = threading.Lock()
+
+
+def start_warmup(models: Optional[List[str]] = None, pin: bool = False) -> Warmup:
+    """
+    Arranca la precarga una sola vez por proceso; las llamadas siguientes
+    devuelven la misma (Streamlit re-ejecuta el script en cada interacción).
+    models=None: los de VIDEOSCRIBE_WARMUP.
+    """
+    global _WARMUP
+    with _WARMUP_LOCK:
+        if _WARMUP is None:
+            _WARMUP = Warmup(warmup_model_keys() if models is None else list(models), pin=pin).start()
+        return _WARMUP
+
+
+def get_warmup() -> Optional[Warmup]:
+    return _WARMUP
@@ -0,0 +1,372 @@
+"""
+Demonio de carpetas vigiladas: transcribe lo que se deja en ellas.
+
+    python -m src.watch_folder /mnt/grabaciones /mnt/clases --model medium
+
+- watchdog avisa de archivos nuevos o modificados; además, al arrancar se
+  encolan los que aún no tienen su .txt.
+- Un archivo se procesa recién cuando su tamaño y mtime no cambian durante
+  --settle segundos (copias lentas por red, grabadoras que escriben por partes).
+- Deduplica por SHA-256 del contenido: una copia del mismo archivo reutiliza
+  el texto ya generado (y entre reinicios, la caché de resultados).
+- El modelo se carga una vez y queda fijado en el registro mientras corre el
+  demonio; cada archivo pasa por pipeline.run_transcription.
+- Junto a cada entrada escribe <nombre>.txt y <nombre>.timing.json.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .cache import hash_file
+from .config import AUDIO_PROFILE_ALIASES, LANG_OPTIONS, PRECISION_LEVELS, headless_settings, two_pass_enabled
+from .ffmpeg_audio import is_supported_file
+from .pipeline import run_transcription
+from .postprocess import postprocess_transcript
+from .tracing import trace, set_process_role
+from .transcriber import whisper_model
+
+TIMING_SUFFIX = ".timing.json"
+
+
+def output_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".txt"
+
+
+def timing_path(path: str) -> str:
+    return os.path.splitext(path)[0] + TIMING_SUFFIX
+
+
+def _signature(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def _write_atomic(path: str, text: str):
+    # Quien lea la carpeta nunca ve un .txt a medio escribir
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class SettleTracker:
+    """
+    Archivos vistos que todavía podrían estar escribiéndose. ready() retorna
+    los que llevan settle_sec sin cambiar de tamaño ni de mtime.
+    """
+
+    def __init__(self, settle_sec: float):
+        self.settle_sec = settle_sec
+        self._lock = threading.Lock()
+        # ruta -> (tamaño, mtime, estable desde)
+        self._files: Dict[str, Tuple[int, float, float]] = {}
+
+    def touch(self, path: str):
+        with self._lock:
+            self._files[path] = (-1, -1.0, time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._files)
+
+    def ready(self) -> List[str]:
+        now = time.monotonic()
+        done = []
+        with self._lock:
+            for path, (size, mtime, since) in list(self._files.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._files[path]  # borrado o movido antes de terminar
+                    continue
+                if (st.st_size, st.st_mtime) != (size, mtime):
+                    self._files[path] = (st.st_size, st.st_mtime, now)
+                elif st.st_size > 0 and now - since >= self.settle_sec:
+                    del self._files[path]
+                    done.append(path)
+        return sorted(done)
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, on_path):
+        self.on_path = on_path
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.on_path(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.on_path(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.on_path(event.dest_path)
+
+
+class WatchDaemon:
+    """
+    Un hilo de watchdog + un hilo que revisa estabilidad alimentan una cola;
+    run() la consume en el hilo que lo llama, un archivo a la vez (el modelo
+    es uno solo y ya está cargado).
+    """
+
+    def __init__(
+        self,
+        directories: List[str],
+        settings: Dict,
+        *,
+        settle_sec: float = 5.0,
+        poll_sec: float = 1.0,
+        recursive: bool = True,
+    ):
+        self.directories = directories
+        self.settings = settings
+        self.poll_sec = poll_sec
+        self.recursive = recursive
+        self.settling = SettleTracker(settle_sec)
+
+        self._queue: "queue.Queue[Tuple[str, float]]" = queue.Queue()
+        self._queued = set()  # rutas en cola o en proceso
+        self._queued_lock = threading.Lock()
+        self._by_hash: Dict[str, str] = {}  # contenido ya transcrito -> primera ruta
+        # ruta -> (tamaño, mtime) con que falló; no se reintenta hasta que cambie
+        self._failed_at: Dict[str, Tuple[int, float]] = {}
+        self._stop = threading.Event()
+        self._held = ExitStack()
+        self._observer: Optional[Observer] = None
+        self.processed = 0
+        self.failed = 0
+
+    # ---- entrada ----
+    def _wanted(self, path: str) -> bool:
+        if not is_supported_file(path) or not os.path.isfile(path):
+            return False
+        failed = self._failed_at.get(os.path.abspath(path))
+        if failed is not None and failed == _signature(path):
+            return False
+        out = output_path(path)
+        # Ya transcrito y sin cambios desde entonces
+        try:
+            return not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path)
+        except OSError:
+            return False
+
+    def _seen(self, path: str):
+        if is_supported_file(path):
+            self.settling.touch(os.path.abspath(path))
+
+    def _scan(self):
+        for directory in self.directories:
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if self._wanted(path):
+                        self._seen(path)
+                if not self.recursive:
+                    break
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_sec):
+            # Con el lock tomado: pending() nunca ve un archivo "en tránsito"
+            with self._queued_lock:
+                for path in self.settling.ready():
+                    if path in self._queued or not self._wanted(path):
+                        continue
+                    self._queued.add(path)
+                    self._queue.put((path, time.time()))
+
+    # ---- ciclo de vida ----
+    def start(self):
+        key = self.settings["model_key"]
+        print(f"--- Cargando modelo Whisper {key.upper()} (queda residente) ---", flush=True)
+        self._held.enter_context(whisper_model(key, int8=bool(self.settings.get("int8"))))
+        if two_pass_enabled(self.settings) and self.settings["draft_model"] != key:
+            self._held.enter_context(whisper_model(self.settings["draft_model"], int8=bool(self.settings.get("int8"))))
+
+        self._observer = Observer()
+        handler = _Handler(self._seen)
+        for directory in self.directories:
+            self._observer.schedule(handler, directory, recursive=self.recursive)
+        self._observer.start()
+        self._scan()
+        threading.Thread(target=self._poll, name="watch-settle", daemon=True).start()
+        print(f"--- Vigilando: {', '.join(self.directories)} ---", flush=True)
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        self._held.close()
+
+    def pending(self) -> int:
+        """Archivos esperando estabilidad + en cola o en proceso."""
+        with self._queued_lock:
+            return len(self.settling) + len(self._queued)
+
+    def run(self, idle_exit: bool = False):
+        """
+        Consume la cola hasta stop() (o Ctrl+C). Con idle_exit termina cuando
+        no queda nada pendiente (útil para vaciar una carpeta y salir).
+        """
+        try:
+            while not self._stop.is_set():
+                try:
+                    path, queued_at = self._queue.get(timeout=self.poll_sec)
+                except queue.Empty:
+                    if idle_exit and self.pending() == 0:
+                        break
+                    continue
+                before = _signature(path)
+                try:
+                    self.process(path, queued_at, signature=before)
+                finally:
+                    with self._queued_lock:
+                        self._queued.discard(path)
+                        # Lo que cambió mientras se procesaba vuelve a esperar estabilidad
+                        if _signature(path) != before and self._wanted(path):
+                            self.settling.touch(path)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    # ---- un archivo ----
+    def process(self, path: str, queued_at: Optional[float] = None, signature: Optional[Tuple[int, float]] = None):
+        """
+        signature: (tamaño, mtime) del archivo al empezar. Si falla, esa
+        versión del archivo no se vuelve a encolar (un archivo corrupto no se
+        re-decodifica en cada vuelta); si se reemplaza o modifica, sí.
+        """
+        if signature is None:
+            signature = _signature(path)
+        started = time.time()
+        t0 = time.perf_counter()
+        info: Dict = {
+            "file": path,
+            "queued_at": queued_at,
+            "started_at": started,
+            "wait_sec": round(started - queued_at, 3) if queued_at else 0.0,
+            "model": self.settings["model_key"],
+            "precision": self.settings["precision"],
+        }
+        try:
+            t_hash = time.perf_counter()
+            file_hash = hash_file(path)
+            info["file_hash"] = file_hash
+            info["hash_sec"] = round(time.perf_counter() - t_hash, 3)
+
+            first = self._by_hash.get(file_hash)
+            if first and first != path and os.path.exists(output_path(first)):
+                # Mismo contenido que otro archivo ya transcrito en esta sesión
+                with open(output_path(first), "r", encoding="utf-8") as f:
+                    text = f.read()
+                info.update(duplicate_of=first, cache_hit="duplicate")
+            else:
+                with trace(
+                    f"watch-{file_hash[:12]}",
+                    model=self.settings["model_key"],
+                    precision=self.settings["precision"],
+                    file_hash=file_hash,
+                ):
+                    result = run_transcription(path, self.settings, file_hash=file_hash)
+                text = postprocess_transcript(
+                    result["raw_text"],
+                    clean_text=self.settings["clean_text"],
+                    normalize_elongations=self.settings["normalize_elongations"],
+                    max_consecutive_repeats=self.settings["max_consecutive_repeats"],
+                )
+                stats = result["stats"]
+                info.update(
+                    duration_sec=round(result["duration_sec"], 2),
+                    cache_hit=result["cache_hit"],
+                    timings={k: round(v, 3) for k, v in result["timings"].items()},
+                    segments_count=stats["segments_count"],
+                    fallbacks_total=stats.get("fallbacks_total", 0),
+                    loop_aborts=stats.get("loop_aborts", 0),
+                    two_pass=stats.get("two_pass"),
+                )
+
+            _write_atomic(output_path(path), text)
+            self._by_hash.setdefault(file_hash, path)
+            self._failed_at.pop(os.path.abspath(path), None)
+            self.processed += 1
+            status = "✅"
+        except Exception as e:
+            info["error"] = f"{type(e).__name__}: {e}"
+            if signature is not None:
+                self._failed_at[os.path.abspath(path)] = signature
+            self.failed += 1
+            status = "❌"
+
+        info["wall_sec"] = round(time.perf_counter() - t0, 3)
+        if info.get("duration_sec"):
+            info["rtf"] = round(info["wall_sec"] / info["duration_sec"], 3)
+        info["finished_at"] = time.time()
+        try:
+            _write_atomic(timing_path(path), json.dumps(info, ensure_ascii=False, indent=2) + "\n")
+        except OSError:
+            pass
+
+        detail = info.get("error") or (
+            f"duplicado de {info['duplicate_of']}" if "duplicate_of" in info
+            else f"{info.get('duration_sec', 0) / 60:.1f} min en {info['wall_sec']:.1f}s"
+        )
+        # pending() todavía cuenta este archivo (se libera al volver a run)
+        print(f"{status} {path} · {detail} · pendientes: {max(0, self.pending() - 1)}", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    languages = {code: label for label, code in LANG_OPTIONS.items()}
+
+    parser = argparse.ArgumentParser(description="Transcribe los archivos que aparecen en las carpetas indicadas.")
+    parser.add_argument("directories", nargs="+")
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--precision", default="Equilibrado", choices=PRECISION_LEVELS)
+    parser.add_argument("--profile", default="voz", choices=sorted(AUDIO_PROFILE_ALIASES))
+    parser.add_argument("--language", default="es", choices=sorted(languages))
+    parser.add_argument("--int8", action="store_true", default=None)
+    parser.add_argument("--draft-model", default="", help="borrador rápido con este modelo; solo lo dudoso se revisa")
+    parser.add_argument("--settle", type=float, default=5.0, help="segundos sin cambios antes de procesar")
+    parser.add_argument("--no-recursive", action="store_true")
+    parser.add_argument("--once", action="store_true", help="procesa lo pendiente y termina")
+    args = parser.parse_args(argv)
+
+    missing = [d for d in args.directories if not os.path.isdir(d)]
+    if missing:
+        parser.error(f"no existe: {', '.join(missing)}")
+    set_process_role("watch")
+
+    settings = headless_settings(args.model, args.precision, AUDIO_PROFILE_ALIASES[args.profile], languages[args.language])
+    if args.int8 is not None:
+        settings["int8"] = args.int8
+    settings["draft_model"] = args.draft_model
+
+    daemon = WatchDaemon(
+        args.directories,
+        settings,
+        settle_sec=args.settle,
+        recursive=not args.no_recursive,
+    )
+    daemon.start()
+    daemon.run(idle_exit=args.once)
+    print(f"--- {daemon.processed} procesados, {daemon.failed} con error ---", flush=True)
+    return 1 if daemon.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Subclases de whisper.decoding para la decodificación por lotes, y el
+model.transcribe con LoopGuard que usan los caminos en serie y multiproceso.
+
+Van en un módulo aparte porque heredan de clases de whisper: importarlas
+carga torch. transcriber las importa recién al decodificar, así la app y el
+CLI arrancan sin pagar ese import.
+"""
+import types
+import contextvars
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import whisper
+from whisper.decoding import DecodingTask, LogitFilter
+
+
+class LoopGuard(LogitFilter):
+    """
+    Corta decodificaciones degeneradas: si el texto generado termina en el
+    mismo n-grama de tokens repetido (1..max_ngram tokens, cubriendo al menos
+    min_span tokens y 4 repeticiones), fuerza el fin de texto en esa fila en
+    vez de seguir hasta sample_len. Las filas cortadas quedan en aborted_rows.
+    """
+
+    def __init__(self, tokenizer, sample_begin: int, max_ngram: int = 8, min_span: int = 24):
+        self.eot = tokenizer.eot
+        self.sample_begin = sample_begin
+        self.max_ngram = max_ngram
+        self.min_span = min_span
+        self.aborted_rows = set()
+
+    def _looping(self, seq: List[int]) -> bool:
+        for n in range(1, self.max_ngram + 1):
+            reps = max(4, -(-self.min_span // n))
+            span_len = n * reps
+            if len(seq) < span_len:
+                break
+            tail = seq[-span_len:]
+            if tail == tail[-n:] * reps:
+                return True
+        return False
+
+    def apply(self, logits: torch.Tensor, tokens: torch.Tensor):
+        if tokens.shape[1] - self.sample_begin < self.min_span:
+            return
+        for row, generated in enumerate(tokens[:, self.sample_begin:].tolist()):
+            # Solo tokens de texto: los timestamps crecen aunque el texto se repita
+            seq = [t for t in generated if t < self.eot]
+            if self._looping(seq):
+                logits[row, :] = -np.inf
+                logits[row, self.eot] = 0
+                self.aborted_rows.add(row)
+
+
+class BatchDecodingTask(DecodingTask):
+    """
+    DecodingTask que replica las audio_features por beam/muestra.
+    whisper solo lo hace implícitamente (broadcast) cuando hay un único audio;
+    con varios audios y beam_size/best_of > 1 hay que repetirlas a mano.
+    Agrega LoopGuard al final de los filtros de logits (gana sobre los demás).
+    """
+
+    def __init__(self, model, options: whisper.DecodingOptions):
+        super().__init__(model, options)
+        self.loop_guard = LoopGuard(self.tokenizer, self.sample_begin)
+        self.logit_filters.append(self.loop_guard)
+
+    def aborted_audio(self) -> set:
+        """Índices de audio del lote con al menos una fila cortada por LoopGuard."""
+        return {row // self.n_group for row in self.loop_guard.aborted_rows}
+
+    def _get_audio_features(self, mel: torch.Tensor) -> torch.Tensor:
+        audio_features = super()._get_audio_features(mel)
+        if self.n_group > 1 and audio_features.shape[0] > 1:
+            audio_features = audio_features.repeat_interleave(self.n_group, dim=0)
+        return audio_features
+
+    def _detect_language(self, audio_features: torch.Tensor, tokens: torch.Tensor):
+        # Aquí tokens aún tiene una fila por audio (sin repetir por grupo)
+        if audio_features.shape[0] != tokens.shape[0]:
+            audio_features = audio_features[:: self.n_group]
+        return super()._detect_language(audio_features, tokens)
+
+
+# Ventanas cortadas por LoopGuard dentro del transcribe_guarded en curso
+_LOOP_ABORTS: contextvars.ContextVar = contextvars.ContextVar("videoscribe_loop_aborts", default=None)
+
+
+def _guarded_decode(model, mel: torch.Tensor, options: whisper.DecodingOptions = whisper.DecodingOptions(), **kwargs):
+    # Igual que whisper.decoding.decode, pero con BatchDecodingTask (LoopGuard)
+    if single := mel.ndim == 2:
+        mel = mel.unsqueeze(0)
+    if kwargs:
+        options = replace(options, **kwargs)
+
+    task = BatchDecodingTask(model, options)
+    result = task.run(mel)
+    aborts = _LOOP_ABORTS.get()
+    if aborts is not None:
+        aborts.append(len(task.aborted_audio()))
+    return result[0] if single else result
+
+
+def transcribe_guarded(model, audio, **decode_kwargs) -> Tuple[Dict, int]:
+    """
+    model.transcribe con LoopGuard en cada ventana; devuelve (resultado,
+    ventanas cortadas). whisper.transcribe decodifica con model.decode: se
+    reemplaza una vez en la instancia por _guarded_decode, que da lo mismo
+    salvo en las ventanas que LoopGuard corta.
+    """
+    if "decode" not in vars(model):
+        model.decode = types.MethodType(_guarded_decode, model)
+
+    aborts: List[int] = []
+    token = _LOOP_ABORTS.set(aborts)
+    try:
+        result = model.transcribe(audio, **decode_kwargs)
+    finally:
+        _LOOP_ABORTS.reset(token)
+    return result, sum(aborts)
@@ -0,0 +1,95 @@
+"""
+MultipartStream debe repartir las partes igual sin importar cómo llegan
+cortados los bloques (también en medio de un delimitador o de un CRLF).
+"""
+import random
+
+import pytest
+
+from src.api import MultipartStream, _disposition
+
+BOUNDARY = b"----videoscribe1234"
+
+
+def _body(parts):
+    out = "preámbulo ignorado\r\n".encode("utf-8")
+    for headers, content in parts:
+        out += b"--" + BOUNDARY + b"\r\n" + headers + b"\r\n\r\n" + content + b"\r\n"
+    return out + b"--" + BOUNDARY + b"--\r\n" + "epílogo".encode("utf-8")
+
+
+def _parse(body: bytes, cuts):
+    received = []
+
+    def on_part(headers):
+        received.append([_disposition(headers), b""])
+
+        def sink(data):
+            received[-1][1] += data
+        return sink
+
+    stream = MultipartStream(BOUNDARY, on_part)
+    bounds = [0] + sorted(cuts) + [len(body)]
+    for a, b in zip(bounds, bounds[1:]):
+        stream.feed(body[a:b])
+    return stream, [(d["name"], d["filename"], content) for d, content in received]
+
+
+def _parts(rng: random.Random):
+    # Contenido binario que incluye CRLF y pedazos del delimitador
+    tricky = b"\r\n--" + BOUNDARY[:-3] + b"\r\n\r\n--"
+    audio = bytes(rng.randrange(256) for _ in range(3000)) + tricky + bytes(rng.randrange(256) for _ in range(500))
+    return [
+        (b'Content-Disposition: form-data; name="precision"', b"R\xc3\xa1pido"),
+        (b'Content-Disposition: form-data; name="file"; filename="clase.mp3"\r\nContent-Type: audio/mpeg', audio),
+        (b'Content-Disposition: form-data; name="vacio"', b""),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_cortes_arbitrarios(seed):
+    rng = random.Random(seed)
+    parts = _parts(rng)
+    body = _body(parts)
+    cuts = rng.sample(range(1, len(body)), rng.randint(1, 40))
+
+    stream, received = _parse(body, cuts)
+
+    assert stream.done
+    assert received == [
+        ("precision", None, "Rápido".encode("utf-8")),
+        ("file", "clase.mp3", parts[1][1]),
+        ("vacio", None, b""),
+    ]
+
+
+def test_byte_a_byte():
+    parts = _parts(random.Random(0))
+    body = _body(parts)
+
+    stream, received = _parse(body, range(1, len(body)))
+
+    assert stream.done
+    assert [content for _n, _f, content in received] == [p[1] for p in parts]
+
+
+def test_parte_descartada():
+    body = _body(_parts(random.Random(0)))
+    stream = MultipartStream(BOUNDARY, lambda headers: None)
+    stream.feed(body)
+
+    assert stream.done
+
+
+def test_sin_cierre_no_termina():
+    body = _body(_parts(random.Random(0)))
+    stream, _received = _parse(body[: body.rindex(b"--" + BOUNDARY + b"--")], [])
+
+    assert not stream.done
+
+
+def test_cabeceras_demasiado_largas():
+    stream = MultipartStream(BOUNDARY, lambda headers: None)
+
+    with pytest.raises(ValueError):
+        stream.feed(b"--" + BOUNDARY + b"\r\nX-Relleno: " + b"a" * 20000)
@@ -0,0 +1,65 @@
+"""
+cache_keys: cada etapa encadena la anterior. Un cambio invalida su etapa y
+las siguientes, nunca las anteriores.
+"""
+import pytest
+
+from src.cache import cache_keys
+from src.config import AUDIO_PROFILES, headless_settings
+from src.transcriber import build_decode_kwargs
+
+
+def _keys(file_hash="abc", **changes):
+    settings = dict(headless_settings("small", "Equilibrado", AUDIO_PROFILES[0]), **changes)
+    return cache_keys(file_hash, settings, build_decode_kwargs(settings))
+
+
+def test_mismas_entradas_mismas_claves():
+    assert _keys() == _keys()
+
+
+def test_otro_archivo_cambia_todo():
+    base, other = _keys(), _keys(file_hash="def")
+
+    assert all(base[stage] != other[stage] for stage in ("pcm", "audio", "transcript"))
+
+
+def test_normalizacion_invalida_desde_pcm():
+    base, other = _keys(), _keys(normalize_audio=False)
+
+    assert base["pcm"] != other["pcm"]
+    assert base["audio"] != other["audio"]
+    assert base["transcript"] != other["transcript"]
+
+
+def test_separacion_de_voz_invalida_desde_audio():
+    base = _keys(audio_profile=AUDIO_PROFILES[1])
+    other = _keys(audio_profile=AUDIO_PROFILES[1], use_vocals=True)
+
+    assert base["pcm"] == other["pcm"]
+    assert base["audio"] != other["audio"]
+    assert base["transcript"] != other["transcript"]
+
+
+def test_separacion_de_voz_solo_cuenta_en_musica():
+    assert _keys() == _keys(use_vocals=True)
+
+
+@pytest.mark.parametrize("changes", [
+    {"model_key": "medium"},
+    {"int8": True},
+    {"precision": "Rápido"},
+    {"min_silence": 0.8},
+    {"pack_segments": False},
+    {"draft_model": "tiny"},
+])
+def test_transcripcion_invalida_solo_la_ultima_etapa(changes):
+    base, other = _keys(), _keys(**changes)
+
+    assert base["pcm"] == other["pcm"]
+    assert base["audio"] == other["audio"]
+    assert base["transcript"] != other["transcript"]
+
+
+def test_ajustes_de_texto_no_cambian_claves():
+    assert _keys() == _keys(clean_text=False, max_consecutive_repeats=1, batch_decode=False)
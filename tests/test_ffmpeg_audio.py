@@ -0,0 +1,58 @@
+"""
+decode_with_silences debe entregar el mismo PCM que decode_to_pcm16k: el
+audio y la clave de caché de PCM no dependen de por cuál camino se decodificó.
+"""
+import shutil
+import subprocess
+
+import pytest
+
+from src.ffmpeg_audio import MediaSource, decode_to_pcm16k, decode_with_silences
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requiere ffmpeg")
+
+
+def _sample(path, sample_rate: int, channels: int):
+    """Tono + ruido y 2 s de silencio al final, con la frecuencia y canales dados."""
+    layout = "mono" if channels == 1 else "stereo"
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=4,volume=0.5",
+            "-f", "lavfi", "-i", "anoisesrc=d=4:a=0.05",
+            "-filter_complex", f"[0][1]amix=inputs=2,apad=pad_dur=2,aformat=channel_layouts={layout}",
+            "-ar", str(sample_rate), str(path),
+        ],
+        check=True,
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+@pytest.mark.parametrize("name,sample_rate,channels", [
+    ("a.wav", 16000, 1),
+    ("b.wav", 8000, 1),
+    ("c.mp3", 44100, 2),
+    ("d.ogg", 22050, 2),
+    ("e.m4a", 48000, 2),
+])
+def test_pcm_identico_con_y_sin_silencedetect(tmp_path, name, sample_rate, channels, normalize):
+    path = _sample(tmp_path / name, sample_rate, channels)
+
+    plain = decode_to_pcm16k(path, normalize)
+    fused, silences = decode_with_silences(path, normalize, silence_db=-35, min_silence=0.5)
+
+    assert plain.tobytes() == fused.tobytes()
+    # Los 2 s finales (AAC agrega algo de relleno al final)
+    assert silences and silences[-1][0] == pytest.approx(4.0, abs=0.15)
+
+
+def test_pcm_identico_desde_memoria(tmp_path):
+    path = _sample(tmp_path / "f.mp3", 44100, 2)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    plain = decode_to_pcm16k(MediaSource(data, "f.mp3"), True)
+    fused, _ = decode_with_silences(MediaSource(data, "f.mp3"), True, silence_db=-35, min_silence=0.5)
+
+    assert plain.tobytes() == fused.tobytes()
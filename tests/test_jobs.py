@@ -0,0 +1,152 @@
+"""
+JobManager: cancelar en cola o en curso, compactar los eventos de un trabajo
+terminado y sacar de memoria (y del disco) los trabajos viejos.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.jobs import FINAL_STATES, JOB_CANCELLED, JOB_DONE, JOB_ERROR, JobManager
+
+
+def _wait(manager: JobManager, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["state"] in FINAL_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"el trabajo {job_id} no terminó")
+
+
+def _segments(ctx, n: int):
+    for i in range(n):
+        ctx.progress("transcribe", i / n, f"segmento {i}")
+        ctx.partial({"index": i, "text": str(i)})
+    return {"n": n}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return JobManager(1, str(tmp_path / "jobs"), keep_finished=100, memory_ttl_sec=3600, disk_ttl_sec=0)
+
+
+def test_trabajo_termina_con_resultado(manager):
+    job = _wait(manager, manager.submit(_segments, 3, label="a.mp3", meta={"k": 1}))
+
+    assert job["state"] == JOB_DONE
+    assert job["result"] == {"n": 3}
+    assert [p["index"] for p in job["partial"]] == [0, 1, 2]
+    assert job["label"] == "a.mp3" and job["meta"] == {"k": 1}
+
+
+def test_error_guarda_el_mensaje(manager):
+    def boom(ctx):
+        raise ValueError("roto")
+
+    job = _wait(manager, manager.submit(boom))
+
+    assert job["state"] == JOB_ERROR
+    assert job["error"] == "ValueError: roto"
+
+
+def test_cancelar_en_cola_no_llega_a_correr(manager):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+    first = manager.submit(lambda ctx: started.set() or release.wait(5))
+    assert started.wait(5)
+    second = manager.submit(lambda ctx: ran.append(1))
+
+    assert manager.queue_position(second) == 1
+    assert manager.cancel(second)
+    assert manager.get(second)["state"] == JOB_CANCELLED
+    release.set()
+    _wait(manager, first)
+
+    assert ran == []
+    assert not manager.cancel(second)
+
+
+def test_cancelar_en_curso_conserva_parciales(manager):
+    started = threading.Event()
+
+    def forever(ctx):
+        i = 0
+        while True:
+            ctx.partial({"index": i, "text": str(i)})
+            started.set()
+            i += 1
+            time.sleep(0.005)
+
+    job_id = manager.submit(forever)
+    assert started.wait(5)
+    assert manager.cancel(job_id)
+    job = _wait(manager, job_id)
+
+    assert job["state"] == JOB_CANCELLED
+    assert len(job["partial"]) >= 1
+
+
+def test_eventos_compactados_al_terminar(manager):
+    job_id = manager.submit(_segments, 5)
+    _wait(manager, job_id)
+
+    events = manager.events(job_id)
+    seqs = [e["seq"] for e in events]
+
+    # Solo segmentos y cambios de estado; los seq siguen siendo los originales
+    assert all("partial" in e or "state" in e for e in events)
+    assert [e["partial"]["index"] for e in events if "partial" in e] == list(range(5))
+    assert [e["state"] for e in events if "state" in e] == ["running", JOB_DONE]
+    assert seqs == sorted(seqs) and seqs[-1] > len(events)
+    assert manager.events(job_id, since=seqs[-1]) == [events[-1]]
+
+
+def test_sin_listeners_no_queda_la_entrada(manager):
+    job_id = manager.submit(_segments, 1)
+    seen = []
+    manager.add_listener(job_id, seen.append)
+    manager.remove_listener(job_id, seen.append)
+
+    assert job_id not in manager._listeners
+
+
+def test_terminados_salen_de_memoria_pero_se_leen_del_disco(tmp_path):
+    manager = JobManager(1, str(tmp_path / "jobs"), keep_finished=2, memory_ttl_sec=3600, disk_ttl_sec=0)
+    ids = []
+    for n in range(4):
+        ids.append(manager.submit(_segments, n + 1))
+        _wait(manager, ids[-1])
+    # La poda corre al enviar: el último envío deja los dos anteriores más recientes
+    _wait(manager, manager.submit(_segments, 1))
+
+    assert ids[0] not in manager._jobs and ids[1] not in manager._jobs
+    assert manager.events(ids[0]) == []
+    old = manager.get(ids[0])
+    assert old["state"] == JOB_DONE and old["result"] == {"n": 1}
+
+
+def test_ttl_de_memoria(tmp_path):
+    manager = JobManager(1, str(tmp_path / "jobs"), keep_finished=100, memory_ttl_sec=0, disk_ttl_sec=0)
+    first = manager.submit(_segments, 1)
+    _wait(manager, first)
+    _wait(manager, manager.submit(_segments, 1))
+
+    assert first not in manager._jobs
+    assert manager.get(first)["state"] == JOB_DONE
+
+
+def test_barrido_de_archivos_vencidos(tmp_path):
+    manager = JobManager(1, str(tmp_path / "jobs"), keep_finished=0, memory_ttl_sec=0, disk_ttl_sec=60)
+    old = manager.submit(_segments, 1)
+    _wait(manager, old)
+    path = os.path.join(manager.jobs_dir, f"{old}.json")
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    manager._next_sweep = 0.0
+    _wait(manager, manager.submit(_segments, 1))
+
+    assert not os.path.exists(path)
+    assert manager.get(old) is None
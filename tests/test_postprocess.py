@@ -0,0 +1,78 @@
+"""
+StreamingPostprocessor debe dar exactamente lo mismo que postprocess_transcript
+sobre el texto completo, sin importar dónde se corten las partes.
+"""
+import itertools
+import random
+
+import pytest
+
+from src.postprocess import StreamingPostprocessor, postprocess_segments, postprocess_transcript
+
+_LINES = [
+    "entonces la clase de hoy",
+    "vamos a ver el tema",
+    "su-u-u-u corazón",
+    "sooooooo lejos",
+    "¡¡¡¡¡¡¡¡hola!!!!!!!!",
+    "...",
+    "---",
+    "   ",
+    "",
+    "gracias  por   venir",
+    "no no no no",
+]
+
+
+def _segments(rng: random.Random, n: int):
+    """Segmentos con loops (la misma línea muchas veces seguidas) y líneas vacías."""
+    out = []
+    while len(out) < n:
+        line = rng.choice(_LINES)
+        reps = rng.choice([1, 1, 2, 5, 9])
+        out += [line] * reps
+    return out[:n]
+
+
+def _split_at_random(text: str, rng: random.Random):
+    """Cortes en posiciones arbitrarias (también en medio de una línea o de un \\r\\n)."""
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 12)))) if len(text) > 1 else []
+    bounds = [0] + cuts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+_OPTIONS = [
+    dict(clean_text=clean, normalize_elongations=elong, max_consecutive_repeats=reps)
+    for clean, elong, reps in itertools.product([True, False], [True, False], [1, 3])
+]
+
+
+@pytest.mark.parametrize("options", _OPTIONS)
+@pytest.mark.parametrize("seed", range(20))
+def test_feed_igual_a_texto_completo(seed, options):
+    rng = random.Random(seed)
+    newline = "\r\n" if seed % 4 == 0 else "\n"
+    text = newline.join(_segments(rng, 40))
+
+    pp = StreamingPostprocessor(**options)
+    streamed = "".join(pp.feed(part) for part in _split_at_random(text, rng)) + pp.close()
+
+    assert streamed == postprocess_transcript(text, **options)
+
+
+@pytest.mark.parametrize("options", _OPTIONS)
+@pytest.mark.parametrize("seed", range(20))
+def test_postprocess_segments_igual_a_texto_completo(seed, options):
+    segments = _segments(random.Random(seed), 40)
+
+    streamed = "".join(postprocess_segments(segments, **options))
+
+    assert streamed == postprocess_transcript("\n".join(segments), **options)
+
+
+def test_limite_de_repeticiones_entre_partes():
+    # El loop cruza varias partes: el contador no se reinicia en cada feed
+    pp = StreamingPostprocessor(max_consecutive_repeats=2)
+    out = pp.feed("hola\nhola\n") + pp.feed("hola\nho") + pp.feed("la\nchau") + pp.close()
+
+    assert out == "hola\nhola\nchau"
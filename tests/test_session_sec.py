@@ -0,0 +1,99 @@
+"""
+UsageStore: incrementos con ventana diaria, devolución de usos y migración
+única desde el limit_tracker.json anterior.
+"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from src.session_sec import UsageStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"), legacy_json="", window_sec=100)
+    yield store
+    store.close()
+
+
+def test_incrementa_por_cliente(store):
+    assert [store.increment("a", now=0) for _ in range(3)] == [1, 2, 3]
+    assert store.increment("b", now=0) == 1
+    assert store.runs("a", now=50) == 3
+    assert store.runs("nadie", now=50) == 0
+
+
+def test_ventana_vencida_reinicia(store):
+    store.increment("a", now=0)
+    store.increment("a", now=10)
+
+    assert store.runs("a", now=101) == 0
+    assert store.increment("a", now=101) == 1
+    assert store.runs("a", now=150) == 1
+
+
+def test_devolver_uso(store):
+    store.increment("a", now=0)
+    store.increment("a", now=0)
+
+    assert store.refund("a", now=1) == 1
+    assert store.refund("a", now=1) == 0
+    assert store.refund("a", now=1) == 0
+    assert store.refund("nadie", now=1) == 0
+    assert store.runs("a", now=1) == 0
+
+
+def test_incrementos_concurrentes_entre_conexiones(tmp_path):
+    path = str(tmp_path / "usage.db")
+    stores = [UsageStore(path, legacy_json="") for _ in range(4)]
+
+    def hammer(store):
+        for _ in range(25):
+            store.increment("a")
+
+    threads = [threading.Thread(target=hammer, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Cada conexión ve lo que escribieron las otras (caché invalidada por data_version)
+    assert all(s.runs("a") == 100 for s in stores)
+    for s in stores:
+        s.close()
+
+
+def test_migra_el_json_una_sola_vez(tmp_path):
+    now = time.time()
+    legacy = tmp_path / "limit_tracker.json"
+    legacy.write_text(json.dumps({
+        "vigente": {"runs": 2, "reset_at": now + 3600},
+        "vencido": {"runs": 3, "reset_at": now - 10},
+        "roto": "no es un dict",
+    }), encoding="utf-8")
+    path = str(tmp_path / "usage.db")
+
+    first = UsageStore(path, legacy_json=str(legacy))
+    assert first.runs("vigente") == 2
+    assert first.runs("vencido") == 0
+    first.increment("vigente")
+    first.close()
+
+    # El archivo no se toca; la marca en meta evita importarlo de nuevo
+    assert os.path.exists(legacy)
+    second = UsageStore(path, legacy_json=str(legacy))
+    assert second.runs("vigente") == 3
+    second.close()
+
+
+def test_json_corrupto_no_rompe(tmp_path):
+    legacy = tmp_path / "limit_tracker.json"
+    legacy.write_text("{no es json", encoding="utf-8")
+
+    store = UsageStore(str(tmp_path / "usage.db"), legacy_json=str(legacy))
+
+    assert store.increment("a") == 1
+    store.close()
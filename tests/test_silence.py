@@ -0,0 +1,71 @@
+"""
+pack_segments solo une segmentos consecutivos sin pasarse de la ventana, y
+detect_silences_energy encuentra los silencios de un audio sintético.
+"""
+import numpy as np
+import pytest
+
+from src.silence import detect_silences_energy, pack_segments
+
+SR = 16000
+
+
+def test_pack_une_consecutivos_hasta_la_ventana():
+    segments = [(0.0, 5.0), (6.0, 12.0), (13.0, 29.0), (30.0, 35.0), (36.0, 40.0)]
+
+    assert pack_segments(segments, max_window=29.5) == [(0.0, 29.0), (30.0, 40.0)]
+
+
+def test_pack_deja_tal_cual_un_segmento_largo():
+    segments = [(0.0, 2.0), (3.0, 45.0), (46.0, 48.0)]
+
+    assert pack_segments(segments, max_window=29.5) == [(0.0, 2.0), (3.0, 45.0), (46.0, 48.0)]
+
+
+@pytest.mark.parametrize("max_window", [5.0, 10.0, 29.5])
+def test_pack_cubre_los_mismos_segmentos(max_window):
+    rng = np.random.default_rng(0)
+    bounds = np.cumsum(rng.uniform(0.3, 8.0, size=80))
+    segments = [(float(a), float(b)) for a, b in zip(bounds[0::2], bounds[1::2])]
+
+    packed = pack_segments(segments, max_window=max_window)
+
+    # Cada ventana empieza y termina en bordes de segmentos y no se solapan
+    starts, ends = {s for s, _ in segments}, {e for _, e in segments}
+    assert all(s in starts and e in ends for s, e in packed)
+    assert all(a[1] < b[0] for a, b in zip(packed, packed[1:]))
+    assert packed[0][0] == segments[0][0] and packed[-1][1] == segments[-1][1]
+    # Solo supera la ventana lo que ya la superaba solo
+    assert all(e - s <= max_window or (s, e) in segments for s, e in packed)
+
+
+def _tone(sec: float, amplitude: float = 0.3) -> np.ndarray:
+    t = np.arange(int(sec * SR)) / SR
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _noise(sec: float, amplitude: float = 0.001) -> np.ndarray:
+    return (amplitude * np.random.default_rng(1).standard_normal(int(sec * SR))).astype(np.float32)
+
+
+def test_energia_encuentra_los_silencios():
+    audio = np.concatenate([_tone(2.0), _noise(1.0), _tone(3.0), _noise(0.2), _tone(1.0), _noise(1.5)])
+
+    silences, threshold_db = detect_silences_energy(audio, min_silence=0.45)
+
+    # La pausa de 0.2 s queda por debajo de min_silence
+    assert len(silences) == 2
+    for (s0, s1), (start, end) in zip(silences, [(2.0, 3.0), (7.2, 8.7)]):
+        assert s0 == pytest.approx(start, abs=0.04)
+        assert s1 == pytest.approx(end, abs=0.04)
+    assert -60.0 <= threshold_db <= -15.0
+
+
+def test_energia_sin_contraste_no_devuelve_silencios():
+    silences, _threshold_db = detect_silences_energy(_tone(5.0), min_silence=0.45)
+
+    assert silences == []
+
+
+def test_energia_audio_vacio():
+    assert detect_silences_energy(np.zeros(10, dtype=np.float32), min_silence=0.45) == ([], -40.0)
@@ -0,0 +1,50 @@
+"""
+iter_chunks_batched debe dar el mismo texto que decodificar cada chunk por
+separado (camino en serie), con greedy y con beam search.
+"""
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("whisper")
+
+from benchmarks.common import standin_model
+from benchmarks.fixtures import speech_like
+from src.transcriber import build_decode_kwargs, iter_chunks_batched
+from src.whisper_decoding import transcribe_guarded
+
+
+@pytest.fixture(scope="module")
+def model():
+    # Pesos más grandes que los de inicialización: así el modelo produce texto
+    model = standin_model()
+    g = torch.Generator().manual_seed(7)
+    with torch.no_grad():
+        for p in model.parameters():
+            p.copy_(torch.randn(p.shape, generator=g) * 0.05)
+    return model
+
+
+def _chunks():
+    # Largos distintos (varias ventanas por ronda) y uno de silencio
+    return [
+        speech_like(4, seed=1),
+        speech_like(11, seed=2),
+        np.zeros(16000 * 3, dtype=np.float32),
+        speech_like(20, seed=3),
+        speech_like(29.5, seed=4),
+    ]
+
+
+@pytest.mark.parametrize("precision", ["Rápido", "Equilibrado"])
+def test_lotes_igual_a_serie(model, precision):
+    kwargs = build_decode_kwargs({"precision": precision, "audio_profile": "Voz clara", "language_code": "es"})
+    chunks = _chunks()
+
+    # Lote menor que la cantidad de chunks: se rellena a medida que terminan
+    batched = {i: txt for i, txt, _info in iter_chunks_batched(model, chunks, kwargs, batch_size=3)}
+    serial = {i: (transcribe_guarded(model, chunk, **kwargs)[0].get("text") or "").strip() for i, chunk in enumerate(chunks)}
+
+    assert sorted(batched) == list(range(len(chunks)))
+    assert batched == serial
+    assert any(serial.values())
@@ -0,0 +1,98 @@
+"""
+SettleTracker: un archivo está listo recién cuando lleva settle_sec sin
+cambiar de tamaño ni de mtime (y no está vacío).
+"""
+import os
+
+import pytest
+
+from src import watch_folder
+from src.watch_folder import SettleTracker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(watch_folder.time, "monotonic", clock)
+    return clock
+
+
+def test_listo_despues_de_asentarse(tmp_path, clock):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"x" * 10)
+    tracker = SettleTracker(settle_sec=2.0)
+    tracker.touch(str(path))
+
+    assert tracker.ready() == []  # primera mirada: se anota tamaño y mtime
+    clock.now += 1.0
+    assert tracker.ready() == []
+    clock.now += 1.0
+    assert tracker.ready() == [str(path)]
+    assert len(tracker) == 0
+
+
+def test_archivo_que_crece_reinicia_la_espera(tmp_path, clock):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"x" * 10)
+    tracker = SettleTracker(settle_sec=2.0)
+    tracker.touch(str(path))
+    tracker.ready()
+
+    clock.now += 1.5
+    with open(path, "ab") as f:
+        f.write(b"y" * 10)
+    assert tracker.ready() == []
+
+    clock.now += 1.5
+    assert tracker.ready() == []
+    clock.now += 0.5
+    assert tracker.ready() == [str(path)]
+
+
+def test_archivo_vacio_no_esta_listo(tmp_path, clock):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"")
+    tracker = SettleTracker(settle_sec=1.0)
+    tracker.touch(str(path))
+    tracker.ready()
+
+    clock.now += 10.0
+    assert tracker.ready() == []
+    assert len(tracker) == 1
+
+
+def test_archivo_borrado_se_olvida(tmp_path, clock):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"x")
+    tracker = SettleTracker(settle_sec=1.0)
+    tracker.touch(str(path))
+    tracker.ready()
+
+    os.remove(path)
+    clock.now += 5.0
+    assert tracker.ready() == []
+    assert len(tracker) == 0
+
+
+def test_touch_de_nuevo_reinicia(tmp_path, clock):
+    paths = [tmp_path / "b.wav", tmp_path / "a.wav"]
+    tracker = SettleTracker(settle_sec=1.0)
+    for path in paths:
+        path.write_bytes(b"x")
+        tracker.touch(str(path))
+    tracker.ready()
+    clock.now += 1.0
+
+    tracker.touch(str(paths[0]))  # otro evento del watcher
+    assert tracker.ready() == [str(paths[1])]
+    tracker.ready()
+    clock.now += 1.0
+    assert tracker.ready() == [str(paths[0])]
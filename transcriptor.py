@@ -1,60 +1,242 @@
+"""
+Transcriptor por lotes, sin Streamlit.
+
+    python transcriptor.py grabaciones/ "clases/**/*.mp4" entrevista.mp3
+    python transcriptor.py --model small --precision Rápido --prefetch 3 carpeta/
+
+- Acepta archivos, carpetas (recorridas completas) y globs.
+- Carga el modelo una sola vez para todo el lote.
+- Mientras se transcribe un archivo, ffmpeg ya va extrayendo el audio de
+  los siguientes (--prefetch), en hilos aparte.
+- Usa la misma segmentación por silencios y el mismo post-proceso que la app.
+- Escribe <nombre>.txt junto a cada entrada. Las que ya tienen su .txt se
+  saltan, así un lote interrumpido se puede retomar (--overwrite para rehacer).
+
+Sin argumentos, pide la ruta de un archivo como antes.
+"""
 import os
-import whisper
-from src.ffmpeg_audio import is_audio_file, is_supported_file, AUDIO_EXTENSIONS, VIDEO_EXTENSIONS
+import sys
+import glob
+import time
+import argparse
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from src.config import AUDIO_PROFILE_ALIASES, LANG_OPTIONS, PRECISION_LEVELS, headless_settings, two_pass_enabled
+from src.ffmpeg_audio import (
+    is_supported_file,
+    decode_to_pcm16k,
+    decode_with_silences,
+    AUDIO_EXTENSIONS,
+    VIDEO_EXTENSIONS,
+    SAMPLE_RATE,
+)
+from src.postprocess import postprocess_transcript
+from src.tracing import set_process_role
+from src.transcriber import whisper_model, transcribe_with_silence_segments
 
-def extraer_y_transcribir(ruta_archivo):
-    ruta_archivo = ruta_archivo.replace('"', '').replace("'", "").strip()
-    es_audio = is_audio_file(ruta_archivo)
-    nombre_audio = "temp_audio.mp3"
+LANGUAGE_LABELS = {code: label for label, code in LANG_OPTIONS.items()}
 
-    try:
-        if es_audio:
-            print("\n--- 1. Archivo de audio detectado, procesando directamente ---")
-            nombre_audio = ruta_archivo
+
+def collect_inputs(paths: List[str]) -> List[str]:
+    """Expande carpetas y globs a archivos soportados (sin duplicados, en orden)."""
+    found: List[str] = []
+    for raw in paths:
+        path = raw.strip().strip('"').strip("'")
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found += [os.path.join(root, f) for f in sorted(files)]
+        elif glob.has_magic(path):
+            found += sorted(glob.glob(path, recursive=True))
         else:
-            print("\n--- 1. Extrayendo audio del video ---")
-            from moviepy import VideoFileClip
-            with VideoFileClip(ruta_archivo) as video:
-                video.audio.write_audiofile(nombre_audio, logger=None)
-
-        # --- Seleccionamos un modelo más potente ---
-        # 'base' < 'small' < 'medium' < 'large'
-        # 'medium' es excelente para español latino.
-        print("\n--- 2. Cargando modelo Whisper MEDIUM (Más preciso) ---")
-        model = whisper.load_model("medium")
-
-        print("--- 3. Transcribiendo en Español Latino... ---")
-        resultado = model.transcribe(
-            nombre_audio,
-            language="es",   # Forzar español
-            fp16=False       # Evita el error/aviso de CPU
-        )
+            found.append(path)
+
+    seen = set()
+    inputs = []
+    for path in found:
+        key = os.path.abspath(path)
+        if key in seen or not os.path.isfile(path) or not is_supported_file(path):
+            continue
+        seen.add(key)
+        inputs.append(path)
+    return inputs
+
 
-        nombre_txt = os.path.splitext(ruta_archivo)[0] + ".txt"
-        with open(nombre_txt, "w", encoding="utf-8") as f:
-            f.write(resultado["text"])
+def output_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".txt"
 
-        print(f"\n✅ ¡Listo! Transcripción mejorada en: {nombre_txt}")
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
+def _extract(path: str, settings: Dict) -> Tuple:
+    t0 = time.perf_counter()
+    if settings.get("auto_silence", True):
+        audio, silences = decode_to_pcm16k(path, normalize=settings["normalize_audio"]), None
+    else:
+        audio, silences = decode_with_silences(
+            path,
+            normalize=settings["normalize_audio"],
+            silence_db=settings["silence_db"],
+            min_silence=settings["min_silence"],
+        )
+    return audio, silences, time.perf_counter() - t0
+
+
+def iter_extracted(paths: List[str], settings: Dict, prefetch: int) -> Iterator[Tuple[str, Optional[Tuple], Optional[Exception]]]:
+    """
+    Productor/consumidor: produce (ruta, (audio, silencios, seg_extracción), error)
+    en orden, con hasta `prefetch` extracciones de ffmpeg corriendo o
+    terminadas por delante del archivo que se está transcribiendo
+    (la memoria queda acotada a prefetch buffers PCM).
+    """
+    prefetch = max(1, prefetch)
+    pool = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="ffmpeg")
+    pending = deque()
+    todo = iter(paths)
+    try:
+        for path in todo:
+            pending.append((path, pool.submit(_extract, path, settings)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            path, fut = pending.popleft()
+            # El lugar que deja este archivo lo toma el siguiente de la lista
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(_extract, nxt, settings)))
+            try:
+                yield path, fut.result(), None
+            except Exception as e:
+                yield path, None, e
     finally:
-        # Solo borrar el temp si fue extraído de un video
-        if not es_audio and os.path.exists(nombre_audio):
-            os.remove(nombre_audio)
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
-if __name__ == "__main__":
+def run_batch(paths: List[str], settings: Dict, *, prefetch: int = 2, overwrite: bool = False, raw: bool = False) -> int:
+    """Transcribe el lote; retorna la cantidad de archivos con error."""
+    todo = [p for p in paths if overwrite or not os.path.exists(output_path(p))]
+    skipped = len(paths) - len(todo)
+    if skipped:
+        print(f"— {skipped} archivo(s) ya tienen .txt, se saltan (--overwrite para rehacerlos)")
+    if not todo:
+        return 0
+
+    print(f"--- Cargando modelo Whisper {settings['model_key'].upper()} ---")
+    failed = 0
+    audio_total = 0.0
+    t_batch = time.perf_counter()
+    with ExitStack() as held:
+        int8 = bool(settings.get("int8"))
+        model = held.enter_context(whisper_model(settings["model_key"], int8=int8))
+        draft = None
+        if two_pass_enabled(settings):
+            draft_key = settings["draft_model"]
+            print(f"--- Borrador con {draft_key.upper()} ({settings['draft_precision']}) ---")
+            draft = model if draft_key == settings["model_key"] else held.enter_context(whisper_model(draft_key, int8=int8))
+
+        for n, (path, extracted, error) in enumerate(iter_extracted(todo, settings, prefetch), start=1):
+            label = f"[{n}/{len(todo)}] {path}"
+            if error is not None:
+                failed += 1
+                print(f"❌ {label}: {error}")
+                continue
+
+            audio, silences, extract_sec = extracted
+            duration_sec = len(audio) / SAMPLE_RATE
+            try:
+                t0 = time.perf_counter()
+                text, stats = transcribe_with_silence_segments(
+                    model, audio, duration_sec, settings, silences=silences, draft=draft
+                )
+                wall = time.perf_counter() - t0
+                if not raw:
+                    text = postprocess_transcript(
+                        text,
+                        clean_text=settings["clean_text"],
+                        normalize_elongations=settings["normalize_elongations"],
+                        max_consecutive_repeats=settings["max_consecutive_repeats"],
+                    )
+                dest = output_path(path)
+                with open(dest, "w", encoding="utf-8") as f:
+                    f.write(text)
+            except Exception as e:
+                failed += 1
+                print(f"❌ {label}: {e}")
+                continue
+
+            audio_total += duration_sec
+            two_pass = stats.get("two_pass")
+            revised = f" ({two_pass['segments_escalated']} revisados)" if two_pass else ""
+            print(
+                f"✅ {label} · {duration_sec / 60:.1f} min · {stats['segments_count']} segmentos{revised} · "
+                f"extracción {extract_sec:.1f}s · transcripción {wall:.1f}s "
+                f"(RTF {wall / max(duration_sec, 0.01):.2f}) → {dest}"
+            )
+
+    wall_total = time.perf_counter() - t_batch
+    print(
+        f"\n--- {len(todo) - failed} listos, {failed} con error, {skipped} saltados · "
+        f"{audio_total / 60:.1f} min de audio en {wall_total / 60:.1f} min ---"
+    )
+    return failed
+
+
+def build_parser() -> argparse.ArgumentParser:
     ext_list = ", ".join(sorted(e.upper().replace(".", "") for e in AUDIO_EXTENSIONS | VIDEO_EXTENSIONS))
-    print("--- TRANSCRIPTOR PRO (ESPAÑOL) ---")
-    print(f"    Formatos soportados: {ext_list}")
-    archivo = input("Arrastra el archivo aquí: ")
-
-    archivo = archivo.strip().replace('"', '').replace("'", "")
-    if not is_supported_file(archivo):
-        ext = os.path.splitext(archivo)[1]
-        print(f"❌ Formato no soportado: {ext}")
-        print(f"   Formatos válidos: {ext_list}")
-    else:
-        extraer_y_transcribir(archivo)
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description=f"Transcribe archivos de audio/video por lotes. Formatos: {ext_list}",
+    )
+    parser.add_argument("paths", nargs="*", help="archivos, carpetas o globs (entre comillas)")
+    parser.add_argument("--model", default="medium", help="modelo Whisper (small, medium, large…)")
+    parser.add_argument("--precision", default="Equilibrado", choices=PRECISION_LEVELS)
+    parser.add_argument("--profile", default="voz", choices=sorted(AUDIO_PROFILE_ALIASES), help="perfil de audio")
+    parser.add_argument("--language", default="es", choices=sorted(LANGUAGE_LABELS))
+    parser.add_argument("--prefetch", type=int, default=2, help="archivos que ffmpeg extrae por adelantado")
+    parser.add_argument("--int8", action="store_true", default=None, help="modelo cuantizado int8 (CPU)")
+    parser.add_argument("--draft-model", default="", help="borrador rápido con este modelo; solo lo dudoso se revisa con --model")
+    parser.add_argument("--draft-precision", default="Rápido", choices=PRECISION_LEVELS)
+    parser.add_argument("--fixed-silence", action="store_true", help="silencedetect con umbral fijo en vez del VAD automático")
+    parser.add_argument("--no-normalize", action="store_true", help="sin loudnorm")
+    parser.add_argument("--raw", action="store_true", help="texto sin post-proceso")
+    parser.add_argument("--overwrite", action="store_true", help="rehace los .txt existentes")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    set_process_role("cli")
+
+    paths = args.paths
+    if not paths:
+        print("--- TRANSCRIPTOR PRO (ESPAÑOL) ---")
+        print(f"    {parser.description}")
+        paths = [input("Arrastra el archivo aquí: ")]
+
+    inputs = collect_inputs(paths)
+    if not inputs:
+        print("❌ No se encontraron archivos soportados.")
+        return 2
+
+    settings = headless_settings(
+        args.model,
+        args.precision,
+        AUDIO_PROFILE_ALIASES[args.profile],
+        LANGUAGE_LABELS[args.language],
+    )
+    if args.int8 is not None:
+        settings["int8"] = args.int8
+    settings["draft_model"] = args.draft_model
+    settings["draft_precision"] = args.draft_precision
+    if args.fixed_silence:
+        settings["auto_silence"] = False
+    if args.no_normalize:
+        settings["normalize_audio"] = False
+
+    failed = run_batch(inputs, settings, prefetch=args.prefetch, overwrite=args.overwrite, raw=args.raw)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())